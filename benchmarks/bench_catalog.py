@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+from __future__ import absolute_import, division, print_function
+
+import tracemalloc
+
+from dremio_client.model.catalog import catalog
+from dremio_client.model.data import Catalog
+
+
+def _crawl(node):
+    count = 0
+    for name in dir(node):
+        child = dict.get(node, name)
+        if isinstance(child, Catalog):
+            count += 1 + _crawl(child)
+    return count
+
+
+def _crawl_catalog(base_url):
+    return _crawl(catalog("mock-token", base_url, None))
+
+
+def bench_catalog_crawl(benchmark, rest_server):
+    count = benchmark.pedantic(_crawl_catalog, (rest_server.base_url,), rounds=3)
+    assert count == 10 * 21
+
+
+def bench_catalog_crawl_memory(benchmark, rest_server):
+    def run():
+        tracemalloc.start()
+        try:
+            _crawl_catalog(rest_server.base_url)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    peak = benchmark.pedantic(run, rounds=1)
+    benchmark.extra_info["peak_bytes"] = peak
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+from __future__ import absolute_import, division, print_function
+
+import pytest
+
+from dremio_client.query import query
+
+SQL = "select * from bench -- rows={}"
+
+
+def _run(rest_server, flight_server, method, rows, output="arrow"):
+    return query(
+        "mock-token",
+        rest_server.base_url,
+        "127.0.0.1",
+        None,
+        flight_server.port,
+        None,
+        None,
+        True,
+        SQL.format(rows),
+        method=method,
+        output=output,
+    )
+
+
+@pytest.mark.parametrize("method", ["flight", "rest"])
+def bench_query_latency(benchmark, rest_server, flight_server, method):
+    benchmark.group = "latency"
+    result = benchmark(_run, rest_server, flight_server, method, 10)
+    assert result.num_rows == 10
+
+
+@pytest.mark.parametrize("method,rows", [("flight", 1000000), ("rest", 5000)])
+def bench_query_throughput(benchmark, rest_server, flight_server, method, rows):
+    benchmark.group = "throughput"
+    result = benchmark.pedantic(_run, (rest_server, flight_server, method, rows), rounds=3, warmup_rounds=1)
+    assert result.num_rows == rows
+    benchmark.extra_info["rows"] = rows
+    if benchmark.stats is not None:  # None under --benchmark-disable
+        benchmark.extra_info["rows_per_second"] = rows / benchmark.stats.stats.mean
+
+
+@pytest.mark.parametrize("output", ["arrow", "pandas", "resultset"])
+def bench_flight_output(benchmark, rest_server, flight_server, output):
+    benchmark.group = "output"
+
+    def run():
+        result = _run(rest_server, flight_server, "flight", 1000000, output)
+        return result.to_arrow() if output == "resultset" else result
+
+    result = benchmark.pedantic(run, rounds=3)
+    assert len(result) == 1000000
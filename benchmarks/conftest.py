@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+from __future__ import absolute_import, division, print_function
+
+import pytest
+
+from mock_server import Catalog, MockDremio
+
+try:
+    from mock_server import MockFlightServer
+except ImportError:
+    MockFlightServer = None
+
+
+@pytest.fixture(scope="session")
+def rest_server():
+    server = MockDremio(catalog=Catalog(spaces=10, datasets=20))
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def flight_server():
+    if MockFlightServer is None:
+        pytest.skip("pyarrow flight is not installed")
+    server = MockFlightServer()
+    yield server
+    server.shutdown()
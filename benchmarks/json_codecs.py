@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Micro-benchmark of the available json codecs on the fixtures in tests/data.
+
+Run from the repository root::
+
+    PYTHONPATH=. python benchmarks/json_codecs.py [--number 2000]
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import glob
+import os
+import timeit
+
+from dremio_client import codec
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "data", "*.json")
+
+
+def _fixtures():
+    for filename in sorted(glob.glob(FIXTURES)):
+        with open(filename, "rb") as f:
+            yield os.path.basename(filename), f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args()
+
+    codecs = codec.available_codecs()
+    print("{:<20} {:<12} {:>12} {:>12}".format("fixture", "codec", "loads us", "dumps us"))
+    for name, raw in _fixtures():
+        for c in codecs:
+            codec.set_codec(c)
+            obj = codec.loads(raw)
+            loads = timeit.timeit(lambda: codec.loads(raw), number=args.number) / args.number
+            dumps = timeit.timeit(lambda: codec.dumps(obj), number=args.number) / args.number
+            print("{:<20} {:<12} {:>12.2f} {:>12.2f}".format(name, c, loads * 1e6, dumps * 1e6))
+    codec.set_codec()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+"""Local stand-ins for a Dremio coordinator used by the benchmarks.
+
+MockDremio serves the REST endpoints the client uses (login, catalog, sql, job status and results) from a thread
+and MockFlightServer answers flight queries with synthetic data. Queries ask for a result size with a comment
+``-- rows=<n>``, eg ``select * from bench -- rows=100000``. Both can also be started by hand::
+
+    PYTHONPATH=. python benchmarks/mock_server.py --port 9047 --flight-port 32010
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import re
+import threading
+import uuid
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import parse_qs, unquote, urlparse
+
+try:
+    import pyarrow as pa
+    from pyarrow import flight
+except ImportError:
+    pa = flight = None
+
+_ROWS = re.compile(r"rows\s*=\s*(\d+)")
+
+
+def requested_rows(sql, default=100):
+    match = _ROWS.search(sql)
+    return int(match.group(1)) if match else default
+
+
+def synthetic_rows(offset, count):
+    return [
+        {"id": i, "name": "name{}".format(i % 1000), "value": i * 0.5, "flag": i % 2 == 0}
+        for i in range(offset, offset + count)
+    ]
+
+
+SCHEMA = [
+    {"name": "id", "type": {"name": "BIGINT"}},
+    {"name": "name", "type": {"name": "VARCHAR"}},
+    {"name": "value", "type": {"name": "DOUBLE"}},
+    {"name": "flag", "type": {"name": "BOOLEAN"}},
+]
+
+
+def synthetic_table(rows):
+    ids = pa.array(range(rows), pa.int64())
+    return pa.table(
+        {
+            "id": ids,
+            "name": pa.array(["name{}".format(i % 1000) for i in range(rows)]),
+            "value": pa.compute.multiply(ids, 0.5),
+            "flag": pa.compute.equal(pa.compute.bit_wise_and(ids, 1), 0),
+        }
+    )
+
+
+class Catalog(object):
+    """
+    a synthetic catalog of `spaces` spaces each holding `datasets` virtual datasets
+    """
+
+    def __init__(self, spaces=10, datasets=20):
+        self.spaces = spaces
+        self.datasets = datasets
+
+    def root(self):
+        return {
+            "data": [
+                {"id": "space-{}".format(s), "path": ["space{}".format(s)], "type": "CONTAINER", "containerType": "SPACE"}
+                for s in range(self.spaces)
+            ]
+        }
+
+    def item(self, cid):
+        if cid.startswith("space-"):
+            s = int(cid.split("-")[1])
+            return {
+                "entityType": "space",
+                "id": cid,
+                "name": "space{}".format(s),
+                "path": ["space{}".format(s)],
+                "children": [
+                    {
+                        "id": "ds-{}-{}".format(s, d),
+                        "path": ["space{}".format(s), "ds{}".format(d)],
+                        "type": "DATASET",
+                        "datasetType": "VIRTUAL",
+                    }
+                    for d in range(self.datasets)
+                ],
+            }
+        if cid.startswith("ds-"):
+            _, s, d = cid.split("-")
+            return {
+                "entityType": "dataset",
+                "id": cid,
+                "type": "VIRTUAL_DATASET",
+                "path": ["space{}".format(s), "ds{}".format(d)],
+                "sql": "select * from bench -- rows=1000",
+                "fields": SCHEMA,
+            }
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, with Nagle on every keep alive request would wait for a delayed ack
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length).decode("utf-8")) if length else dict()
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._body()
+        if path == "/apiv2/login":
+            return self._send(200, {"token": "mock-token"})
+        if path == "/api/v3/sql":
+            job_id = str(uuid.uuid4())
+            self.server.jobs[job_id] = requested_rows(body.get("sql", ""))
+            return self._send(200, {"id": job_id})
+        return self._send(404, {"errorMessage": "not found"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        catalog = self.server.catalog
+        if parts == ["api", "v3", "catalog"]:
+            return self._send(200, catalog.root())
+        if parts[:3] == ["api", "v3", "catalog"] and len(parts) == 4:
+            item = catalog.item(parts[3])
+            return self._send(200, item) if item else self._send(404, {"errorMessage": "not found"})
+        if parts[:3] == ["api", "v3", "job"] and parts[3] in self.server.jobs:
+            rows = self.server.jobs[parts[3]]
+            if len(parts) == 4:
+                return self._send(200, {"jobState": "COMPLETED", "rowCount": rows})
+            query = parse_qs(url.query)
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["100"])[0])
+            count = max(0, min(limit, rows - offset))
+            return self._send(200, {"rowCount": rows, "schema": SCHEMA, "rows": synthetic_rows(offset, count)})
+        return self._send(404, {"errorMessage": "not found"})
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockDremio(object):
+    """
+    a REST server emulating the Dremio endpoints the client uses, running on a background thread
+
+    :param port: port to listen on, 0 for any free port
+    :param catalog: Catalog to serve
+    """
+
+    def __init__(self, port=0, catalog=None):
+        self._server = _ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.catalog = catalog or Catalog()
+        self._server.jobs = dict()
+        self.port = self._server.server_address[1]
+        self.base_url = "http://127.0.0.1:{}".format(self.port)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if flight is not None:
+
+    class MockFlightServer(flight.FlightServerBase):
+        """
+        a flight server answering every query with a synthetic table of the requested size
+        """
+
+        def __init__(self, location="grpc://127.0.0.1:0", batch_rows=64 * 1024, **kwargs):
+            super(MockFlightServer, self).__init__(location, **kwargs)
+            self.batch_rows = batch_rows
+            self._tables = dict()
+            self._lock = threading.Lock()
+
+        def _table(self, rows):
+            with self._lock:
+                if rows not in self._tables:
+                    self._tables[rows] = synthetic_table(rows)
+                return self._tables[rows]
+
+        def get_flight_info(self, context, descriptor):
+            rows = requested_rows(descriptor.command.decode("utf-8"))
+            table = self._table(rows)
+            endpoint = flight.FlightEndpoint(str(rows).encode("utf-8"), [])
+            return flight.FlightInfo(table.schema, descriptor, [endpoint], rows, table.nbytes)
+
+        def do_get(self, context, ticket):
+            table = self._table(int(ticket.ticket.decode("utf-8")))
+            return flight.RecordBatchStream(pa.Table.from_batches(table.to_batches(self.batch_rows), table.schema))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9047)
+    parser.add_argument("--flight-port", type=int, default=32010)
+    args = parser.parse_args()
+    rest = MockDremio(args.port)
+    print("REST on", rest.base_url)
+    if flight is not None:
+        server = MockFlightServer("grpc://127.0.0.1:{}".format(args.flight_port))
+        print("flight on port", server.port)
+        server.serve()
+    else:
+        threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
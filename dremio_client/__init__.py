@@ -23,11 +23,11 @@
 # under the License.
 #
 from __future__ import absolute_import, division, print_function
+import importlib
 import os
+import sys
 
 from .conf import build_config
-from .dremio_client import DremioClient
-from .dremio_simple_client import SimpleClient
 from .model.endpoints import catalog, catalog_item, job_results, job_status, sql
 
 __author__ = """Ryan Murray"""
@@ -67,9 +67,23 @@ def init(config_dir=None, simple_client=False, config_dict=None):
 
 
 def _connect(config, simple=False):
-    if simple:
-        return SimpleClient(config)
-    return DremioClient(config)
+    return __getattr__("SimpleClient" if simple else "DremioClient")(config)
+
+
+# the clients pull in pyarrow and pandas, so they are imported on first use. This keeps the cli daemon client
+# (dremio_client.daemon) fast to start
+_CLIENTS = {"DremioClient": ".dremio_client", "SimpleClient": ".dremio_simple_client"}
+
+
+def __getattr__(name):
+    if name in _CLIENTS:
+        return getattr(importlib.import_module(_CLIENTS[name], __name__), name)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+if sys.version_info < (3, 7):  # no module level __getattr__
+    DremioClient = __getattr__("DremioClient")
+    SimpleClient = __getattr__("SimpleClient")
 
 
 __all__ = ["init", "catalog", "catalog_item", "sql", "job_status", "job_results"]
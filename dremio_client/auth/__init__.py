@@ -23,71 +23,70 @@
 # under the License.
 #
 
-import json
 import os
-import time
 
 from confuse import ConfigValueError, NotFoundError
 
 from .config import login as config_auth
 from .basic import login as basic_auth
+from .token_manager import DEFAULT_LIFETIME, DEFAULT_MARGIN, TokenManager, clear_managers, get_manager
+from .token_store import TokenStore
 
-__all__ = ["basic_auth", "config_auth", "auth"]
+__all__ = ["basic_auth", "config_auth", "auth", "token_manager", "TokenManager", "TokenStore", "clear_managers"]
 
 
 def auth(base_url, config_dict):
-    auth_type = config_dict["auth"]["type"].get()
-    try:
-        return _existing_token(config_dict)
-    except KeyError:
-        if auth_type == "basic":
-            token = config_auth(base_url, config_dict)
-            _write_token(token, config_dict)
-            return token
-    raise NotImplementedError("Auth type is unsupported " + auth_type)
+    """
+    log in (or reuse the cached token) and return the current auth token
 
+    :param base_url: Dremio url
+    :param config_dict: config dict
+    :return: token string, see token_manager for a token which refreshes itself
+    """
+    return token_manager(base_url, config_dict).token
 
-def _write_token(token, config_dict):
-    for source in config_dict.sources:
-        if source.filename and not source.default:
-            directory = os.path.dirname(source.filename)
-            with open(os.path.join(directory, "auth.json"), "w") as f:
-                json.dump(
-                    {
-                        "token": token,
-                        "timestamp": time.time(),
-                        "hostname": config_dict["hostname"].get(),
-                        "username": config_dict["auth"]["username"].get(),
-                    },
-                    f,
-                )
-            return
 
+def token_manager(base_url, config_dict):
+    """
+    return the process wide token manager for this server and user
 
-def _existing_token(config_dict):
-    for source in config_dict.sources:
-        if source.filename and not source.default:
-            directory = os.path.dirname(source.filename)
-            if os.path.exists(os.path.join(directory, "auth.json")):
-                with open(os.path.join(directory, "auth.json")) as f:
-                    authfile = json.load(f)
-                    if _is_valid(authfile, config_dict):
-                        return authfile["token"]
-    raise KeyError
+    The manager formats as the current token so it can be passed anywhere a token is expected. It is seeded from
+    the auth.json token cache, refreshes before auth.lifetime seconds have passed and writes new tokens back to the
+    cache. DremioClient, SimpleClient and the cli all share the same manager (and therefore one login) per process.
+    Logins hold a lock on the cache and re-read it first, so many processes starting at once log in only once.
+
+    :param base_url: Dremio url
+    :param config_dict: config dict
+    :return: TokenManager
+    """
+    auth_type = config_dict["auth"]["type"].get()
+    if auth_type != "basic":
+        raise NotImplementedError("Auth type is unsupported " + auth_type)
+    lifetime = _get_int(config_dict, "lifetime", DEFAULT_LIFETIME)
+    username = config_dict["auth"]["username"].get()
+    kwargs = dict(lifetime=lifetime, margin=_get_int(config_dict, "margin", DEFAULT_MARGIN))
+    store = _token_store(config_dict)
+    if store is not None:
+        hostname = config_dict["hostname"].get()
+        cached = store.get(hostname, username, lifetime)
+        if cached:
+            kwargs["token"], kwargs["issued"] = cached
+        kwargs["load"] = lambda: store.get(hostname, username, lifetime)
+        kwargs["on_refresh"] = lambda token, issued: store.put(hostname, username, token, issued)
+        kwargs["lock"] = store.lock
+    return get_manager((base_url, username), lambda: config_auth(base_url, config_dict), **kwargs)
 
 
-def _is_valid(authfile, config_dict):
-    hostname = authfile["hostname"]
-    username = authfile["username"]
+def _get_int(config_dict, key, default):
     try:
-        expected_hostname = config_dict["hostname"].get()
-        expected_username = config_dict["auth"]["username"].get()
+        value = config_dict["auth"][key].get()
     except (ConfigValueError, NotFoundError):
-        return False
-    if hostname != expected_hostname:
-        return False
-    if username != expected_username:
-        return False
-    now = time.time()
-    then = authfile["timestamp"]
-    return (then + 60 * 60 * 10) > now
+        return default
+    return default if value is None else int(value)
+
+
+def _token_store(config_dict):
+    for source in config_dict.sources:
+        if source.filename and not source.default:
+            return TokenStore(os.path.join(os.path.dirname(source.filename), "auth.json"))
+    return None
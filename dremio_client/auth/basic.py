@@ -24,6 +24,8 @@
 #
 import requests
 
+from .. import instrument
+
 
 def login(base_url, username, password, timeout=10, verify=True):
     """
@@ -37,6 +39,9 @@ def login(base_url, username, password, timeout=10, verify=True):
     """
     url = base_url + "/apiv2/login"
 
-    r = requests.post(url, json={"userName": username, "password": password}, timeout=timeout, verify=verify)
-    r.raise_for_status()
-    return r.json()["token"]
+    with instrument.rest_call("POST", url) as call:
+        r = requests.post(url, json={"userName": username, "password": password}, timeout=timeout, verify=verify)
+        call.status = r.status_code
+        call.bytes_received = len(r.content)
+        r.raise_for_status()
+        return r.json()["token"]
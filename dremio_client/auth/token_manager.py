@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Thread-safe lifecycle management of Dremio auth tokens.
+
+A TokenManager stands in for the token string wherever one is expected (it formats as the current token) so
+the endpoint functions, the catalog model and the flight client all share a single token per server and user.
+"""
+import threading
+import time
+
+# Dremio's default session lifetime is 30 hours, the client has always assumed 10 to be safe
+DEFAULT_LIFETIME = 60 * 60 * 10
+DEFAULT_MARGIN = 60 * 5
+
+_managers = dict()
+_managers_lock = threading.Lock()
+
+
+class TokenManager(object):
+    """
+    Holds the auth token for one Dremio server and user and refreshes it when needed
+
+    * the token is refreshed proactively once it is within margin seconds of lifetime
+    * concurrent refreshes are deduplicated: one thread logs in, the others wait for and reuse its token
+    * invalidate(stale) forces a fresh login after the server rejected stale (eg a 401), unless another thread
+      already replaced it
+
+    :param login: function taking no arguments and returning a new token
+    :param lifetime: seconds a token is valid for after it is issued
+    :param margin: seconds before expiry at which the token is refreshed
+    :param token: an existing token, eg read from disk (optional)
+    :param issued: unix time the existing token was issued at (optional, defaults to now)
+    :param on_refresh: function called with (token, issued) after every login eg to persist the token (optional)
+    :param load: function returning a (token, issued) tuple or None. Checked before each login so a token written
+                 by another process is reused rather than logging in again (optional)
+    :param lock: function returning a context manager held around load, login and on_refresh eg a cross process
+                 file lock (optional)
+    """
+
+    def __init__(
+        self,
+        login,
+        lifetime=DEFAULT_LIFETIME,
+        margin=DEFAULT_MARGIN,
+        token=None,
+        issued=None,
+        on_refresh=None,
+        load=None,
+        lock=None,
+    ):
+        self._login = login
+        self._lifetime = lifetime
+        self._margin = min(margin, lifetime / 2.0)
+        self._token = token
+        self._issued = issued if issued is not None else time.time()
+        self._on_refresh = on_refresh
+        self._load = load
+        self._external_lock = lock
+        self._lock = threading.Lock()
+
+    @property
+    def token(self):
+        """
+        :return: a valid token, logging in first if the current token is missing or about to expire
+        """
+        token = self._token
+        if token is None or self._expired():
+            return self._renew(token)
+        if self._stale():
+            # refresh proactively but never block callers while the current token is still valid
+            if self._lock.acquire(False):
+                try:
+                    if self._token == token:
+                        self._refresh_locked()
+                finally:
+                    self._lock.release()
+            return self._token
+        return token
+
+    def _expired(self, issued=None):
+        return time.time() >= (self._issued if issued is None else issued) + self._lifetime
+
+    def _stale(self, issued=None):
+        return time.time() >= (self._issued if issued is None else issued) + self._lifetime - self._margin
+
+    def refresh(self, stale=None):
+        """
+        log in again
+
+        :param stale: the token which is known to be bad. If another thread already replaced it that token is
+                      returned instead of logging in again. None to refresh unconditionally
+        :return: the new token
+        """
+        if stale is not None:
+            return self._renew(stale)
+        with self._lock:
+            return self._refresh_locked()
+
+    def _renew(self, seen):
+        # log in unless another thread already replaced the token this thread saw
+        with self._lock:
+            if self._token is not None and self._token != seen and not self._expired():
+                return self._token
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        if self._external_lock is None:
+            return self._login_locked()
+        with self._external_lock():
+            return self._login_locked()
+
+    def _login_locked(self):
+        loaded = self._load() if self._load else None
+        if loaded and loaded[0] != self._token and not self._stale(loaded[1]):
+            self._token, self._issued = loaded
+            return self._token
+        token = self._login()
+        self._token, self._issued = token, time.time()
+        if self._on_refresh:
+            self._on_refresh(token, self._issued)
+        return token
+
+    def invalidate(self, stale):
+        """
+        mark a token as rejected by the server and get a replacement
+
+        :param stale: the token that was rejected
+        :return: the new token
+        """
+        return self.refresh(stale)
+
+    def __str__(self):
+        return str(self.token)
+
+    def __format__(self, format_spec):
+        return format(self.token, format_spec)
+
+    def __eq__(self, other):
+        if isinstance(other, TokenManager):
+            return self is other
+        return self.token == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return "TokenManager(issued={})".format(time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._issued)))
+
+
+def get_manager(key, login, **kwargs):
+    """
+    return the process wide token manager for key, creating it if needed
+
+    :param key: identifies the server and user eg (base_url, username)
+    :param login: function taking no arguments and returning a new token
+    :param kwargs: passed to TokenManager when it is created
+    :return: TokenManager
+    """
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = TokenManager(login, **kwargs)
+        return _managers[key]
+
+
+def clear_managers():
+    """
+    forget all process wide token managers, the next auth call logs in again
+    """
+    with _managers_lock:
+        _managers.clear()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""On disk token cache shared by every process using the same config directory.
+
+Entries are keyed by hostname and username. Writes go to a temporary file which is renamed over auth.json so
+readers never see a partial file, and read-modify-write cycles (and logins) are serialised between processes by
+an exclusive lock on auth.json.lock.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+except ImportError:  # windows
+    try:
+        import msvcrt
+
+        def _lock_file(f):
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except (IOError, OSError):  # LK_LOCK gives up after 10 seconds
+                    pass
+
+        def _unlock_file(f):
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    except ImportError:
+
+        def _lock_file(f):
+            pass
+
+        def _unlock_file(f):
+            pass
+
+
+_replace = getattr(os, "replace", os.rename)
+
+
+def _key(hostname, username):
+    return "{}|{}".format(hostname, username)
+
+
+class TokenStore(object):
+    """
+    A json file of tokens keyed by hostname and username
+
+    :param path: location of the token file, usually auth.json in the config directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._thread_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def lock(self):
+        """
+        hold the exclusive cross process lock on the store. Re-entrant within a thread
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        try:
+            if depth:
+                yield
+                return
+            with self._thread_lock:
+                with open(self.path + ".lock", "a+") as f:
+                    _lock_file(f)
+                    try:
+                        yield
+                    finally:
+                        _unlock_file(f)
+        finally:
+            self._local.depth = depth
+
+    def read(self):
+        """
+        :return: dict of key to entry, empty if the file is missing or unreadable
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return dict()
+        if not isinstance(data, dict):
+            return dict()
+        entries = dict(data.get("tokens") or dict())
+        if "token" in data and "hostname" in data:
+            # single entry file written by older versions
+            entries.setdefault(_key(data["hostname"], data.get("username")), data)
+        return entries
+
+    def get(self, hostname, username, lifetime):
+        """
+        :param hostname: Dremio hostname
+        :param username: Dremio username
+        :param lifetime: seconds a token is valid for after it is issued
+        :return: (token, issued) or None if there is no unexpired entry
+        """
+        entry = self.read().get(_key(hostname, username))
+        if not entry or "token" not in entry:
+            return None
+        issued = entry.get("timestamp", 0)
+        if issued + lifetime <= time.time():
+            return None
+        return entry["token"], issued
+
+    def put(self, hostname, username, token, issued=None):
+        """
+        add or replace the entry for hostname and username
+
+        :param hostname: Dremio hostname
+        :param username: Dremio username
+        :param token: auth token
+        :param issued: unix time the token was issued at (optional, defaults to now)
+        """
+        entry = {
+            "token": token,
+            "timestamp": time.time() if issued is None else issued,
+            "hostname": hostname,
+            "username": username,
+        }
+        with self.lock():
+            entries = self.read()
+            entries[_key(hostname, username)] = entry
+            data = {"tokens": entries}
+            # keep the latest entry at the top level too so older versions still find a token
+            data.update(entry)
+            self._write(data)
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".auth", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o600)
+            _replace(tmp, self.path)
+        except Exception:  # NOQA
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -26,13 +26,14 @@
 """Console script for dremio_client."""
 import os
 import sys
+import time
 
 import click
 
-import simplejson as json
-
-from . import __version__
-from .conf import get_base_url_token
+from . import __version__, codec, instrument
+from . import daemon as _daemon
+from . import shell as _shell
+from .conf import get_base_url_token, get_query_args
 from .error import DremioNotFoundException
 from .model.endpoints import (
     cancel_job as _cancel_job,
@@ -66,8 +67,75 @@ from .model.endpoints import (
     wlm_queues as _wlm_queues,
     wlm_rules as _wlm_rules,
 )
-from .util.query import run
+from .query import query as _query
 from .util.delete import delete_catalog as _delete_catalog
+from .util.stream import FORMATS, limit_batches, write_stream
+
+
+_PROFILER = "dremio_client.profiler"
+
+
+class _Profiler(object):
+    """
+    records every call made while a command runs and reports them when it finishes
+    """
+
+    def __init__(self, summary=True, trace_path=None):
+        self.summary = summary
+        self.trace_path = trace_path
+        self.recorder = instrument.add_sink(instrument.Recorder())
+        self.start = time.time()
+
+    def echo(self, obj):
+        start = time.time()
+        text = codec.dumps(obj)
+        click.echo(text)
+        self.output(start, bytes_sent=len(text))
+
+    def output(self, start, bytes_sent=0, rows=None):
+        """
+        record writing the result of the command, which began at start, as the output phase
+        """
+        event = instrument.CallEvent(
+            "cli", "output", latency=time.time() - start, bytes_sent=bytes_sent, rows=rows, start=start
+        )
+        self.recorder.record(event)
+
+    def close(self):
+        instrument.remove_sink(self.recorder)
+        if self.summary:
+            click.echo(_profile_summary(self.recorder.events, time.time() - self.start), err=True)
+        if self.trace_path:
+            with open(self.trace_path, "w") as f:
+                f.write(codec.dumps(self.recorder.chrome_trace()))
+
+
+def _profile_summary(events, total):
+    rows = dict()
+    for _, event in events:
+        key = " ".join(i for i in (event.transport, event.method, event.endpoint) if i)
+        row = rows.setdefault(key, [0, 0, 0.0, 0.0, 0.0, 0])
+        row[0] += 1
+        row[1] += 0 if event.ok else 1
+        row[2] += event.latency
+        row[3] = max(row[3], event.latency)
+        row[4] += event.decode
+        row[5] += event.bytes_received + event.bytes_sent
+    lines = ["{:>6} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}  {}".format(
+        "calls", "errors", "total ms", "mean ms", "max ms", "decode ms", "bytes", "call")]
+    for key, (count, errors, latency, slowest, decode, size) in sorted(rows.items(), key=lambda i: -i[1][2]):
+        lines.append("{:>6} {:>6} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10}  {}".format(
+            count, errors, latency * 1000, latency * 1000 / count, slowest * 1000, decode * 1000, size, key))
+    lines.append("wall time {:.1f} ms".format(total * 1000))
+    return "\n".join(lines)
+
+
+def _echo(obj):
+    profiler = click.get_current_context().meta.get(_PROFILER)
+    if profiler is None:
+        click.echo(codec.dumps(obj))
+    else:
+        profiler.echo(obj)
 
 
 def print_version(ctx, param, value):
@@ -86,8 +154,10 @@ def print_version(ctx, param, value):
 @click.option("-P", "--password", help="password if different from config file")
 @click.option("--skip-verify", is_flag=True, help="skip verificatoin of ssl cert")
 @click.option("--version", is_flag=True, callback=print_version, expose_value=False, is_eager=True)
+@click.option("--profile", is_flag=True, help="print the latency and size of every call made to stderr")
+@click.option("--profile-trace", type=click.Path(dir_okay=False), help="write a Chrome trace of every call made")
 @click.pass_context
-def cli(ctx, config, hostname, port, ssl, username, password, skip_verify):
+def cli(ctx, config, hostname, port, ssl, username, password, skip_verify, profile, profile_trace):
     if config:
         os.environ["DREMIO_CLIENTDIR"] = config
     ctx.obj = dict()
@@ -103,20 +173,49 @@ def cli(ctx, config, hostname, port, ssl, username, password, skip_verify):
         ctx.obj["auth.password"] = password
     if skip_verify:
         ctx.obj["verify"] = not skip_verify
+    if profile or profile_trace:
+        profiler = ctx.meta[_PROFILER] = _Profiler(profile, profile_trace)
+        ctx.call_on_close(profiler.close)
 
 
 @cli.command()
 @click.option("--sql", help="sql query to execute.", required=True)
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(FORMATS),
+    default="json",
+    show_default=True,
+    help="a json array, one json object per line, csv or an Arrow IPC stream",
+)
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="write the result to this file, - for stdout")
+@click.option("--limit", type=int, help="stop after this many rows")
+@click.option("--batch-size", type=int, help="rows fetched per round trip over odbc or rest")
+@click.option(
+    "--method",
+    type=click.Choice(["flight", "odbc", "rest"]),
+    default="flight",
+    show_default=True,
+    help="transport to try first, the next one is used if it fails",
+)
 @click.pass_obj
-def query(args, sql):
+def query(args, sql, file_format, output, limit, batch_size, method):
     """
     execute a query given by sql and print results
+
+    Rows are written as they arrive from the server, so results of any size can be exported
     """
-    base_url, token, verify = get_base_url_token(args)
-    results = list()
-    for x in run(token, base_url, sql, ssl_verify=verify):
-        results.extend(x["rows"])
-    click.echo(json.dumps(results))
+    result = _query(sql=sql, method=method, output="resultset", batch_size=batch_size, **get_query_args(args))
+    profiler = click.get_current_context().meta.get(_PROFILER)
+    try:
+        batches = limit_batches(result, limit)
+        start = time.time()
+        with click.open_file(output or "-", "wb") as sink:
+            rows = write_stream(batches, sink, file_format, result.schema)
+        if profiler is not None:
+            profiler.output(start, rows=rows)
+    finally:
+        result.close()
 
 
 @cli.command()
@@ -130,7 +229,7 @@ def sql(args, sql_query, context):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _sql(token, base_url, " ".join(sql_query), context, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -143,7 +242,7 @@ def job_status(args, jobid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _job_status(token, base_url, jobid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -160,7 +259,7 @@ def job_results(args, jobid, offset, limit):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _job_results(token, base_url, jobid, offset, limit, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -172,7 +271,7 @@ def catalog(args):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _catalog(token, base_url, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -189,7 +288,7 @@ def catalog_item(args, path, cid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _catalog_item(token, base_url, cid, [i.replace(".", "/") for i in path] if path else None, ssl_verify=verify,)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -202,7 +301,7 @@ def reflections(args, summary):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _reflections(token, base_url, summary, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -215,7 +314,7 @@ def reflection(args, reflectionid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _reflection(token, base_url, reflectionid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -227,7 +326,7 @@ def wlm_rules(args):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _wlm_rules(token, base_url, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -239,7 +338,7 @@ def wlm_queues(args):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _wlm_queues(token, base_url, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -251,7 +350,7 @@ def votes(args):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _votes(token, base_url, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -265,7 +364,7 @@ def user(args, gid, name):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _user(token, base_url, gid, name, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -279,7 +378,7 @@ def group(args, gid, name):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _group(token, base_url, gid, name, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -292,7 +391,7 @@ def pat(args, uid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _pat(token, base_url, uid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -311,7 +410,7 @@ def tags(args, cid, path):
         cid = res["id"]
     try:
         x = _collaboration_tags(token, base_url, cid, ssl_verify=verify)
-        click.echo(json.dumps(x))
+        _echo(x)
     except DremioNotFoundException:
         click.echo("Wiki not found or entity does not exist")
 
@@ -341,9 +440,9 @@ def wiki(args, cid, path, pretty_print):
                 click.echo(text)
             except ImportError:
                 click.echo("Can't convert text to console, please install markdown and BeautifulSoup")
-                click.echo(json.dumps(x))
+                _echo(x)
         else:
-            click.echo(json.dumps(x))
+            _echo(x)
     except DremioNotFoundException:
         click.echo("Wiki not found or entity does not exist")
 
@@ -382,7 +481,7 @@ def update_catalog(args, data, cid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _update_catalog(token, base_url, cid, data, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -396,7 +495,7 @@ def promote_catalog(args, data, cid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _promote_catalog(token, base_url, cid, data, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -411,7 +510,7 @@ def delete_catalog(args, cid, path):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _delete_catalog(base_url, token, verify, cid, path)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -424,7 +523,7 @@ def set_catalog(args, data):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _set_catalog(token, base_url, data, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -437,7 +536,7 @@ def refresh_pds(args, pid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _refresh_pds(token, base_url, pid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -452,7 +551,7 @@ def set_pat(args, uid, lifetime, name):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _set_personal_access_token(token, base_url, uid, name, lifetime, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -465,7 +564,7 @@ def delete_pat(args, uid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _delete_personal_access_token(token, base_url, uid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -478,7 +577,7 @@ def modify_rules(args, data):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _modify_rules(token, base_url, data, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -491,7 +590,7 @@ def cancel_job(args, jobid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _cancel_job(token, base_url, jobid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -505,7 +604,7 @@ def modify_queue(args, json_queue, rid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _modify_queue(token, base_url, rid, json_queue, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -518,7 +617,7 @@ def create_queue(args, json_queue):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _create_queue(token, base_url, json_queue, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -531,7 +630,7 @@ def delete_queue(args, rid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _delete_queue(token, base_url, rid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -545,7 +644,7 @@ def modify_reflection(args, json_reflection, rid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _modify_reflection(token, base_url, rid, json_reflection, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -558,7 +657,7 @@ def create_reflection(args, json_reflection):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _create_reflection(token, base_url, json_reflection, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -571,7 +670,7 @@ def delete_reflection(args, rid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _delete_reflection(token, base_url, rid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
 
 
 @cli.command()
@@ -587,7 +686,105 @@ def graph(args, cid):
     """
     base_url, token, verify = get_base_url_token(args)
     x = _graph(token, base_url, cid, ssl_verify=verify)
-    click.echo(json.dumps(x))
+    _echo(x)
+
+
+@cli.command()
+@click.option("--page-size", type=int, default=20, show_default=True, help="rows per page")
+@click.option(
+    "--method",
+    type=click.Choice(["flight", "rest"]),
+    default="flight",
+    show_default=True,
+    help="run queries over flight (falling back to rest if it is not available) or rest",
+)
+@click.pass_obj
+def shell(args, page_size, method):
+    """
+    interactive sql shell with paging, completion of table names and query timings
+    """
+    query_args = get_query_args(args)
+    index = _shell.CatalogIndex(query_args["token"], query_args["base_url"], query_args["ssl_verify"])
+    execute = _shell.query_executor(query_args, "rest")
+    connection = None
+    if method == "flight":
+        from .flight import get_client_pool
+
+        try:
+            pool = get_client_pool(
+                query_args["hostname"],
+                query_args["flight_port"],
+                query_args["username"],
+                query_args["password"],
+                token=query_args["token"],
+            )
+            connection = pool.acquire()
+        except NotImplementedError as e:
+            click.echo("{}, running queries over rest".format(e), err=True)
+        else:
+            execute = _shell.flight_executor(connection, fallback=execute)
+    session = _shell.Shell(execute, index, page_size)
+    try:
+        session.cmdloop()
+    finally:
+        if session.cursor is not None:
+            session.cursor.close()
+        if connection is not None:
+            pool.release(connection)
+
+
+@cli.group()
+def daemon():
+    """
+    manage the background agent which runs commands in a warm process
+
+    While an agent is running every dremio_client command is sent to it rather than starting a new python process
+    """
+
+
+@daemon.command("start")
+@click.option("--socket", "path", help="socket path, $DREMIO_CLIENTDAEMON or a file in the temp dir by default")
+@click.option(
+    "--idle-timeout", type=float, default=3600, show_default=True, help="stop after this many seconds idle, 0 never"
+)
+@click.option("--foreground", is_flag=True, help="run the agent in this process")
+def daemon_start(path, idle_timeout, foreground):
+    """
+    start the agent
+    """
+    path = path or _daemon.socket_path()
+    if path is None:
+        raise click.ClickException("the agent is turned off or unix sockets are not supported")
+    if foreground:
+        click.echo("listening on {}".format(path))
+        _daemon.Agent(path, idle_timeout or None).serve_forever()
+    else:
+        try:
+            click.echo("listening on {}".format(_daemon.start(path, idle_timeout or None)))
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+
+
+@daemon.command("stop")
+@click.option("--socket", "path", help="socket path of the agent")
+def daemon_stop(path):
+    """
+    stop the agent
+    """
+    if not _daemon.stop(path):
+        raise click.ClickException("no agent is running")
+
+
+@daemon.command("status")
+@click.option("--socket", "path", help="socket path of the agent")
+def daemon_status(path):
+    """
+    print the pid, socket, uptime and number of commands run of the agent
+    """
+    status = _daemon.status(path)
+    if status is None:
+        raise click.ClickException("no agent is running")
+    _echo(status)
 
 
 if __name__ == "__main__":
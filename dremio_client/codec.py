@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Pluggable json codec used for REST responses, request bodies, cli output and catalog serialization.
+
+The fastest installed of orjson, ujson and the standard library json is used by default. simplejson is always
+available and is used as a fallback for objects the other codecs can't serialize (eg Decimal).
+See benchmarks/json_codecs.py for a comparison of the codecs.
+"""
+import simplejson
+
+_PREFERENCE = ("orjson", "ujson", "json", "simplejson")
+# codecs which parse a bytearray directly, others are given a bytes copy
+_BUFFER_CODECS = ("orjson", "json")
+_codecs = dict()
+_current = None
+
+
+def _simplejson_codec():
+    return simplejson.loads, simplejson.dumps
+
+
+def _json_codec():
+    import json
+
+    return json.loads, json.dumps
+
+
+def _orjson_codec():
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode("utf-8")
+
+    return orjson.loads, dumps
+
+
+def _ujson_codec():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+    return ujson.loads, dumps
+
+
+_FACTORIES = {"orjson": _orjson_codec, "ujson": _ujson_codec, "simplejson": _simplejson_codec, "json": _json_codec}
+
+
+def _load(name):
+    if name not in _codecs:
+        try:
+            _codecs[name] = _FACTORIES[name]()
+        except ImportError:
+            return None
+    return _codecs[name]
+
+
+def register_codec(name, loads, dumps):
+    """
+    register a custom codec
+
+    :param name: name of the codec, used in set_codec and the json.codec config
+    :param loads: function taking str or bytes and returning python objects
+    :param dumps: function taking python objects and returning str
+    """
+    _codecs[name] = (loads, dumps)
+
+
+def available_codecs():
+    """
+    :return: list of the names of codecs that can be used, fastest first
+    """
+    return [name for name in _PREFERENCE if _load(name)] + [i for i in _codecs if i not in _PREFERENCE]
+
+
+def set_codec(name=None):
+    """
+    choose the json codec used by the client
+
+    :param name: codec name, None or 'auto' for the fastest installed codec
+    :raise: KeyError if the codec is not installed or registered
+    :return: the name of the codec now in use
+    """
+    global _current
+    if name in (None, "auto"):
+        name = available_codecs()[0]
+    if name not in _codecs and (name not in _FACTORIES or _load(name) is None):
+        raise KeyError("json codec {} is not available, options are {}".format(name, available_codecs()))
+    _current = name
+    return name
+
+
+def configure(config):
+    """
+    set the codec from the json.codec entry of a confuse config
+
+    :param config: config dict from confuse
+    """
+    try:
+        name = config["json"]["codec"].get()
+    except Exception:  # NOQA
+        name = None
+    set_codec(name)
+
+
+def get_codec():
+    """
+    :return: the name of the codec currently in use
+    """
+    if _current is None:
+        set_codec()
+    return _current
+
+
+def loads(data, decimals=False):
+    """
+    decode a json document
+
+    :param data: str, bytes or bytearray
+    :param decimals: parse numbers with a fraction or exponent as exact decimal.Decimal rather than float. Always
+                     uses simplejson
+    :raise: ValueError if data is not valid json
+    :return: python object
+    """
+    if decimals:
+        return simplejson.loads(bytes(data) if isinstance(data, bytearray) else data, use_decimal=True)
+    name = get_codec()
+    if isinstance(data, bytearray) and name not in _BUFFER_CODECS:
+        data = bytes(data)
+    return _codecs[name][0](data)
+
+
+def dumps(obj):
+    """
+    encode a python object as a json string
+
+    Falls back to simplejson for objects the current codec can not encode
+
+    :param obj: python object
+    :return: str
+    """
+    try:
+        return _codecs[get_codec()][1](obj)
+    except TypeError:
+        return simplejson.dumps(obj)
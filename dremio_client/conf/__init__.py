@@ -26,9 +26,9 @@
 import yaml
 from six import StringIO
 from .config_parser import build_config
-from .cli_helper import get_base_url_token
+from .cli_helper import get_base_url_token, get_query_args
 
-__all__ = ["build_config", "get_base_url_token", "to_dict"]
+__all__ = ["build_config", "get_base_url_token", "get_query_args", "to_dict"]
 
 
 def to_dict(config):
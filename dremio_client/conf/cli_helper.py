@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-from ..auth import auth
+from .. import codec
+from ..auth import token_manager
+from ..model.endpoints import configure_compression
 
 #
 # Copyright (c) 2019 Ryan Murray.
@@ -28,10 +30,35 @@ from .config_parser import build_config
 
 
 def get_base_url_token(args=None):
+    base_url, token, verify, _ = _connect(args)
+    return base_url, token, verify
+
+
+def get_query_args(args=None):
+    """
+    :param args: dict of config overrides from the cli
+    :return: dict of the connection arguments of dremio_client.query.query
+    """
+    base_url, token, verify, config = _connect(args)
+    return dict(
+        token=token,
+        base_url=base_url,
+        hostname=config["hostname"].get(),
+        odbc_port=config["odbc"]["port"].get(int),
+        flight_port=config["flight"]["port"].get(int),
+        username=config["auth"]["username"].get(),
+        password=config["auth"]["password"].get(),
+        ssl_verify=verify,
+    )
+
+
+def _connect(args=None):
     config = build_config(args)
+    codec.configure(config)
+    configure_compression(config)
     ssl = "s" if config["ssl"].get(bool) else ""
     host = config["hostname"].get()
     port = ":" + str(config["port"].get(int))
     base_url = "http{}://{}{}".format(ssl, host, port)
-    token = auth(base_url, config)
-    return base_url, token, config["verify"].get()
+    token = token_manager(base_url, config)
+    return base_url, token, config["verify"].get(), config
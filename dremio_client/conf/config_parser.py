@@ -26,15 +26,18 @@ import os
 
 import confuse
 
+_INT_ARGS = {"port", "odbc.port", "flight.port", "auth.timeout", "auth.lifetime", "auth.margin"}
+_BOOL_ARGS = {"ssl", "compression.response", "compression.request"}
+
 
 def _get_env_args():
     args = dict()
     for k, v in os.environ.items():
-        if "DREMIO_" in k and k != "DREMIO_CLIENTDIR":
+        if "DREMIO_" in k and k not in ("DREMIO_CLIENTDIR", "DREMIO_CLIENTDAEMON"):
             name = k.replace("DREMIO_", "").lower().replace("_", ".")
-            if name == "port" or name == "auth.timeout":
+            if name in _INT_ARGS:
                 v = int(v)
-            elif name == "ssl":
+            elif name in _BOOL_ARGS:
                 v = v.lower() in ["true", "1", "t", "y", "yes", "yeah", "yup", "certainly", "uh-huh"]
             args[name] = v
     return args
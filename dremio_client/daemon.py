@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""A background agent which runs cli commands in a warm process.
+
+Every cli invocation otherwise pays for importing pyarrow and pandas, reading the config and token cache and
+opening new connections. ``dremio_client daemon start`` starts an agent listening on a local unix socket. The
+``dremio_client`` script (main below) then forwards its arguments, working directory and DREMIO_* environment to the
+agent and relays the output. If no agent is running the command runs in process as before, as do interactive
+commands like shell, which need the terminal. Set DREMIO_CLIENTDAEMON to a socket path to use another agent, or to
+``off`` to never use one.
+
+The agent keeps the imports, auth tokens, REST keep alive connections and odbc connection pools of the process
+between commands. Commands run one at a time because each one changes the working directory and environment of the
+agent while it runs.
+
+The client side only needs this module and the standard library, it does not import the query backends.
+"""
+from __future__ import absolute_import, division, print_function
+
+import io
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from six.moves import socketserver
+
+DAEMON_ENV = "DREMIO_CLIENTDAEMON"
+# the environment which affects how a command runs: config overrides and where the config directory is found
+_FORWARDED_ENV = ("HOME", "XDG_CONFIG_HOME", "APPDATA")
+_HEADER = struct.Struct(">cI")
+_STDOUT, _STDERR, _EXIT = b"o", b"e", b"x"
+# options of the top level cli group which take a value, and the commands which always run in process: the daemon
+# commands themselves and interactive ones, as the agent has no terminal to read from
+_VALUE_OPTIONS = (
+    "--config", "-h", "--hostname", "-p", "--port", "-u", "--username", "-P", "--password", "--profile-trace"
+)
+_IN_PROCESS = ("daemon", "shell")
+
+
+def socket_path():
+    """
+    :return: path of the agent's socket, None if the agent is turned off or unix sockets are not supported
+    """
+    path = os.environ.get(DAEMON_ENV)
+    if path == "off" or not hasattr(socket, "AF_UNIX"):
+        return None
+    if path:
+        return path
+    return os.path.join(tempfile.gettempdir(), "dremio_client-{}.sock".format(os.getuid()))
+
+
+def _environment():
+    return {k: v for k, v in os.environ.items() if k.startswith("DREMIO_") or k in _FORWARDED_ENV}
+
+
+def _connect(path):
+    if path is None:
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (IOError, OSError):
+        sock.close()
+        return None
+    return sock
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("agent closed the connection")
+    return data
+
+
+def request(message, path=None):
+    """
+    send one request to the agent and relay its output to stdout and stderr
+
+    :param message: dict, a command (argv, cwd and env) or a control message eg {"control": "status"}
+    :param path: socket path, see socket_path
+    :return: exit code and, for control messages, the reply. None if no agent is listening
+    """
+    sock = _connect(path or socket_path())
+    if sock is None:
+        return None
+    stdout = getattr(sys.stdout, "buffer", sys.stdout)
+    stderr = getattr(sys.stderr, "buffer", sys.stderr)
+    try:
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        stream = sock.makefile("rb")
+        while True:
+            channel, size = _HEADER.unpack(_read_exactly(stream, _HEADER.size))
+            payload = _read_exactly(stream, size)
+            if channel == _EXIT:
+                return json.loads(payload.decode("utf-8"))
+            target = stdout if channel == _STDOUT else stderr
+            target.write(payload)
+            target.flush()
+    finally:
+        sock.close()
+
+
+def main(argv=None):
+    """
+    entry point of the dremio_client script: run the command in the agent if one is listening, otherwise in process
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if _command(argv) not in _IN_PROCESS:
+        try:
+            reply = request({"argv": argv, "cwd": os.getcwd(), "env": _environment()})
+        except EOFError:
+            sys.stderr.write("dremio_client agent stopped while running the command\n")
+            sys.exit(1)
+        if reply is not None:
+            sys.exit(reply["code"])
+    from .cli import cli
+
+    cli(args=argv, prog_name="dremio_client")
+
+
+def _command(argv):
+    # the name of the subcommand, the first argument which is neither a global option nor the value of one
+    args = iter(argv)
+    for arg in args:
+        if arg in _VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+class _FrameStream(io.RawIOBase):
+    def __init__(self, wfile, channel):
+        super(_FrameStream, self).__init__()
+        self._wfile = wfile
+        self._channel = channel
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        if data:
+            self._wfile.write(_HEADER.pack(self._channel, len(data)) + data)
+            self._wfile.flush()
+        return len(data)
+
+
+def _text_stream(wfile, channel):
+    return io.TextIOWrapper(io.BufferedWriter(_FrameStream(wfile, channel)), encoding="utf-8", write_through=True)
+
+
+def _reply(wfile, message):
+    payload = json.dumps(message).encode("utf-8")
+    wfile.write(_HEADER.pack(_EXIT, len(payload)) + payload)
+    wfile.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.touch()
+        message = json.loads(self.rfile.readline().decode("utf-8"))
+        control = message.get("control")
+        if control == "status":
+            return _reply(self.wfile, self.server.status())
+        if control == "stop":
+            _reply(self.wfile, {"code": 0})
+            return threading.Thread(target=self.server.shutdown).start()
+        stdout, stderr = _text_stream(self.wfile, _STDOUT), _text_stream(self.wfile, _STDERR)
+        code = self.server.run(message, stdout, stderr)
+        stdout.flush()
+        stderr.flush()
+        _reply(self.wfile, {"code": code})
+
+
+class Agent(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    the agent process: runs cli commands sent over a unix socket. Use start or ``dremio_client daemon start``
+
+    :param path: socket path
+    :param idle_timeout: stop after this many seconds without a request, None to run until stopped
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, idle_timeout=None):
+        if os.path.exists(path):
+            if _connect(path) is not None:
+                raise RuntimeError("an agent is already listening on " + path)
+            os.unlink(path)  # left over from an agent which did not shut down cleanly
+        umask = os.umask(0o077)  # only this user can talk to the agent
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.last_request = self.started
+        self.commands = 0
+        self._lock = threading.Lock()
+
+    def touch(self):
+        self.last_request = time.time()
+
+    def status(self):
+        return {
+            "code": 0,
+            "pid": os.getpid(),
+            "socket": self.path,
+            "uptime": time.time() - self.started,
+            "commands": self.commands,
+        }
+
+    def run(self, message, stdout, stderr):
+        """
+        run one cli command with the caller's arguments, working directory, environment and output streams
+
+        :return: exit code
+        """
+        from . import cli
+
+        with self._lock:
+            saved = os.getcwd(), dict(os.environ), sys.stdout, sys.stderr
+            try:
+                os.chdir(message["cwd"])
+                _set_environment(message["env"])
+                sys.stdout, sys.stderr = stdout, stderr
+                cli.cli.main(args=message["argv"], prog_name="dremio_client", standalone_mode=True)
+                return 0
+            except SystemExit as e:
+                return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:  # NOQA
+                traceback.print_exc(file=stderr)
+                return 1
+            finally:
+                self.commands += 1
+                self.touch()
+                sys.stdout, sys.stderr = saved[2], saved[3]
+                _set_environment(saved[1], all_keys=True)
+                os.chdir(saved[0])
+
+    def serve_forever(self, poll_interval=0.5):
+        from . import cli  # NOQA import the backends up front rather than during the first command
+
+        if self.idle_timeout:
+            watchdog = threading.Thread(target=self._stop_when_idle)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            socketserver.UnixStreamServer.serve_forever(self, poll_interval)
+        finally:
+            self.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def _stop_when_idle(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 5))
+            if time.time() - self.last_request > self.idle_timeout and not self._lock.locked():
+                self.shutdown()
+                return
+
+
+def _set_environment(env, all_keys=False):
+    for key in list(os.environ):
+        if all_keys or key.startswith("DREMIO_") or key in _FORWARDED_ENV:
+            if key not in env:
+                del os.environ[key]
+    os.environ.update(env)
+
+
+def start(path=None, idle_timeout=3600, timeout=30):
+    """
+    start an agent in a background process and wait until it accepts connections
+
+    :param path: socket path, see socket_path
+    :param idle_timeout: stop the agent after this many seconds without a request, None to run until stopped
+    :param timeout: seconds to wait for the agent to come up
+    :raise: RuntimeError if the agent did not start
+    :return: socket path
+    """
+    path = path or socket_path()
+    if path is None:
+        raise RuntimeError("the agent is turned off or unix sockets are not supported")
+    command = [sys.executable, "-m", "dremio_client.daemon", path, str(idle_timeout or 0)]
+    with open(os.devnull, "r+b") as devnull:
+        process = subprocess.Popen(
+            command, stdin=devnull, stdout=devnull, stderr=devnull, close_fds=True, start_new_session=True
+        )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        sock = _connect(path)
+        if sock is not None:
+            sock.close()
+            return path
+        if process.poll() is not None:
+            break
+        time.sleep(0.05)
+    raise RuntimeError("the agent did not start, is one already running on {}?".format(path))
+
+
+def stop(path=None):
+    """
+    :return: True if an agent was stopped
+    """
+    return request({"control": "stop"}, path) is not None
+
+
+def status(path=None):
+    """
+    :return: dict of pid, socket, uptime and commands run of the agent, None if no agent is listening
+    """
+    return request({"control": "status"}, path)
+
+
+if __name__ == "__main__":
+    Agent(sys.argv[1], float(sys.argv[2]) or None).serve_forever()
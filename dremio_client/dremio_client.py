@@ -25,7 +25,8 @@
 
 """Main module."""
 
-from .auth import auth
+from . import codec
+from .auth import token_manager
 from .dremio_simple_client import SimpleClient
 from .model.catalog import catalog
 from .model.data import (
@@ -36,6 +37,7 @@ from .model.data import (
     _get_item,
 )
 from .model.endpoints import (
+    configure_compression,
     group,
     personal_access_token,
     reflections,
@@ -55,6 +57,8 @@ class DremioClient(object):
 
         :param config: config dict from confuse
         """
+        codec.configure(config)
+        configure_compression(config)
         port = config["port"].get(int)
         self._hostname = config["hostname"].get()
         self._base_url = (
@@ -68,7 +72,7 @@ class DremioClient(object):
 
         self._username = config["auth"]["username"].get()
         self._password = config["auth"]["password"].get()
-        self._token = auth(self._base_url, config)
+        self._token = token_manager(self._base_url, config)
         self._ssl_verify = config["verify"].get(bool)
         self._catalog = catalog(self._token, self._base_url, self.query, self._ssl_verify)
         self._reflections = list()
@@ -95,6 +99,19 @@ class DremioClient(object):
         for ref in refs["data"]:  # todo I think we should attach reflections to their catalog entries...
             self._reflections.append(make_reflection(ref))
 
+    def reflection_manager(self, max_workers=8, rate=None, burst=1):
+        """ index the reflections by dataset, status and type and update many of them at once
+
+        Unlike reflections, which is read once and then cached, the index of the manager is kept current by every
+        update made through it and can be re-read with refresh
+
+        :param max_workers: number of concurrent requests
+        :param rate: maximum requests per second, None for no limit
+        :param burst: requests allowed back to back before the rate applies
+        :return: dremio_client.util.ReflectionManager
+        """
+        return self._simple.reflection_manager(max_workers, rate, burst)
+
     @property
     def wlm_queues(self):
         if len(self._wlm_queues) == 0:
@@ -128,7 +145,36 @@ class DremioClient(object):
         for ref in refs["data"]:  # todo I think we should attach reflections to their catalog entries...
             self._votes.append(make_vote(ref))
 
-    def query(self, sql, pandas=True, method="flight"):
+    def query(
+        self,
+        sql,
+        pandas=True,
+        method="flight",
+        output_path=None,
+        output_format="arrow",
+        max_rows_per_file=None,
+        output=None,
+        pandas_options=None,
+        progress=None,
+        cancel=None,
+        profile=False,
+    ):
+        """ run an sql query and return the result
+
+        :param sql: sql query to execute
+        :param pandas: return a pandas dataframe (default) or an arrow table
+        :param method: flight (default), odbc or rest. Falls back to the next method on failure
+        :param output_path: stream the result to files in this directory and return a pyarrow dataset (optional)
+        :param output_format: arrow (Arrow IPC) or parquet. Only used with output_path
+        :param max_rows_per_file: start a new file every max_rows_per_file rows. Only used with output_path
+        :param output: pandas, arrow, polars, numpy or resultset. Overrides the pandas flag if given. schema returns
+                       the schema of the result without fetching it, over flight only
+        :param pandas_options: dict of conversion options eg dremio_client.util.convert.ZERO_COPY_PANDAS_OPTIONS
+        :param progress: function called with a dremio_client.flight.Progress after every flight batch (optional)
+        :param cancel: dremio_client.flight.CancellationToken to stop the query from another thread (optional)
+        :param profile: True to return a (result, dremio_client.util.QueryProfile) tuple, "log" to log the profile
+        :return: query result
+        """
         return query(
             self._token,
             self._base_url,
@@ -141,6 +187,14 @@ class DremioClient(object):
             sql,
             pandas,
             method,
+            output_path=output_path,
+            output_format=output_format,
+            max_rows_per_file=max_rows_per_file,
+            output=output,
+            pandas_options=pandas_options,
+            progress=progress,
+            cancel=cancel,
+            profile=profile,
         )
 
     def user(self, uid=None, name=None):
@@ -22,8 +22,10 @@
 # specific language governing permissions and limitations
 # under the License.
 #
-from .auth import auth
+from . import codec
+from .auth import token_manager
 from .model.endpoints import (
+    configure_compression,
     cancel_job,
     catalog,
     catalog_item,
@@ -72,6 +74,8 @@ from .model.endpoints import (
     update_member_of_role
 )
 from .util import refresh_metadata, run, run_async, refresh_vds_reflection_by_path, refresh_reflections_of_one_dataset
+from .util import ReflectionManager, ReflectionMonitor
+from .util.lineage import get_lineage_graph
 
 
 class SimpleClient(object):
@@ -83,6 +87,8 @@ class SimpleClient(object):
         :param config: config dict from confuse
         """
 
+        codec.configure(config)
+        configure_compression(config)
         port = config["port"].get(int)
         self._hostname = config["hostname"].get()
         self._base_url = (
@@ -91,7 +97,7 @@ class SimpleClient(object):
             + self._hostname
             + (":{}".format(port) if port else "")
         )
-        self._token = auth(self._base_url, config)
+        self._token = token_manager(self._base_url, config)
         self._ssl_verify = config["verify"].get(bool)
 
     def catalog(self):
@@ -115,6 +121,25 @@ class SimpleClient(object):
     def reflection(self, reflectionid):
         return reflection(self._token, self._base_url, reflectionid, ssl_verify=self._ssl_verify)
 
+    def reflection_manager(self, max_workers=8, rate=None, burst=1):
+        """ index the reflections by dataset, status and type and update many of them at once
+
+        :param max_workers: number of concurrent requests
+        :param rate: maximum requests per second, None for no limit
+        :param burst: requests allowed back to back before the rate applies
+        :return: dremio_client.util.ReflectionManager
+        """
+        return ReflectionManager(self, max_workers, rate, burst)
+
+    def reflection_monitor(self, interval=5, timeout=None):
+        """ wait for reflections to finish refreshing, polling the reflection summary once for all of them
+
+        :param interval: seconds between polls
+        :param timeout: seconds after which a reflection which is not done fails with a TimeoutError (optional)
+        :return: dremio_client.util.ReflectionMonitor
+        """
+        return ReflectionMonitor(self, interval, timeout)
+
     def wlm_queues(self):
         """ return details all workload management queues
 
@@ -565,14 +590,34 @@ class SimpleClient(object):
         """
         return modify_rules(self._token, self._base_url, json, ssl_verify=self._ssl_verify)
 
-    def graph(self, cid):
+    def graph(self, cid, cached=False):
+        """ parents and children of a dataset
+
+        https://docs.dremio.com/rest-api/catalog/get-catalog-id-graph.html
+
+        :param cid: id of a dataset
+        :param cached: answer from the process wide lineage graph, fetching only on first use
+        :return: graph json
+        """
+        if cached:
+            return self.lineage_graph().graph(cid)
         return graph(self._token, self._base_url, cid, ssl_verify=self._ssl_verify)
 
+    def lineage_graph(self, **kwargs):
+        """ the process wide lineage graph of this server and user, for ancestors, descendants and impact queries
+
+        :param kwargs: passed to dremio_client.util.lineage.LineageGraph when it is first created eg max_age or path
+        :return: dremio_client.util.LineageGraph
+        """
+        return get_lineage_graph(self._token, self._base_url, self._ssl_verify, **kwargs)
+
     def refresh_vds_reflection_by_path(self, path):
         """ Refresh the reflection for a given virtual dataset
 
+        Every physical dataset upstream of the vds is refreshed once, concurrently where the lineage allows it
+
         :param path: list ['space', 'folder', 'vds']
-        :return: None
+        :return: BulkResult of the pds refreshes
         """
         return refresh_vds_reflection_by_path(self, path)
 
@@ -583,7 +628,7 @@ class SimpleClient(object):
         All VDS Reflection derived from this VDS will be refreshed as well
 
         :param path: list ['space', 'folder', 'vds']
-        :return: None
+        :return: BulkResult of re-enabling the reflections
 
         """
 
@@ -49,3 +49,11 @@ class DremioNotFoundException(DremioException):
 
 class DremioBadRequestException(DremioException):
     pass
+
+
+class DremioConflictException(DremioException):
+    pass
+
+
+class DremioCancelledException(DremioException):
+    pass
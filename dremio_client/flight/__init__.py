@@ -24,12 +24,21 @@
 #
 import base64
 
+from .. import instrument
+from ..error import DremioCancelledException
+from ..util.convert import convert_table, output_type
+from ..util.profile import QueryProfile
+from ..util.resultset import ResultSet
+from ..util.spill import write_batches
+from .control import CancellationToken, Progress, ProgressTracker  # NOQA
+
 try:
     import pyarrow as pa
     from pyarrow import flight
     from .flight_auth import HttpDremioClientAuthHandler
-    
-    
+
+    NO_FLIGHT = False
+
     class DremioClientAuthMiddleware(flight.ClientMiddleware):
         """
         A ClientMiddleware that extracts the bearer token from
@@ -51,9 +60,10 @@ try:
             authorization_header = []
             for key in headers:
                 if key.lower() == auth_header_key:
-                    authorization_header = headers.get(auth_header_key)
-            self.factory.set_call_credential([
-                b'authorization', authorization_header[0].encode("utf-8")])
+                    authorization_header = headers.get(key)
+            if authorization_header:
+                self.factory.set_call_credential([
+                    b'authorization', authorization_header[0].encode("utf-8")])
 
     class DremioClientAuthMiddlewareFactory(flight.ClientMiddlewareFactory):
         """A factory that creates DremioClientAuthMiddleware(s)."""
@@ -67,96 +77,262 @@ try:
         def set_call_credential(self, call_credential):
             self.call_credential = call_credential
 
-    def connect(
-        hostname="localhost", port=32010, username="dremio", password="dremio123", tls_root_certs_filename=None
-    ):
-        """
-        Connect to and authenticate against Dremio's arrow flight server. Auth is skipped if username is None
-
-        :param hostname: Dremio coordinator hostname
-        :param port: Dremio coordinator port
-        :param username: Username on Dremio
-        :param password: Password on Dremio
-        :param tls_root_certs_filename: use ssl to connect with root certs from filename
-        :return: arrow flight client
-        """
-        
-        scheme = "grpc+tcp"
-        connection_args = {}
-        
-        if tls_root_certs_filename:
-            with open(tls_root_certs_filename) as root_certs:
-                connection_args["tls_root_certs"] = root_certs.read()
-            scheme = "grpc+tls"
-        else:
-            # use default unencrypted TCP connection
-            pass
-        
-        # Two WLM settings can be provided upon initial authentication
-        # with the Dremio Server Flight Endpoint:
-        # - routing-tag
-        # - routing queue
-        
-        client_auth_middleware = DremioClientAuthMiddlewareFactory()
-        client = flight.FlightClient("{}://{}:{}".format(scheme, hostname, port),
-                                     middleware=[client_auth_middleware], **connection_args)
-        
-        if username and password:
-            encoded_credentials = base64.b64encode(b'' + username.encode() + b':' + password.encode())
-            initial_options = flight.FlightCallOptions(headers=[
-                (b'authorization', b'Basic ' + encoded_credentials)
-            ])
-#             client.authenticate_basic_token(username, password, initial_options)
-        return initial_options, client
-
-    def query(
-        sql,
-        client=None,
-        hostname="localhost",
-        port=47470,
-        username="dremio",
-        password="dremio123",
-        pandas=True,
-        tls_root_certs_filename=False,
-    ):
-        """
-        Run an sql query against Dremio and return a pandas dataframe or arrow table
-
-        Either host,port,user,pass tuple or a pre-connected client should be supplied. Not both
-
-        :param sql: sql query to execute on dremio
-        :param client: pre-connected client (optional)
-        :param hostname: Dremio coordinator hostname (optional)
-        :param port: Dremio coordinator port (optional)
-        :param username: Username on Dremio (optional)
-        :param password: Password on Dremio (optional)
-        :param pandas: return a pandas dataframe (default) or an arrow table
-        :param tls_root_certs_filename: use ssl to connect with root certs from filename
-        :return:
-        """
+except ImportError:
+    NO_FLIGHT = True
+
+_NOT_IMPLEMENTED = "Python Flight bindings require Python 3 and pyarrow > 0.14.0"
+
+
+def _check_flight():
+    if NO_FLIGHT:
+        raise NotImplementedError(_NOT_IMPLEMENTED)
+
+
+def connect(
+    hostname="localhost",
+    port=32010,
+    username="dremio",
+    password="dremio123",
+    tls_root_certs_filename=None,
+    token=None,
+):
+    """
+    Connect to and authenticate against Dremio's arrow flight server. Auth is skipped if username is None
+
+    If a token is given it is sent as a bearer token instead of the username and password, so the flight client
+    reuses the session of the REST client rather than logging in again
+
+    :param hostname: Dremio coordinator hostname
+    :param port: Dremio coordinator port
+    :param username: Username on Dremio
+    :param password: Password on Dremio
+    :param tls_root_certs_filename: use ssl to connect with root certs from filename
+    :param token: auth token or dremio_client.auth.TokenManager (optional)
+    :return: arrow flight client
+    """
+    _check_flight()
+    scheme = "grpc+tcp"
+    connection_args = {}
+
+    if tls_root_certs_filename:
+        with open(tls_root_certs_filename) as root_certs:
+            connection_args["tls_root_certs"] = root_certs.read()
+        scheme = "grpc+tls"
+    else:
+        # use default unencrypted TCP connection
+        pass
+
+    # Two WLM settings can be provided upon initial authentication
+    # with the Dremio Server Flight Endpoint:
+    # - routing-tag
+    # - routing queue
+
+    client_auth_middleware = DremioClientAuthMiddlewareFactory()
+    client = flight.FlightClient("{}://{}:{}".format(scheme, hostname, port),
+                                 middleware=[client_auth_middleware], **connection_args)
+
+    initial_options = None
+    if token is not None:
+        initial_options = _bearer_options(token)
+    elif username and password:
+        initial_options = _basic_options(username, password)
+#         client.authenticate_basic_token(username, password, initial_options)
+    return initial_options, client
+
+
+def _basic_options(username, password):
+    encoded_credentials = base64.b64encode(b'' + username.encode() + b':' + password.encode())
+    return flight.FlightCallOptions(headers=[
+        (b'authorization', b'Basic ' + encoded_credentials)
+    ])
+
+
+def _bearer_options(token):
+    return flight.FlightCallOptions(headers=[(b'authorization', "Bearer {}".format(token).encode("utf-8"))])
+
+
+def query(
+    sql,
+    client=None,
+    hostname="localhost",
+    port=47470,
+    username="dremio",
+    password="dremio123",
+    pandas=True,
+    tls_root_certs_filename=False,
+    output_path=None,
+    output_format="arrow",
+    max_rows_per_file=None,
+    output=None,
+    pandas_options=None,
+    token=None,
+    progress=None,
+    cancel=None,
+    profile=None,
+):
+    """
+    Run an sql query against Dremio and return a pandas dataframe or arrow table
+
+    Either host,port,user,pass tuple or a pre-connected client should be supplied. Not both.
+    If a token is given it is used in place of the username and password. A token rejected by the server is
+    refreshed once if it is a TokenManager, otherwise the query falls back to the username and password
+
+    :param sql: sql query to execute on dremio
+    :param client: pre-connected client (optional)
+    :param hostname: Dremio coordinator hostname (optional)
+    :param port: Dremio coordinator port (optional)
+    :param username: Username on Dremio (optional)
+    :param password: Password on Dremio (optional)
+    :param pandas: return a pandas dataframe (default) or an arrow table
+    :param tls_root_certs_filename: use ssl to connect with root certs from filename
+    :param output_path: stream the result to files in this directory instead of holding it in memory (optional)
+    :param output_format: arrow (Arrow IPC) or parquet. Only used with output_path
+    :param max_rows_per_file: start a new file every max_rows_per_file rows. Only used with output_path
+    :param output: pandas, arrow, polars, numpy or resultset. Overrides the pandas flag if given.
+                   A resultset streams batches from the server as they are read. schema returns the schema of the
+                   result from the plan (GetFlightInfo) without fetching any data
+    :param pandas_options: dict of options for dremio_client.util.convert.convert_table eg self_destruct
+    :param token: auth token or dremio_client.auth.TokenManager shared with the REST client (optional)
+    :param progress: function called with a dremio_client.flight.Progress after every batch (optional)
+    :param cancel: dremio_client.flight.CancellationToken to stop the query from another thread (optional)
+    :param profile: dremio_client.util.QueryProfile to record the plan, fetch and convert phases in (optional)
+    :raise: DremioCancelledException if cancel was cancelled before the result was fully read
+    :return: converted result or, if output_path is given, a memory mapped pyarrow dataset
+    """
+    _check_flight()
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    if profile is None:
+        profile = QueryProfile(sql)
+    profile.method = "flight"
+    call_options = None
+    current = None if token is None else str(token)
+    call = instrument.Call("flight", "query")
+    call.bytes_sent = len(sql)
+    try:
         if not client:
-            call_options, client = connect(hostname, port, username, password, tls_root_certs_filename)
+            call_options, client = connect(hostname, port, username, password, tls_root_certs_filename, current)
 
-        info = client.get_flight_info(flight.FlightDescriptor.for_command(sql), call_options)
+        descriptor = flight.FlightDescriptor.for_command(sql)
+        with profile.phase("plan"):
+            try:
+                info = client.get_flight_info(descriptor, call_options)
+            except flight.FlightUnauthenticatedError:
+                retried = None
+                if current is not None and call_options is not None:
+                    retried = _reauthenticate(client, descriptor, token, current, username, password)
+                if retried is None:
+                    raise
+                call.retries += 1
+                info, call_options = retried
+        if output == "schema":
+            call.finish()
+            return info.schema
         reader = client.do_get(info.endpoints[0].ticket, call_options)
-        batches = []
+    except Exception as e:
+        call.finish(e)
+        raise
+    num_rows = info.total_records if info.total_records >= 0 else None
+    if cancel is not None:
+        _cancel_on(cancel, client, info, reader)
+    batches = profile.iter(_read_batches(reader, progress, cancel, num_rows, call))
+    if output_path:
+        return write_batches(batches, output_path, output_format, max_rows_per_file, reader.schema)
+    if output_type(pandas, output) == "resultset":
+        return ResultSet(_FlightStream(batches, reader, call), reader.schema, num_rows, "flight", profile)
+    data = pa.Table.from_batches(list(batches), reader.schema)
+    with profile.phase("convert"):
+        return convert_table(data, output_type(pandas, output), **(pandas_options or {}))
+
+
+def _reauthenticate(client, descriptor, token, rejected, username, password):
+    # a managed token is refreshed once, after that (or for plain tokens) fall back to username and password
+    fallbacks = list()
+    if hasattr(token, "invalidate"):
+        fallbacks.append(lambda: _bearer_options(token.invalidate(rejected)))
+    if username and password:
+        fallbacks.append(lambda: _basic_options(username, password))
+    for i, options in enumerate(fallbacks):
+        try:
+            call_options = options()
+            return client.get_flight_info(descriptor, call_options), call_options
+        except flight.FlightUnauthenticatedError:
+            if i == len(fallbacks) - 1:
+                raise
+
+
+def _cancel_on(cancel, client, info, reader):
+    # cancelling the DoGet call tells Dremio to cancel the job. Newer servers and pyarrow versions also
+    # support an explicit CancelFlightInfo request
+    cancel.on_cancel(reader.cancel)
+    if hasattr(client, "cancel_flight_info") and hasattr(flight, "CancelFlightInfoRequest"):
+        cancel.on_cancel(lambda: client.cancel_flight_info(flight.CancelFlightInfoRequest(info)))
+
+
+class _FlightStream(object):
+    """
+    the batches of a DoGet call. Closing it cancels the call and finishes its instrumentation even if the batches
+    were never read to the end
+    """
+
+    def __init__(self, batches, reader, call):
+        self._batches = batches
+        self._reader = reader
+        self._call = call
+
+    def __iter__(self):
+        return self._batches
+
+    def close(self):
+        try:
+            self._batches.close()
+            self._reader.cancel()
+        finally:
+            self._call.finish()
+
+
+def _read_batches(reader, progress=None, cancel=None, total_rows=None, call=None):
+    tracker = ProgressTracker(progress, total_rows) if progress else None
+    try:
         while True:
             try:
                 batch, _ = reader.read_chunk()
-                batches.append(batch)
             except StopIteration:
                 break
-        data = pa.Table.from_batches(batches)
-        if pandas:
-            return data.to_pandas()
-        else:
-            return data
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    raise DremioCancelledException("query was cancelled", e)
+                raise
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            if tracker:
+                tracker.update(batch)
+            if call is not None:
+                call.add_batch(batch)
+            yield batch
+    except Exception as e:
+        if call is not None:
+            call.finish(e)
+        raise
+    finally:
+        if call is not None:
+            call.finish()
+    if tracker:
+        tracker.finish()
 
 
-except ImportError:
+if NO_FLIGHT:
+
+    def parallel_read(*args, **kwargs):
+        raise NotImplementedError(_NOT_IMPLEMENTED)
+
+    def get_client_pool(*args, **kwargs):
+        raise NotImplementedError(_NOT_IMPLEMENTED)
+
+    class FlightConnection(object):
+        def __init__(self, *args, **kwargs):
+            raise NotImplementedError(_NOT_IMPLEMENTED)
 
-    def connect(*args, **kwargs):
-        raise NotImplementedError("Python Flight bindings require Python 3 and pyarrow > 0.14.0")
 
-    def query(*args, **kwargs):
-        raise NotImplementedError("Python Flight bindings require Python 3 and pyarrow > 0.14.0")
+else:
+    from .parallel import FlightConnection, get_client_pool, parallel_read  # NOQA
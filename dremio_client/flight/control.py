@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+import threading
+import time
+
+import attr
+
+from ..error import DremioCancelledException
+
+
+class CancellationToken(object):
+    """
+    Cancel a running query from any thread or asyncio task
+
+    Pass the token to a query, then call cancel() to stop it. Cancelling stops the result stream (which also
+    cancels the job on the server) and the query raises DremioCancelledException. cancel() is thread-safe and does
+    not block, so it can be called from a signal handler, another thread or a coroutine eg::
+
+        token = CancellationToken()
+        future = loop.run_in_executor(None, functools.partial(flight.query, sql, cancel=token))
+        try:
+            df = await asyncio.wait_for(future, 60)
+        except asyncio.TimeoutError:
+            token.cancel()
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = list()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """
+        cancel the query. Calling it again has no effect
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, list()
+        for callback in callbacks:
+            _quietly(callback)
+
+    def on_cancel(self, callback):
+        """
+        register a function taking no arguments to call on cancellation, immediately if already cancelled
+
+        :param callback: function
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        _quietly(callback)
+
+    def raise_if_cancelled(self):
+        """
+        :raise: DremioCancelledException if the token was cancelled
+        """
+        if self.cancelled:
+            raise DremioCancelledException("query was cancelled", None)
+
+
+def _quietly(callback):
+    try:
+        callback()
+    except Exception:  # NOQA
+        # the stream may already be finished or broken, cancellation is best effort
+        pass
+
+
+@attr.s(frozen=True)
+class Progress(object):
+    """
+    a snapshot of the progress of a query result stream, passed to progress callbacks after each batch
+    """
+
+    batches = attr.ib(default=0)
+    rows = attr.ib(default=0)
+    bytes = attr.ib(default=0)
+    elapsed = attr.ib(default=0.0)
+    total_rows = attr.ib(default=None)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def fraction(self):
+        """
+        :return: fraction of rows received, None if the server did not report the total
+        """
+        if not self.total_rows:
+            return None
+        return min(1.0, float(self.rows) / self.total_rows)
+
+
+class ProgressTracker(object):
+    """
+    accumulate per batch statistics and report them to a callback
+
+    :param callback: function taking a Progress, or None to only track
+    :param total_rows: total row count if known
+    :param min_interval: minimum seconds between callbacks, the final batch is always reported
+    """
+
+    def __init__(self, callback=None, total_rows=None, min_interval=0):
+        self.callback = callback
+        self.min_interval = min_interval
+        self._start = time.time()
+        self._last = None
+        self._reported = True
+        self.progress = Progress(total_rows=total_rows)
+
+    def update(self, batch):
+        """
+        :param batch: the pyarrow.RecordBatch just received
+        """
+        p = self.progress
+        self.progress = Progress(
+            p.batches + 1, p.rows + batch.num_rows, p.bytes + batch.nbytes, time.time() - self._start, p.total_rows
+        )
+        now = time.time()
+        self._reported = False
+        if self.callback and (self._last is None or now - self._last >= self.min_interval):
+            self._last = now
+            self._reported = True
+            self.callback(self.progress)
+
+    def finish(self):
+        """
+        report the final progress if the last update was throttled
+        """
+        if self.callback and not self._reported:
+            self._reported = True
+            self.callback(self.progress)
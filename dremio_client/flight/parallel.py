@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+"""Read one large table over several concurrent flight streams.
+
+Deserializing a single flight stream is limited to one core, so parallel_read splits the table into ranges of a
+column and reads each range over its own stream and connection.
+"""
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+from pyarrow import flight
+from six import string_types
+from six.moves import queue
+
+from .. import instrument
+from ..util.convert import convert_table
+from ..util.pool import ConnectionPool
+from ..util.resultset import ResultSet
+from ..util.sql import conjunction, partition_predicates, quote_identifier
+from . import _basic_options, _bearer_options, _read_batches, connect
+
+_DONE = object()
+# connections are opened on demand and closed once idle, so a process wide pool can allow this many at little cost
+DEFAULT_POOL_SIZE = 16
+
+
+class FlightConnection(object):
+    """
+    a flight client and the call options which authenticate it. A token is re-read on every call so a managed
+    token keeps working after it is refreshed
+    """
+
+    def __init__(self, client, username=None, password=None, token=None):
+        self.client = client
+        self._username = username
+        self._password = password
+        self._token = token
+
+    @property
+    def options(self):
+        if self._token is not None:
+            return _bearer_options(self._token)
+        if self._username and self._password:
+            return _basic_options(self._username, self._password)
+        return None
+
+    def read(self, sql):
+        """
+        :param sql: sql query
+        :return: generator of record batches over every endpoint of the query, and the result schema
+        """
+        options = self.options
+        call = instrument.Call("flight", "partition")
+        call.bytes_sent = len(sql)
+        try:
+            info = self.client.get_flight_info(flight.FlightDescriptor.for_command(sql), options)
+            readers = [self.client.do_get(endpoint.ticket, options) for endpoint in info.endpoints]
+        except Exception as e:
+            call.finish(e)
+            raise
+
+        def batches():
+            with call:
+                for reader in readers:
+                    for batch in _read_batches(reader):
+                        call.add_batch(batch)
+                        yield batch
+
+        return batches(), readers, info.schema
+
+    def close(self):
+        self.client.close()
+
+
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def get_client_pool(
+    hostname="localhost",
+    port=47470,
+    username="dremio",
+    password="dremio123",
+    tls_root_certs_filename=None,
+    token=None,
+    **kwargs
+):
+    """
+    return the process wide pool of flight connections for a server and user, creating it if needed
+
+    :param kwargs: passed to dremio_client.util.pool.ConnectionPool when the pool is created eg max_size, which
+                   defaults to DEFAULT_POOL_SIZE. Later calls get the existing pool whatever their settings
+    :return: ConnectionPool of FlightConnection
+    """
+    key = (hostname, port, username, tls_root_certs_filename)
+    kwargs.setdefault("max_size", DEFAULT_POOL_SIZE)
+
+    def new_connection():
+        _, client = connect(hostname, port, None, None, tls_root_certs_filename)
+        return FlightConnection(client, username, password, token)
+
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(new_connection, **kwargs)
+        return _pools[key]
+
+
+def _read_table(pool, sql):
+    with pool.connection() as connection:
+        batches, _, schema = connection.read(sql)
+        return pa.Table.from_batches(list(batches), schema)
+
+
+def _target(dataset, partition_column, columns):
+    if isinstance(dataset, string_types):
+        if partition_column is None:
+            raise ValueError("partition_column is required when reading a table by name")
+        return dataset, partition_column, columns
+    if isinstance(dataset, (list, tuple)):
+        return ".".join(quote_identifier(p) for p in dataset), partition_column, columns
+    column = partition_column or dataset.partition_column()
+    return dataset.get_table(), column, dataset._check_columns(columns)
+
+
+class _UnionStream(object):
+    """
+    run one query per partition on a thread pool and hand their batches to a single consumer through a bounded
+    queue. Producers block once max_queue batches are waiting, which throttles the streams to the consumer's pace
+    """
+
+    def __init__(self, pool, sqls, max_queue):
+        self._pool = pool
+        self._sqls = sqls
+        self._queue = queue.Queue(max_queue)
+        self._stop = threading.Event()
+        self._readers = list()
+        self._lock = threading.Lock()
+        self.schema = None
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, i, sql):
+        try:
+            with self._pool.connection() as connection:
+                batches, readers, schema = connection.read(sql)
+                with self._lock:
+                    self._readers.extend(readers)
+                    if self.schema is None:
+                        self.schema = schema
+                for batch in batches:
+                    if not self._put((i, batch)):
+                        break
+            self._put((_DONE, None))
+        except Exception as e:  # NOQA
+            self._put((_DONE, e))
+
+    def __iter__(self):
+        # one thread per query, those beyond the size of the pool wait for a connection
+        executor = ThreadPoolExecutor(max(1, len(self._sqls)))
+        try:
+            for i, sql in enumerate(self._sqls):
+                executor.submit(self._produce, i, sql)
+            remaining = len(self._sqls)
+            while remaining:
+                i, item = self._queue.get()
+                if i is _DONE:
+                    remaining -= 1
+                    if item is not None:
+                        raise item
+                    continue
+                yield i, item
+        finally:
+            self.close()
+            executor.shutdown(wait=False)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            readers = list(self._readers)
+        for reader in readers:
+            try:
+                reader.cancel()
+            except Exception:  # NOQA
+                pass
+
+
+def parallel_read(
+    dataset,
+    partition_column=None,
+    n_partitions=4,
+    columns=None,
+    filter=None,
+    strategy="minmax",
+    stream=False,
+    output="arrow",
+    max_queue=16,
+    hostname="localhost",
+    port=47470,
+    username="dremio",
+    password="dremio123",
+    tls_root_certs_filename=None,
+    token=None,
+    pool=None,
+):
+    """
+    Read a table over n_partitions concurrent flight streams
+
+    The table is split into ranges of partition_column (see partition_predicates) and each range is read by its
+    own query over a pooled flight connection. With stream=False the ranges are assembled, in order, into one
+    arrow table. With stream=True a ResultSet is returned which yields batches from all streams as they arrive;
+    the streams pause whenever max_queue batches are waiting to be consumed.
+
+    :param dataset: dremio_client.model.data.Dataset, path list like ['space', 'table'] or quoted sql table name
+    :param partition_column: column to split on. Chosen from the dataset's fields and reflections if None
+    :param n_partitions: number of ranges and concurrent streams, streams beyond the size of the pool wait their turn
+    :param columns: list of columns to read, all if None
+    :param filter: sql predicate string or dict of column to value (optional)
+    :param strategy: minmax (equal width ranges) or ntile (equal row counts)
+    :param stream: return a streaming ResultSet rather than a materialized result
+    :param output: arrow (default), pandas, polars, numpy or resultset, ignored when stream is True
+    :param max_queue: maximum number of batches buffered between the streams and the consumer
+    :param hostname: Dremio coordinator hostname
+    :param port: Dremio flight port
+    :param username: Username on Dremio
+    :param password: Password on Dremio
+    :param tls_root_certs_filename: use ssl to connect with root certs from filename
+    :param token: auth token or dremio_client.auth.TokenManager, used instead of the password (optional)
+    :param pool: ConnectionPool of FlightConnection, see get_client_pool (optional)
+    :return: converted result or ResultSet
+    """
+    table, column, columns = _target(dataset, partition_column, columns)
+    if pool is None:
+        pool = get_client_pool(hostname, port, username, password, tls_root_certs_filename, token)
+    if column is None:
+        predicates = [None]
+    else:
+        read_table = functools.partial(_read_table, pool)
+        predicates = partition_predicates(read_table, table, column, n_partitions, strategy, filter)
+    projection = ", ".join(quote_identifier(c) for c in columns) if columns else "*"
+    sqls = list()
+    for predicate in predicates:
+        predicate = conjunction(filter, predicate)
+        sqls.append("SELECT {} FROM {}{}".format(projection, table, " WHERE " + predicate if predicate else ""))
+    union = _UnionStream(pool, sqls, max_queue)
+    if stream:
+        return ResultSet(_with_schema(union), method="flight")
+    parts = [list() for _ in sqls]
+    for i, batch in union:
+        parts[i].append(batch)
+    batches = [b for part in parts for b in part]
+    if batches:
+        data = pa.Table.from_batches(batches)
+    else:
+        data = (union.schema or pa.schema([])).empty_table()
+    return convert_table(data, output)
+
+
+def _with_schema(union):
+    empty = True
+    try:
+        for _, batch in union:
+            empty = False
+            yield batch
+    finally:
+        union.close()
+    if empty and union.schema is not None:
+        yield pa.RecordBatch.from_arrays([pa.array([], f.type) for f in union.schema], schema=union.schema)
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Per call events for REST, flight and odbc requests.
+
+Every REST call, flight query and odbc query emits a CallEvent to the registered sinks once it completes. A sink is
+any callable taking a CallEvent. StatsCollector keeps in process latency and volume stats, PrometheusSink and
+OpenTelemetrySink export the events as metrics or spans. eg::
+
+    stats = StatsCollector()
+    add_sink(stats)
+    client.query("select 1")
+    stats.snapshot()["flight query"]["p95"]
+
+Sinks are called on the thread which made the call and a failing sink is logged and otherwise ignored.
+"""
+import collections
+import logging
+import os
+import re
+import threading
+import time
+
+import attr
+from six.moves.urllib.parse import urlparse
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+_sinks = list()
+_lock = threading.Lock()
+_ID = re.compile(r"^(\d+|[0-9a-fA-F-]{16,})$")
+_BY_NAME = {"by-path", "by-name"}
+
+
+@attr.s(frozen=True)
+class CallEvent(object):
+    """
+    one completed call
+
+    transport is rest, flight or odbc. endpoint is the url path with ids replaced by placeholders (see
+    endpoint_template) for rest calls and the operation (eg query) otherwise. status is the http status code for rest
+    calls and ok or the exception name otherwise. latency is in seconds and start is the epoch time of the call.
+    decode is the part of latency spent decoding the json response
+    """
+
+    transport = attr.ib()
+    endpoint = attr.ib()
+    method = attr.ib(default=None)
+    status = attr.ib(default=None)
+    latency = attr.ib(default=0.0)
+    bytes_sent = attr.ib(default=0)
+    bytes_received = attr.ib(default=0)
+    retries = attr.ib(default=0)
+    rows = attr.ib(default=None)
+    error = attr.ib(default=None)
+    url = attr.ib(default=None)
+    start = attr.ib(default=None)
+    decode = attr.ib(default=0.0)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def add_sink(sink):
+    """
+    register a sink to receive every CallEvent
+
+    :param sink: callable taking a CallEvent
+    :return: the sink, so this can be used as a decorator
+    """
+    with _lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def clear_sinks():
+    with _lock:
+        del _sinks[:]
+
+
+def emit(event):
+    for sink in list(_sinks):
+        try:
+            sink(event)
+        except Exception:  # NOQA
+            logging.exception("instrumentation sink %r failed", sink)
+
+
+def endpoint_template(url):
+    """
+    turn a url into a low cardinality endpoint name: the host and query are dropped and ids replaced by {id}
+
+    >>> endpoint_template("https://dremio:9047/api/v3/job/1f2a3b4c-0000-1111-2222-333344445555/results?offset=100")
+    '/api/v3/job/{id}/results'
+    >>> endpoint_template("https://dremio:9047/api/v3/catalog/by-path/space/folder/dataset")
+    '/api/v3/catalog/by-path/{path}'
+    """
+    parts = urlparse(url).path.split("/")
+    for i, part in enumerate(parts):
+        if part in _BY_NAME:
+            return "/".join(parts[: i + 1] + ["{path}" if part == "by-path" else "{name}"])
+        if _ID.match(part):
+            parts[i] = "{id}"
+    return "/".join(parts)
+
+
+class Call(object):
+    """
+    times one call and emits its CallEvent when finished
+
+    transports fill in status, bytes_sent, bytes_received, retries and rows as the call proceeds. Use it as a context
+    manager or call finish explicitly, the event is only emitted once
+    """
+
+    def __init__(self, transport, endpoint, method=None, url=None):
+        self.transport = transport
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.status = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.rows = None
+        self.decode = 0.0
+        self.start = time.time()
+        self._finished = False
+
+    def add_batch(self, batch):
+        self.rows = (self.rows or 0) + batch.num_rows
+        self.bytes_received += batch.nbytes
+
+    def finish(self, error=None):
+        if self._finished:
+            return
+        self._finished = True
+        if not _sinks:
+            return
+        status = self.status
+        if status is None:
+            status = "ok" if error is None else type(error).__name__
+        emit(
+            CallEvent(
+                self.transport,
+                self.endpoint,
+                self.method,
+                status,
+                time.time() - self.start,
+                self.bytes_sent,
+                self.bytes_received,
+                self.retries,
+                self.rows,
+                None if error is None else repr(error),
+                self.url,
+                self.start,
+                self.decode,
+            )
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # GeneratorExit and KeyboardInterrupt mean the caller stopped early rather than that the call failed
+        self.finish(exc_val if isinstance(exc_val, Exception) else None)
+
+
+def rest_call(method, url):
+    return Call("rest", endpoint_template(url), method, url)
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class StatsCollector(object):
+    """
+    in process sink aggregating events per transport and endpoint
+
+    :param max_samples: number of most recent latencies kept per endpoint for percentiles
+    """
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._stats = dict()
+
+    def __call__(self, event):
+        key = "{} {}".format(event.transport, event.endpoint)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = collections.Counter(), collections.deque(maxlen=self.max_samples)
+            counts, latencies = stats
+            counts["count"] += 1
+            counts["errors"] += 0 if event.ok else 1
+            counts["latency"] += event.latency
+            counts["bytes_sent"] += event.bytes_sent
+            counts["bytes_received"] += event.bytes_received
+            counts["retries"] += event.retries
+            counts["rows"] += event.rows or 0
+            latencies.append(event.latency)
+
+    def snapshot(self):
+        """
+        :return: dict of "transport endpoint" to a dict of count, errors, retries, bytes_sent, bytes_received, rows,
+                 mean, p50, p95, p99 and max latency in seconds
+        """
+        result = dict()
+        with self._lock:
+            for key, (counts, latencies) in self._stats.items():
+                ordered = sorted(latencies)
+                summary = {k: counts[k] for k in ("count", "errors", "retries", "bytes_sent", "bytes_received", "rows")}
+                summary["mean"] = counts["latency"] / counts["count"]
+                summary["p50"] = _percentile(ordered, 0.5)
+                summary["p95"] = _percentile(ordered, 0.95)
+                summary["p99"] = _percentile(ordered, 0.99)
+                summary["max"] = ordered[-1]
+                result[key] = summary
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class Recorder(object):
+    """
+    sink keeping every event along with the thread it was made on, eg to profile a single command
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.events = list()
+
+    def __call__(self, event):
+        self.record(event)
+
+    def record(self, event, thread=None):
+        with self._lock:
+            self.events.append((thread or threading.current_thread().ident, event))
+
+    def chrome_trace(self):
+        """
+        :return: dict in the Chrome trace event format, write it as json and open it in chrome://tracing or Perfetto
+        """
+        pid = os.getpid()
+        trace = list()
+        for thread, event in self.events:
+            args = {k: v for k, v in attr.asdict(event).items() if v is not None and k not in ("start", "latency")}
+            trace.append(
+                {
+                    "name": "{} {}".format(event.method, event.endpoint) if event.method else event.endpoint,
+                    "cat": event.transport,
+                    "ph": "X",
+                    "ts": int(event.start * 1e6),
+                    "dur": int(event.latency * 1e6),
+                    "pid": pid,
+                    "tid": thread,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+class PrometheusSink(object):
+    """
+    export events as prometheus counters and a latency histogram. Requires prometheus_client
+
+    :param registry: prometheus registry, the default registry if None
+    :param namespace: metric name prefix
+    :param buckets: latency histogram buckets in seconds
+    """
+
+    def __init__(self, registry=None, namespace="dremio_client", buckets=None):
+        if prometheus_client is None:
+            raise NotImplementedError("PrometheusSink requires prometheus_client")
+        kwargs = dict(namespace=namespace)
+        if registry is not None:
+            kwargs["registry"] = registry
+        labels = ["transport", "endpoint"]
+        self.calls = prometheus_client.Counter("calls", "calls made", labels + ["method", "status"], **kwargs)
+        self.latency = prometheus_client.Histogram(
+            "call_latency_seconds",
+            "call latency",
+            labels,
+            buckets=buckets or prometheus_client.Histogram.DEFAULT_BUCKETS,
+            **kwargs
+        )
+        self.bytes_sent = prometheus_client.Counter("sent_bytes", "request bytes sent", labels, **kwargs)
+        self.bytes_received = prometheus_client.Counter("received_bytes", "response bytes received", labels, **kwargs)
+        self.retries = prometheus_client.Counter("retries", "calls retried", labels, **kwargs)
+        self.rows = prometheus_client.Counter("rows", "result rows received", labels, **kwargs)
+
+    def __call__(self, event):
+        labels = (event.transport, event.endpoint)
+        self.calls.labels(*(labels + (event.method or "", str(event.status)))).inc()
+        self.latency.labels(*labels).observe(event.latency)
+        self.bytes_sent.labels(*labels).inc(event.bytes_sent)
+        self.bytes_received.labels(*labels).inc(event.bytes_received)
+        self.retries.labels(*labels).inc(event.retries)
+        if event.rows:
+            self.rows.labels(*labels).inc(event.rows)
+
+
+class OpenTelemetrySink(object):
+    """
+    record each event as an opentelemetry span under the current context. Requires opentelemetry-api
+
+    :param tracer: tracer to use, the global tracer provider's dremio_client tracer if None
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            if otel_trace is None:
+                raise NotImplementedError("OpenTelemetrySink requires opentelemetry-api")
+            tracer = otel_trace.get_tracer("dremio_client")
+        self.tracer = tracer
+
+    def __call__(self, event):
+        start = int(event.start * 1e9)
+        attributes = {
+            "dremio.transport": event.transport,
+            "dremio.endpoint": event.endpoint,
+            "dremio.status": str(event.status),
+            "dremio.retries": event.retries,
+            "dremio.bytes_sent": event.bytes_sent,
+            "dremio.bytes_received": event.bytes_received,
+        }
+        if event.method:
+            attributes["http.method"] = event.method
+        if isinstance(event.status, int):
+            attributes["http.status_code"] = event.status
+        if event.rows is not None:
+            attributes["dremio.rows"] = event.rows
+        name = " ".join(i for i in (event.method, event.endpoint) if i) if event.transport == "rest" else event.endpoint
+        span = self.tracer.start_span("dremio {} {}".format(event.transport, name), start_time=start, attributes=attributes)
+        if not event.ok and otel_trace is not None:
+            span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, event.error))
+        span.end(end_time=start + int(event.latency * 1e9))
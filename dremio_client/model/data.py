@@ -22,19 +22,26 @@
 # specific language governing permissions and limitations
 # under the License.
 #
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 import attr
-import simplejson as json
+from six import string_types
 from six.moves.urllib.parse import quote
 
+from .. import codec
 from ..error import DremioException
 from ..util import refresh_metadata
+from ..util.lineage import get_lineage_graph
+from ..util.sql import conjunction, partition_candidates, partition_predicates, quote_identifier, where
 from .endpoints import (
     catalog_item,
     graph,
     collaboration_tags,
     collaboration_wiki,
     delete_catalog,
+    reflections,
     refresh_pds,
     set_catalog,
     update_catalog,
@@ -53,7 +60,7 @@ class VoteMetadata(object):
     entityType = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -66,7 +73,7 @@ class QueueMetadata(object):
     maxStartTimeoutMs = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -79,7 +86,7 @@ class RuleMetadata(object):
     id = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -99,7 +106,7 @@ class ReflectionSummaryMetadata(object):
     status = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -125,7 +132,7 @@ class ReflectionMetadata(object):
     partitionDistributionStrategy = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -133,7 +140,7 @@ class RootMetaData(object):
     id = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -142,7 +149,7 @@ class WikiData(object):
     version = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -151,7 +158,7 @@ class TagsData(object):
     version = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -163,7 +170,7 @@ class MetadataPolicy(object):
     datasetUpdateMode = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -172,7 +179,7 @@ class AccessControl(object):
     permissions = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -182,7 +189,7 @@ class AccessControlList(object):
     version = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -191,7 +198,7 @@ class SourceState(object):
     message = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -211,7 +218,7 @@ class DatasetMetaData(object):
     accessControlList = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -224,7 +231,7 @@ class SpaceMetaData(object):
     accessControlList = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -236,7 +243,7 @@ class FolderMetaData(object):
     accessControlList = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -247,7 +254,7 @@ class FileMetaData(object):
     accessControlList = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 @attr.s
@@ -270,7 +277,7 @@ class SourceMetadata(object):
     accessControlList = attr.ib(default=None)
 
     def to_json(self):
-        return json.dumps(attr.asdict(self))
+        return codec.dumps(attr.asdict(self))
 
 
 def _clean(string):
@@ -475,7 +482,7 @@ class Catalog(dict):
                 pass
         if len(children) > 1:
             result["children"] = children
-        return json.dumps(result)
+        return codec.dumps(result)
 
     def __getattr__(self, item):
         if item == "_ipython_canary_method_should_not_exist_":
@@ -754,11 +761,19 @@ class Dataset(Catalog):
             accessControlList=_get_acls(kwargs.get("accessControlList")),
         )
 
-    def get_graph(self):
-        try:
-            return graph(self._token, self._base_url, self.meta.id, ssl_verify=self._ssl_verify)
-        except Exception:  # NOQA
-            return graph(self._token, self._base_url, path=self.meta.path, ssl_verify=self._ssl_verify)
+    def get_graph(self, cached=False):
+        """ parents and children of this dataset
+
+        :param cached: answer from the process wide lineage graph, fetching only on first use (see
+                       dremio_client.util.lineage.LineageGraph)
+        :return: graph json
+        """
+        cid = self.meta.id
+        if not cid:
+            cid = catalog_item(self._token, self._base_url, path=self.meta.path, ssl_verify=self._ssl_verify)["id"]
+        if cached:
+            return get_lineage_graph(self._token, self._base_url, self._ssl_verify).graph(cid)
+        return graph(self._token, self._base_url, cid, ssl_verify=self._ssl_verify)
 
     def get_table(self):
         return '.'.join('"{0}"'.format(w) for w in self.meta.path)
@@ -766,8 +781,214 @@ class Dataset(Catalog):
     def query(self):
         return self.sql("select * from " + self.get_table() + " limit 1000")
 
-    def sql(self, sql):
-        return self._flight_endpoint(sql)
+    def sql(self, sql, **kwargs):
+        return self._flight_endpoint(sql, **kwargs)
+
+    def field_names(self):
+        """ names of the columns of this dataset, fetching its catalog entry if needed
+
+        :return: list of column names or None if Dremio has not reported the fields
+        """
+        if self.meta.fields is None:
+            self.get()
+        if self.meta.fields is None:
+            return None
+        return [f["name"] for f in self.meta.fields]
+
+    def schema(self, columns=None):
+        """ arrow schema of this dataset without fetching any data
+
+        Built from the field types in the catalog entry when they are available, otherwise read from the flight
+        plan of a scan (GetFlightInfo), which does not fetch any rows. Without flight an empty (LIMIT 0) scan is run
+        and closed once its schema is read
+
+        :param columns: only include these columns (optional)
+        :return: pyarrow.Schema
+        """
+        if self.field_names() is not None and all("type" in f for f in self.meta.fields):
+            from ..util.decode import arrow_schema
+
+            fields = {f["name"]: f for f in self.meta.fields}
+            return arrow_schema([fields[c] for c in self._check_columns(columns)] if columns else self.meta.fields)
+        try:
+            return self.sql(self.scan_sql(columns), output="schema")
+        except NotImplementedError:
+            pass
+        with self.scan(columns, limit=0) as result:
+            return result.schema
+
+    def scan_sql(self, columns=None, filter=None, limit=None):
+        """ build the sql for a projected and filtered scan of this dataset, see scan
+
+        :return: sql string
+        """
+        columns = self._check_columns(columns)
+        projection = ", ".join(quote_identifier(c) for c in columns) if columns else "*"
+        sql = "SELECT {} FROM {}".format(projection, self.get_table())
+        predicate = where(filter)
+        if predicate:
+            sql += " WHERE " + predicate
+        if limit is not None:
+            sql += " LIMIT {}".format(int(limit))
+        return sql
+
+    def scan(self, columns=None, filter=None, limit=None, output="resultset", **kwargs):
+        """ read some columns and rows of this dataset
+
+        Only the requested columns are selected so wide tables aren't pulled over the wire in full. By default a
+        dremio_client.util.ResultSet is returned: its schema is known before any data is read and batches stream in
+        as they are iterated.
+
+        :example:
+
+        >>> result = dataset.scan(["id", "amount"], filter={"region": "EU"}, limit=1000)
+        >>> result.schema
+        >>> for batch in result: ...
+
+        :param columns: list of column names, all columns if None. Checked against the dataset's fields
+        :param filter: sql predicate string, or dict of column to value (None for IS NULL, a list for IN)
+        :param limit: maximum number of rows (optional)
+        :param output: resultset (default), pandas, arrow, polars or numpy
+        :param kwargs: passed to the client's query eg method, progress, cancel
+        :raise: KeyError if a column isn't a field of the dataset
+        :return: ResultSet or converted result
+        """
+        return self.sql(self.scan_sql(columns, filter, limit), output=output, **kwargs)
+
+    def count(self, filter=None, **kwargs):
+        """ number of rows in this dataset
+
+        :param filter: sql predicate string or dict, see scan (optional)
+        :param kwargs: passed to the client's query eg method
+        :return: int
+        """
+        predicate = where(filter)
+        sql = "SELECT COUNT(*) AS \"n\" FROM {}{}".format(self.get_table(), " WHERE " + predicate if predicate else "")
+        return self.sql(sql, output="arrow", **kwargs).column(0)[0].as_py()
+
+    def sample(self, n=None, fraction=None, columns=None, filter=None, output=None, **kwargs):
+        """ uniform random sample of the rows of this dataset
+
+        A fraction keeps each row with that probability. For a fixed size sample the dataset is counted first and
+        rows are kept with a probability slightly above n / count, so the LIMIT is almost always filled without
+        sorting the whole dataset by a random key.
+
+        :param n: number of rows to sample
+        :param fraction: fraction of rows to sample, between 0 and 1
+        :param columns: list of column names, all columns if None
+        :param filter: sample only rows matching this predicate string or dict (optional)
+        :param output: pandas, arrow, polars, numpy or resultset. The client default if None
+        :param kwargs: passed to the client's query eg method
+        :raise: ValueError unless exactly one of n and fraction is given
+        :return: converted result
+        """
+        if (n is None) == (fraction is None):
+            raise ValueError("exactly one of n and fraction must be given")
+        limit = None
+        if n is not None:
+            total = self.count(filter, **kwargs)
+            fraction = 1.0 if not total else min(1.0, (n + 3 * math.sqrt(n) + 10) / float(total))
+            limit = n
+        if not 0 <= fraction <= 1:
+            raise ValueError("fraction must be between 0 and 1")
+        predicate = conjunction(filter, None if fraction >= 1 else "RAND() < {!r}".format(fraction))
+        return self.sql(self.scan_sql(columns, predicate, limit), output=output, **kwargs)
+
+    def partition_column(self):
+        """ the column used to split this dataset for parallel reads
+
+        The partition fields of the dataset's reflections are preferred, then key like integer columns, then
+        dates and other numeric columns
+
+        :return: column name or None if no column is suitable
+        """
+        candidates = partition_candidates(self.meta.fields if self.field_names() else None, self._reflection_fields())
+        return candidates[0] if candidates else None
+
+    def _reflection_fields(self):
+        try:
+            refs = reflections(self._token, self._base_url, ssl_verify=self._ssl_verify)
+        except Exception:  # NOQA
+            return list()
+        fields = list()
+        for ref in refs.get("data", list()):
+            if ref.get("datasetId") == self.meta.id:
+                fields.extend(f["name"] for f in ref.get("partitionFields") or list() if f.get("name") not in fields)
+        return fields
+
+    def partition_predicates(self, column=None, partitions=4, filter=None, strategy="minmax", **kwargs):
+        """ split this dataset into contiguous ranges of a column, see dremio_client.util.sql.partition_predicates
+
+        :param column: column to split on, see partition_column if None
+        :param partitions: number of ranges
+        :param filter: only consider rows matching this predicate string or dict (optional)
+        :param strategy: minmax (equal width ranges) or ntile (equal row counts)
+        :param kwargs: passed to the client's query eg method
+        :return: list of predicate strings, [None] if the dataset has no suitable column
+        """
+        column = column or self.partition_column()
+        if column is None:
+            return [None]
+        return partition_predicates(
+            lambda sql: self.sql(sql, output="arrow", **kwargs), self.get_table(), column, partitions, strategy, filter
+        )
+
+    def export(
+        self,
+        path,
+        file_format="parquet",
+        chunk_rows=None,
+        columns=None,
+        filter=None,
+        partition_column=None,
+        partitions=None,
+        max_workers=4,
+        **kwargs
+    ):
+        """ export this dataset to local files over several concurrent streams
+
+        The dataset is split into ranges of partition_column (see partition_predicates) and each range is streamed
+        to its own sub directory of path by one of max_workers concurrent queries. Only one batch per stream is
+        held in memory.
+
+        :param path: directory to write into
+        :param file_format: parquet (default) or arrow
+        :param chunk_rows: start a new file every chunk_rows rows (optional)
+        :param columns: list of column names, all columns if None
+        :param filter: export only rows matching this predicate string or dict (optional)
+        :param partition_column: column to split on, chosen automatically if None
+        :param partitions: number of ranges, defaults to max_workers
+        :param max_workers: number of concurrent streams
+        :param kwargs: passed to the client's query eg method
+        :return: memory mapped pyarrow dataset over the written files
+        """
+        from ..util.spill import open_dataset
+
+        if partitions is None:
+            partitions = max_workers
+        predicates = self.partition_predicates(partition_column, partitions, filter, **kwargs)
+
+        def write(i):
+            sql = self.scan_sql(columns, conjunction(filter, predicates[i]))
+            result = self.sql(sql, output="resultset", **kwargs)
+            return result.write(os.path.join(path, "range-{:05d}".format(i)), file_format, chunk_rows)
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            written = list(executor.map(write, range(len(predicates))))
+        files = [f for dataset in written for f in dataset.files]
+        return open_dataset(files, file_format, written[0].schema)
+
+    def _check_columns(self, columns):
+        if not columns:
+            return columns
+        if isinstance(columns, string_types):
+            columns = [columns]
+        names = self.field_names()
+        if names is not None:
+            missing = [c for c in columns if c not in names]
+            if missing:
+                raise KeyError("{} not in the fields of {}: {}".format(missing, self.get_table(), names))
+        return list(columns)
 
 
 class PhysicalDataset(Dataset):
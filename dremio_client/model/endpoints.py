@@ -22,63 +22,199 @@
 # specific language governing permissions and limitations
 # under the License.
 #
+import time
+import zlib
+
 import requests
-import json as jsonlib
 from requests.exceptions import HTTPError
-from six.moves.urllib.parse import quote
+from six.moves import http_cookiejar
+from six.moves.urllib.parse import quote, urlparse
 
+from .. import codec, instrument
 from ..error import (
     DremioBadRequestException,
+    DremioConflictException,
     DremioException,
     DremioNotFoundException,
     DremioPermissionException,
     DremioUnauthorizedException,
 )
 
+try:
+    from urllib3.util.request import ACCEPT_ENCODING  # includes br/zstd when a decoder is installed
+except ImportError:
+    ACCEPT_ENCODING = "gzip,deflate"
+
+_compression = {
+    "response": True,
+    "request": False,
+    "request_threshold": 64 * 1024,
+    "stream_threshold": 1024 * 1024,
+    "chunk_size": 64 * 1024,
+}
+# hosts which rejected a compressed request body, these are sent uncompressed from then on
+_uncompressed_hosts = set()
+# one session per process so calls reuse keep alive connections. Cookies are dropped, every call is authenticated
+# by its token alone
+_session = requests.Session()
+_session.cookies.set_policy(http_cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+
+def set_compression(**kwargs):
+    """
+    set the compression policy for REST calls
+
+    :param response: negotiate gzip/deflate/brotli encoded responses (default True)
+    :param request: gzip request bodies larger than request_threshold (default False, the server must accept them)
+    :param request_threshold: minimum size in bytes of a request body before it is compressed
+    :param stream_threshold: responses larger than this (or of unknown size) are decompressed as they stream in
+    :param chunk_size: size in bytes of each chunk read from a streamed response
+    """
+    for k, v in kwargs.items():
+        if k not in _compression:
+            raise KeyError("unknown compression setting " + k)
+        _compression[k] = v
+
+
+def configure_compression(config):
+    """
+    set the compression policy from the compression section of a confuse config
+
+    :param config: config dict from confuse
+    """
+    try:
+        settings = config["compression"].get(dict)
+    except Exception:  # NOQA
+        return
+    set_compression(**{k: v for k, v in settings.items() if v is not None})
+
 
 def _get_headers(token):
     headers = {"Authorization": "_dremio{}".format(token), "content-type": "application/json"}
+    headers["Accept-Encoding"] = ACCEPT_ENCODING if _compression["response"] else "identity"
     return headers
 
 
-def _get(url, token, details="", ssl_verify=True):
-    r = requests.get(url, headers=_get_headers(token), verify=ssl_verify)
-    return _check_error(r, details)
+def _get(url, token, details="", ssl_verify=True, decimals=False):
+    return _request("GET", url, token, details=details, ssl_verify=ssl_verify, decimals=decimals)
 
 
 def _post(url, token, json=None, details="", ssl_verify=True):
-    if isinstance(json, str):
-        json = jsonlib.loads(json)
-    r = requests.post(url, headers=_get_headers(token), verify=ssl_verify, json=json)
-    return _check_error(r, details)
+    return _request("POST", url, token, json, details, ssl_verify)
 
 
 def _delete(url, token, details="", ssl_verify=True):
-    r = requests.delete(url, headers=_get_headers(token), verify=ssl_verify)
-    return _check_error(r, details)
+    return _request("DELETE", url, token, details=details, ssl_verify=ssl_verify)
 
 
 def _put(url, token, json=None, details="", ssl_verify=True):
-    if isinstance(json, str):
-        json = jsonlib.loads(json)
-    r = requests.put(url, headers=_get_headers(token), verify=ssl_verify, json=json)
-    return _check_error(r, details)
+    return _request("PUT", url, token, json, details, ssl_verify)
+
 
 def _patch(url, token, json=None, details="", ssl_verify=True):
+    return _request("PATCH", url, token, json, details, ssl_verify)
+
+
+def _request(method, url, token, json=None, details="", ssl_verify=True, decimals=False):
+    call = instrument.rest_call(method, url)
+    current = str(token)
+    try:
+        try:
+            return _send(method, url, current, json, details, ssl_verify, call, decimals)
+        except DremioUnauthorizedException:
+            # a managed token may have expired early or been revoked: log in once more and replay the request
+            if not hasattr(token, "invalidate"):
+                raise
+        call.retries += 1
+        return _send(method, url, token.invalidate(current), json, details, ssl_verify, call, decimals)
+    except Exception as e:
+        call.finish(e)
+        raise
+    finally:
+        call.finish()
+
+
+def _send(method, url, token, json=None, details="", ssl_verify=True, call=None, decimals=False):
+    headers = _get_headers(token)
+    body = _encode(json)
+    compressed = _compress_body(url, body)
+    if compressed is not None:
+        r = _session.request(
+            method,
+            url,
+            headers=dict(headers, **{"Content-Encoding": "gzip"}),
+            verify=ssl_verify,
+            data=compressed,
+            stream=True,
+        )
+        if r.status_code != 415:
+            _record(call, r, compressed)
+            return _check_error(r, details, call, decimals)
+        r.close()
+        _uncompressed_hosts.add(urlparse(url).netloc)
+        if call is not None:
+            call.retries += 1
+    r = _session.request(method, url, headers=headers, verify=ssl_verify, data=body, stream=True)
+    _record(call, r, body)
+    return _check_error(r, details, call, decimals)
+
+
+def _record(call, r, body):
+    if call is not None:
+        call.status = r.status_code
+        call.bytes_sent = len(body) if body else 0
+
+
+def _encode(json):
+    if json is None:
+        return None
     if isinstance(json, str):
-        json = jsonlib.loads(json)
-    r = requests.patch(url, headers=_get_headers(token) ,verify=ssl_verify, json=json)
-    return _check_error(r, details)
+        json = codec.loads(json)
+    return codec.dumps(json).encode("utf-8")
 
 
-def _check_error(r, details=""):
+def _compress_body(url, body):
+    if not _compression["request"] or body is None or len(body) < _compression["request_threshold"]:
+        return None
+    if urlparse(url).netloc in _uncompressed_hosts:
+        return None
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    return compressor.compress(body) + compressor.flush()
+
+
+def _read_body(r):
+    try:
+        length = int(r.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        length = None
+    if length is not None and length < _compression["stream_threshold"]:
+        return r.content
+    # large or chunked responses are decompressed chunk by chunk into one buffer. The buffer itself is returned,
+    # json and orjson parse it without the copy a conversion to bytes would make
+    body = bytearray()
+    for chunk in r.iter_content(_compression["chunk_size"]):
+        body.extend(chunk)
+    r.close()
+    return body
+
+
+def _check_error(r, details="", call=None, decimals=False):
     error, code, _ = _raise_for_status(r)
     if not error:
+        body = _read_body(r)
+        start = time.time()
         try:
-            data = r.json()
-            return data
-        except:  # NOQA
-            return r.text
+            return codec.loads(body, decimals)
+        except ValueError:
+            return body.decode(r.encoding or "utf-8", "replace")
+        finally:
+            if call is not None:
+                call.bytes_received = len(body)
+                call.decode = time.time() - start
+    # responses are streamed: read the error body so the connection goes back to the pool. It stays available to
+    # the exception as response.text
+    r.content
+    r.close()
     if code == 400:
         raise DremioBadRequestException("Requested object does not exist on entity " + details, error, r)
     if code == 401:
@@ -87,6 +223,8 @@ def _check_error(r, details=""):
         raise DremioPermissionException("Not permissioned to view entity at " + details, error, r)
     if code == 404:
         raise DremioNotFoundException("No entity exists at " + details, error, r)
+    if code == 409:
+        raise DremioConflictException("Entity was modified concurrently " + details, error, r)
     raise DremioException("unknown error", error)
 
 
@@ -151,7 +289,7 @@ def job_status(token, base_url, job_id, ssl_verify=True):
     return _get(base_url + "/api/v3/job/{}".format(job_id), token, ssl_verify=ssl_verify)
 
 
-def job_results(token, base_url, job_id, offset=0, limit=100, ssl_verify=True):
+def job_results(token, base_url, job_id, offset=0, limit=100, ssl_verify=True, decimals=False):
     """fetch job results
 
     https://docs.dremio.com/rest-api/jobs/get-job.html
@@ -162,12 +300,14 @@ def job_results(token, base_url, job_id, offset=0, limit=100, ssl_verify=True):
     :param offset: offset of result set to return
     :param limit: number of results to return (max 500)
     :param ssl_verify: ignore ssl errors if False
+    :param decimals: parse fractional numbers as exact decimal.Decimal rather than float
     :return: result object
     """
     return _get(
         base_url + "/api/v3/job/{}/results?offset={}&limit={}".format(job_id, offset, limit),
         token,
         ssl_verify=ssl_verify,
+        decimals=decimals,
     )
 
 
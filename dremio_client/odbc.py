@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-import logging
-
 #
 # Copyright (c) 2019 Ryan Murray.
 #
@@ -24,7 +22,36 @@ import logging
 # specific language governing permissions and limitations
 # under the License.
 #
+import datetime
+import decimal
+import logging
 import sys
+import threading
+
+from . import instrument
+from .util.convert import convert_table, output_type
+from .util.pool import ConnectionPool as _ConnectionPool
+from .util.profile import QueryProfile
+from .util.resultset import ResultSet
+
+try:
+    import pyodbc
+
+    NO_ODBC = False
+except ImportError:
+    NO_ODBC = True
+
+try:
+    import pyarrow as pa
+
+    NO_ARROW = False
+except ImportError:
+    NO_ARROW = True
+
+try:
+    from arrow_odbc import read_arrow_batches_from_odbc
+except ImportError:
+    read_arrow_batches_from_odbc = None
 
 
 _WINDOWS_DRIVER = "Dremio Connector"
@@ -33,9 +60,13 @@ _LINUX32_DRIVER = "Dremio ODBC Driver 32-bit"
 _LINUX64_DRIVER = "Dremio ODBC Driver 64-bit"
 _DRIVER = None
 
+DEFAULT_BATCH_SIZE = 64 * 1024
+
 
 def _get_driver_name():
     global _DRIVER
+    if _DRIVER is not None:
+        return
     if "linux" in sys.platform:
         if sys.maxsize > 2 ** 32:
             _DRIVER = _LINUX64_DRIVER
@@ -48,53 +79,260 @@ def _get_driver_name():
     logging.debug("Using %s as the odbc driver", _DRIVER)
 
 
-try:
-    import pyodbc
-    import pandas
-
-    def connect(hostname="localhost", port=31010, username="dremio", password="dremio123"):
-        """
-        Connect to and authenticate against Dremio's odbc server. Auth is skipped if username is None
-
-        :param hostname: Dremio coordinator hostname
-        :param port: Dremio coordinator port
-        :param username: Username on Dremio
-        :param password: Password on Dremio
-        :return: arrow flight client
-        """
-        _get_driver_name()
-        c = pyodbc.connect(
-            "Driver={};ConnectionType=Direct;HOST={};PORT={};AuthenticationType=Plain;UID={};PWD={}".format(
-                _DRIVER, hostname, port, username, "{" + password + "}"
-            ),
-            autocommit=True,
-        )
+class ConnectionPool(_ConnectionPool):
+    """
+    A thread-safe pool of odbc connections, see dremio_client.util.pool.ConnectionPool
 
-        return c
+    :param health_check: sql run to check a connection is alive
+    """
 
-    def query(sql, client=None, hostname="localhost", port=31010, username="dremio", password="dremio123"):
-        """
-        Run an sql query against Dremio and return a pandas dataframe
+    def __init__(self, connect, max_size=4, max_idle=300, max_lifetime=3600, check_after=30, health_check="SELECT 1"):
+        self.health_check = health_check
+        _ConnectionPool.__init__(self, connect, max_size, max_idle, max_lifetime, check_after, self._run_health_check)
 
-        Either host,port,user,pass tuple or a pre-connected client should be supplied. Not both
+    def _run_health_check(self, connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.health_check)
+            cursor.fetchall()
+        finally:
+            cursor.close()
 
-        :param sql: sql query to execute on dremio
-        :param client: pre-connected client (optional)
-        :param hostname: Dremio coordinator hostname (optional)
-        :param port: Dremio coordinator port (optional)
-        :param username: Username on Dremio (optional)
-        :param password: Password on Dremio (optional)
-        :return:
-        """
-        if not client:
-            client = connect(hostname, port, username, password)
-        return pandas.read_sql(sql, client)
 
+_pools = dict()
+_pools_lock = threading.Lock()
 
-except ImportError:
 
-    def connect(*args, **kwargs):
-        raise NotImplementedError("Python Flight bindings require Python 3 and pyarrow > 0.14.0")
+def get_pool(hostname="localhost", port=31010, username="dremio", password="dremio123", **kwargs):
+    """
+    return the process wide odbc connection pool for a server and user, creating it if needed
+
+    :param hostname: Dremio coordinator hostname
+    :param port: Dremio odbc port
+    :param username: Username on Dremio
+    :param password: Password on Dremio
+    :param kwargs: passed to ConnectionPool when the pool is created
+    :return: ConnectionPool
+    """
+    key = (hostname, port, username)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(lambda: connect(hostname, port, username, password), **kwargs)
+        return _pools[key]
+
+
+def close_pools():
+    """
+    close and forget every process wide odbc connection pool
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _arrow_type(pa, description):
+    _, type_code, _, _, precision, scale = description[:6]
+    if type_code is bool:
+        return pa.bool_()
+    if type_code is int:
+        return pa.int64()
+    if type_code is float:
+        return pa.float64()
+    if type_code is decimal.Decimal:
+        return pa.decimal128(precision or 38, scale or 0)
+    if type_code is datetime.datetime:
+        return pa.timestamp("us")
+    if type_code is datetime.date:
+        return pa.date32()
+    if type_code is datetime.time:
+        return pa.time64("us")
+    if type_code in (bytes, bytearray):
+        return pa.binary()
+    if type_code is str:
+        return pa.string()
+    return None
+
+
+def cursor_batches(cursor, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    fetch the result of an executed DB-API cursor as arrow record batches
+
+    Rows are fetched batch_size at a time with fetchmany and transposed into one arrow array per column, typed
+    from cursor.description, rather than being turned into python objects cell by cell. Columns of a type with no
+    arrow equivalent are read as strings. An empty result yields a single empty batch so the schema is always
+    available.
+
+    :param cursor: cursor on which execute has been called
+    :param batch_size: number of rows fetched per round trip and per record batch
+    :return: generator of pyarrow.RecordBatch
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise NotImplementedError("Columnar odbc fetch requires pyarrow > 0.15.0")
+    types = [_arrow_type(pa, d) for d in cursor.description]
+    schema = pa.schema([pa.field(d[0], dtype or pa.string()) for d, dtype in zip(cursor.description, types)])
+    empty = True
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        empty = False
+        arrays = list()
+        for column, dtype, field in zip(zip(*rows), types, schema):
+            if dtype is None:
+                column = [None if v is None else str(v) for v in column]
+            arrays.append(pa.array(column, field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+    if empty:
+        yield pa.RecordBatch.from_arrays([pa.array([], f.type) for f in schema], schema=schema)
+
+
+def _check_odbc():
+    if NO_ODBC:
+        raise NotImplementedError("ODBC bindings require pyodbc and the Dremio ODBC driver")
+
+
+def _connection_string(hostname, port, username, password):
+    _get_driver_name()
+    return "Driver={};ConnectionType=Direct;HOST={};PORT={};AuthenticationType=Plain;UID={};PWD={}".format(
+        _DRIVER, hostname, port, username, "{" + password + "}"
+    )
+
+
+def connect(hostname="localhost", port=31010, username="dremio", password="dremio123"):
+    """
+    Connect to and authenticate against Dremio's odbc server. Auth is skipped if username is None
+
+    :param hostname: Dremio coordinator hostname
+    :param port: Dremio coordinator port
+    :param username: Username on Dremio
+    :param password: Password on Dremio
+    :return: arrow flight client
+    """
+    _check_odbc()
+    c = pyodbc.connect(_connection_string(hostname, port, username, password), autocommit=True)
+
+    return c
+
+
+def iter_batches(
+    sql,
+    client=None,
+    hostname="localhost",
+    port=31010,
+    username="dremio",
+    password="dremio123",
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """
+    Run an sql query against Dremio and stream the result as arrow record batches
+
+    If arrow-odbc is installed and no client is given it is used to fill arrow buffers directly from the driver,
+    otherwise rows are fetched with fetchmany on a pooled (or the given) connection, see cursor_batches.
+    arrow-odbc can only open connections itself, from a connection string, so each query it runs connects and logs
+    in again rather than using the pool. Pass a client, eg from get_pool().connection(), to reuse connections.
+
+    :param sql: sql query to execute on dremio
+    :param client: pre-connected client (optional)
+    :param hostname: Dremio coordinator hostname (optional)
+    :param port: Dremio coordinator port (optional)
+    :param username: Username on Dremio (optional)
+    :param password: Password on Dremio (optional)
+    :param batch_size: rows per record batch
+    :return: generator of pyarrow.RecordBatch
+    """
+    _check_odbc()
+    call = instrument.Call("odbc", "query")
+    call.bytes_sent = len(sql)
+    with call:
+        for batch in _batches(sql, client, hostname, port, username, password, batch_size):
+            call.add_batch(batch)
+            yield batch
+
+
+def _batches(sql, client, hostname, port, username, password, batch_size):
+    if client:
+        for batch in _execute(client, sql, batch_size):
+            yield batch
+    elif read_arrow_batches_from_odbc is not None:
+        # arrow-odbc opens its own odbc connection from a connection string and can't be handed a pyodbc
+        # connection, so this path doesn't use the pool
+        reader = read_arrow_batches_from_odbc(
+            query=sql,
+            connection_string=_connection_string(hostname, port, username, password),
+            batch_size=batch_size,
+        )
+        for batch in reader:
+            yield batch
+    else:
+        with get_pool(hostname, port, username, password).connection() as connection:
+            for batch in _execute(connection, sql, batch_size):
+                yield batch
+
+
+def _execute(connection, sql, batch_size):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql)
+        for batch in cursor_batches(cursor, batch_size):
+            yield batch
+    finally:
+        cursor.close()
+
+
+def query(
+    sql,
+    client=None,
+    hostname="localhost",
+    port=31010,
+    username="dremio",
+    password="dremio123",
+    pandas=True,
+    batch_size=DEFAULT_BATCH_SIZE,
+    output=None,
+    pandas_options=None,
+    profile=None,
+):
+    """
+    Run an sql query against Dremio and return a pandas dataframe or arrow table
+
+    Either host,port,user,pass tuple or a pre-connected client should be supplied. Not both.
+    Without a client the connection is borrowed from the shared pool for host, port and user (see get_pool),
+    unless arrow-odbc is installed, see iter_batches
+
+    :param sql: sql query to execute on dremio
+    :param client: pre-connected client (optional)
+    :param hostname: Dremio coordinator hostname (optional)
+    :param port: Dremio coordinator port (optional)
+    :param username: Username on Dremio (optional)
+    :param password: Password on Dremio (optional)
+    :param pandas: return a pandas dataframe (default) or an arrow table
+    :param batch_size: rows fetched per round trip
+    :param output: pandas, arrow, polars, numpy or resultset. Overrides the pandas flag if given.
+                   A resultset streams batches from the server as they are read
+    :param pandas_options: dict of options for dremio_client.util.convert.convert_table eg self_destruct
+    :param profile: dremio_client.util.QueryProfile to record the fetch and convert phases in (optional)
+    :return: converted result
+    """
+    _check_odbc()
+    if profile is None:
+        profile = QueryProfile(sql)
+    profile.method = "odbc"
+    if output == "resultset":
+        batches = iter_batches(sql, client, hostname, port, username, password, batch_size)
+        return ResultSet(profile.iter(batches), method="odbc", profile=profile)
+    if NO_ARROW:
+        import pandas
 
-    def query(*args, **kwargs):
-        raise NotImplementedError("Python Flight bindings require Python 3 and pyarrow > 0.14.0")
+        with instrument.Call("odbc", "query"), profile.phase("fetch"):
+            if client:
+                return pandas.read_sql(sql, client)
+            with get_pool(hostname, port, username, password).connection() as connection:
+                return pandas.read_sql(sql, connection)
+    batches = list(profile.iter(iter_batches(sql, client, hostname, port, username, password, batch_size)))
+    table = pa.Table.from_batches(batches) if batches else pa.table({})
+    with profile.phase("convert"):
+        return convert_table(table, output_type(pandas, output), **(pandas_options or {}))
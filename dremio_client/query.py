@@ -31,9 +31,25 @@ try:
 except ImportError:
     NO_PANDAS = True
 
+try:
+    import pyarrow  # NOQA
+
+    NO_ARROW = False
+except ImportError:
+    NO_ARROW = True
+
+from .error import DremioCancelledException
 from .flight import query as _flight_query
+from .odbc import iter_batches as _odbc_batches
 from .odbc import query as _odbc_query
 from .util import run as _rest_query
+from .util.convert import convert_table, output_type
+from .util.decode import decode_pages, iter_batches
+from .util.profile import QueryProfile
+from .util.resultset import ResultSet
+from .util.spill import write_batches
+
+MAX_PAGE_SIZE = 500
 
 
 def query(
@@ -49,22 +65,149 @@ def query(
     pandas=True,
     method="flight",
     context=None,
+    output_path=None,
+    output_format="arrow",
+    max_rows_per_file=None,
+    output=None,
+    pandas_options=None,
+    batch_size=None,
+    progress=None,
+    cancel=None,
+    profile=False,
+):
+    """
+    Run an sql query over flight, odbc or rest, downgrading to the next method if one fails
+
+    If output_path is given the result is streamed to Arrow IPC or Parquet files in that directory rather than
+    being held in memory and a memory mapped pyarrow dataset over those files is returned.
+
+    :param output_path: directory to spill the result into (optional)
+    :param output_format: arrow (Arrow IPC) or parquet. Only used with output_path
+    :param max_rows_per_file: start a new file every max_rows_per_file rows. Only used with output_path
+    :param output: pandas, arrow, polars, numpy or resultset. Overrides the pandas flag if given. A resultset
+                   (dremio_client.util.ResultSet) is produced the same way by all three transports and streams
+                   batches lazily. schema returns the pyarrow.Schema of the result without fetching it, over flight
+                   only
+    :param pandas_options: dict of options for dremio_client.util.convert.convert_table eg self_destruct
+    :param batch_size: rows fetched per round trip by odbc and rest, rest pages hold at most 500 rows (optional)
+    :param progress: function called with a dremio_client.flight.Progress after every flight batch (optional)
+    :param cancel: dremio_client.flight.CancellationToken to stop a flight query from another thread (optional)
+    :param profile: True to return a (result, dremio_client.util.QueryProfile) tuple, "log" to log the profile at
+                    info level instead. A resultset also carries its profile as ResultSet.profile, its fetch and
+                    convert phases keep accumulating as it is read
+    :return: converted result, list of result pages (rest without pandas) or pyarrow dataset
+    """
+    query_profile = QueryProfile(sql)
+    result = _query(
+        token,
+        base_url,
+        hostname,
+        odbc_port,
+        flight_port,
+        username,
+        password,
+        ssl_verify,
+        sql,
+        pandas,
+        method,
+        output_path,
+        output_format,
+        max_rows_per_file,
+        output,
+        pandas_options or dict(),
+        batch_size,
+        progress,
+        cancel,
+        query_profile,
+    )
+    query_profile.finish()
+    if profile == "log":
+        logging.info("%s", query_profile.summary())
+    elif profile:
+        return result, query_profile
+    return result
+
+
+def _query(
+    token,
+    base_url,
+    hostname,
+    odbc_port,
+    flight_port,
+    username,
+    password,
+    ssl_verify,
+    sql,
+    pandas,
+    method,
+    output_path,
+    output_format,
+    max_rows_per_file,
+    output,
+    pandas_options,
+    batch_size,
+    progress,
+    cancel,
+    profile,
 ):
     failed = False
     if method == "flight":
         try:
             return _flight_query(
-                sql, hostname=hostname, port=flight_port, username=username, password=password, pandas=pandas
+                sql,
+                hostname=hostname,
+                port=flight_port,
+                username=username,
+                password=password,
+                pandas=pandas,
+                output_path=output_path,
+                output_format=output_format,
+                max_rows_per_file=max_rows_per_file,
+                output=output,
+                pandas_options=pandas_options,
+                token=token,
+                progress=progress,
+                cancel=cancel,
+                profile=profile,
             )
+        except DremioCancelledException:
+            raise
         except Exception:
+            if output == "schema":
+                raise
             logging.warning("Unable to run query as flight, downgrading to odbc")
             failed = True
     if method == "odbc" or failed:
         try:
-            return _odbc_query(sql, hostname=hostname, port=odbc_port, username=username, password=password)
+            odbc_args = dict(hostname=hostname, port=odbc_port, username=username, password=password)
+            if batch_size:
+                odbc_args["batch_size"] = batch_size
+            if output_path:
+                profile.method = "odbc"
+                batches = profile.iter(_odbc_batches(sql, **odbc_args))
+                return write_batches(batches, output_path, output_format, max_rows_per_file)
+            return _odbc_query(
+                sql, pandas=pandas, output=output, pandas_options=pandas_options, profile=profile, **odbc_args
+            )
         except Exception:
             logging.warning("Unable to run query as odbc, downgrading to rest")
-    results = _rest_query(token, base_url, sql, ssl_verify=ssl_verify)
+    profile.method = "rest"
+    page_size = min(batch_size, MAX_PAGE_SIZE) if batch_size else 100
+    # results decoded to arrow keep DECIMAL columns exact, rows returned as they are keep floats
+    arrow = output_path or output is not None or (pandas and not NO_ARROW)
+    results = _rest_query(
+        token, base_url, sql, ssl_verify=ssl_verify, profile=profile, page_size=page_size, decimals=bool(arrow)
+    )
+    if output_path:
+        return write_batches(iter_batches(results), output_path, output_format, max_rows_per_file)
+    if output == "resultset":
+        return ResultSet.from_pages(results, profile=profile)
+    if output is not None or (pandas and not NO_ARROW):
+        with profile.phase("decode"):
+            table = decode_pages(results)
+        with profile.phase("convert"):
+            return convert_table(table, output_type(pandas, output), **pandas_options)
     if pandas and not NO_PANDAS:
-        return pd.concat(pd.DataFrame(i['rows']) for i in results)
+        with profile.phase("convert"):
+            return pd.concat(pd.DataFrame(i['rows']) for i in results)
     return list(results)
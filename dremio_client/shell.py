@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Interactive sql shell, started with ``dremio_client shell``.
+
+Queries run over one flight connection which stays open for the whole session (rest if flight is not available).
+Results are read in the background while the first page is shown, and pages that have been read are kept, so
+moving back and forth through a large result never runs the query again. Table names complete from the catalog,
+which is listed lazily one container at a time and cached. Each query prints how long planning, the first page and
+the whole result took.
+"""
+from __future__ import absolute_import, division, print_function
+
+import cmd
+import logging
+import re
+import threading
+import time
+
+from .model.endpoints import catalog as _catalog
+from .model.endpoints import catalog_item as _catalog_item
+from .util.profile import QueryProfile
+
+KEYWORDS = (
+    "SELECT", "FROM", "WHERE", "GROUP BY", "ORDER BY", "HAVING", "LIMIT", "OFFSET", "JOIN", "LEFT JOIN", "INNER JOIN",
+    "ON", "AS", "AND", "OR", "NOT", "IN", "IS NULL", "IS NOT NULL", "DISTINCT", "COUNT", "SUM", "AVG", "MIN", "MAX",
+    "CASE", "WHEN", "THEN", "ELSE", "END", "UNION ALL", "WITH", "DESC", "ASC",
+)
+_PLAIN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class Cursor(object):
+    """
+    pages over a stream of record batches, reading ahead in a background thread
+
+    Batches which have been read are kept so any page can be shown again without re-running the query. The reader
+    stays prefetch rows ahead of the furthest page asked for, then waits.
+
+    :param batches: iterator of pyarrow.RecordBatch
+    :param schema: pyarrow.Schema of the result
+    :param cancel: function stopping the stream early (optional)
+    :param prefetch: number of rows to read ahead
+    :param profile: QueryProfile recording the first page and fetch times (optional)
+    """
+
+    def __init__(self, batches, schema, cancel=None, prefetch=1000, profile=None):
+        self.schema = schema
+        self.prefetch = prefetch
+        self.profile = profile or QueryProfile()
+        self.first_batch = None
+        self._batches = list()
+        self._rows = 0
+        self._wanted = 0
+        self._done = False
+        self._closed = False
+        self._error = None
+        self._cancel = cancel
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._read, args=(iter(batches),))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read(self, batches):
+        try:
+            for batch in self.profile.iter(batches):
+                with self._condition:
+                    if self.first_batch is None:
+                        self.first_batch = time.time() - self.profile.start
+                    self._batches.append(batch)
+                    self._rows += batch.num_rows
+                    self._condition.notify_all()
+                    while not self._closed and self._rows - self._wanted >= self.prefetch:
+                        self._condition.wait()
+                    if self._closed:
+                        return
+        except Exception as e:  # NOQA
+            self._error = e
+        finally:
+            with self._condition:
+                self._done = True
+                self.profile.finish()
+                self._condition.notify_all()
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def rows_read(self):
+        return self._rows
+
+    def rows(self, start, count):
+        """
+        :param start: first row
+        :param count: number of rows
+        :raise: the error of the stream if it failed before start + count rows were read
+        :return: list of row tuples, shorter than count at the end of the result
+        """
+        end = start + count
+        with self._condition:
+            self._wanted = max(self._wanted, end)
+            self._condition.notify_all()
+            while self._rows < end and not self._done:
+                self._condition.wait()
+            if self._error is not None and self._rows < end:
+                raise self._error
+            batches = list(self._batches)
+        result = list()
+        offset = 0
+        for batch in batches:
+            if offset + batch.num_rows > start and offset < end:
+                piece = batch.slice(max(0, start - offset), end - max(start, offset))
+                result.extend(zip(*[column.to_pylist() for column in piece.columns]))
+            offset += batch.num_rows
+            if offset >= end:
+                break
+        return result
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._cancel is not None and not self._done:
+            try:
+                self._cancel()
+            except Exception:  # NOQA
+                pass
+
+
+class CatalogIndex(object):
+    """
+    dotted catalog paths for completion. Each container is listed the first time a name inside it is completed and
+    cached until refresh
+    """
+
+    def __init__(self, token, base_url, ssl_verify=True):
+        self._token = token
+        self._base_url = base_url
+        self._ssl_verify = ssl_verify
+        self._children = dict()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            self._children.clear()
+
+    def children(self, path):
+        """
+        :param path: tuple of names, () for the root
+        :return: names of the entries in that container, empty if it is not a container or can not be listed
+        """
+        with self._lock:
+            if path in self._children:
+                return self._children[path]
+        try:
+            if path:
+                listing = _catalog_item(self._token, self._base_url, path=list(path), ssl_verify=self._ssl_verify)
+                items = listing.get("children", [])
+            else:
+                items = _catalog(self._token, self._base_url, ssl_verify=self._ssl_verify).get("data", [])
+            names = sorted(item["path"][-1] for item in items)
+        except Exception:  # NOQA
+            names = list()
+        with self._lock:
+            self._children[path] = names
+        return names
+
+    def complete(self, text):
+        """
+        :param text: partial dotted path eg ``space.fol``
+        :return: list of completions of text
+        """
+        parts = text.split(".")
+        parent = tuple(_unquote(i) for i in parts[:-1])
+        prefix = _unquote(parts[-1]).lower()
+        head = "".join(i + "." for i in parts[:-1])
+        return [head + _quote(name) for name in self.children(parent) if name.lower().startswith(prefix)]
+
+
+def _quote(name):
+    return name if _PLAIN.match(name) else '"{}"'.format(name.replace('"', '""'))
+
+
+def _unquote(name):
+    if len(name) >= 2 and name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name.lstrip('"')
+
+
+def format_table(names, rows, max_width=40):
+    """
+    :return: rows as text with a header and columns padded to the widest value, values truncated to max_width
+    """
+
+    def cell(value):
+        text = "NULL" if value is None else str(value)
+        return text if len(text) <= max_width else text[: max_width - 3] + "..."
+
+    cells = [[cell(v) for v in row] for row in rows]
+    widths = [max([len(name)] + [len(row[i]) for row in cells]) for i, name in enumerate(names)]
+    lines = [" | ".join(n.ljust(w) for n, w in zip(names, widths)), "-+-".join("-" * w for w in widths)]
+    lines.extend(" | ".join(v.ljust(w) for v, w in zip(row, widths)) for row in cells)
+    return "\n".join(line.rstrip() for line in lines)
+
+
+class Shell(cmd.Cmd):
+    """
+    the sql shell. Lines are collected until one ends with ; and then run as a query
+
+    :param execute: function taking sql and returning a Cursor
+    :param index: CatalogIndex for completion (optional)
+    :param page_size: rows per page
+    """
+
+    intro = "Dremio sql shell. End queries with ; and type help for commands."
+    prompt = "dremio> "
+    continuation_prompt = "   ...> "
+
+    def __init__(self, execute, index=None, page_size=20, stdin=None, stdout=None):
+        cmd.Cmd.__init__(self, stdin=stdin, stdout=stdout)
+        self.execute = execute
+        self.index = index
+        self.page_size = page_size
+        self.timing = True
+        self.cursor = None
+        self.position = 0
+        self._buffer = list()
+
+    def emptyline(self):
+        pass
+
+    def parseline(self, line):
+        # commands are only recognised at the start of a statement, everything else is sql
+        if self._buffer:
+            return None, None, line
+        return cmd.Cmd.parseline(self, line)
+
+    def default(self, line):
+        self._buffer.append(line)
+        statement = "\n".join(self._buffer).strip()
+        if not statement.endswith(";"):
+            self.prompt = self.continuation_prompt
+            return
+        self._buffer = list()
+        self.prompt = Shell.prompt
+        self._run(statement.rstrip(";").strip())
+
+    def _run(self, sql):
+        if self.cursor is not None:
+            self.cursor.close()
+        self.cursor = None
+        try:
+            self.cursor = self.execute(sql)
+            self.position = 0
+            self._show()
+        except Exception as e:  # NOQA
+            self._print("error: {}".format(e))
+            return
+        if self.timing:
+            planning = sum(self.cursor.profile.phases.get(i, 0.0) for i in ("submit", "poll", "plan"))
+            self._print("planned in {:.3f}s, first rows after {:.3f}s".format(planning, self.cursor.first_batch or 0.0))
+
+    def _show(self):
+        rows = self.cursor.rows(self.position, self.page_size)
+        self._print(format_table(self.cursor.schema.names, rows))
+        end = self.position + len(rows)
+        total = "{}".format(self.cursor.rows_read) if self.cursor.done else "{}+".format(self.cursor.rows_read)
+        status = "rows {}-{} of {}".format(self.position + 1 if rows else 0, end, total)
+        if self.cursor.done and self.timing:
+            status += " (read in {:.3f}s)".format(self.cursor.profile.total)
+        self._print(status)
+
+    def _print(self, text):
+        self.stdout.write(text + "\n")
+
+    def do_next(self, arg):
+        """next: show the next page of the last result"""
+        if self._require_result():
+            if self.cursor.done and self.position + self.page_size >= self.cursor.rows_read:
+                return self._print("no more rows")
+            self.position += self.page_size
+            self._show()
+
+    def do_prev(self, arg):
+        """prev: show the previous page of the last result"""
+        if self._require_result():
+            self.position = max(0, self.position - self.page_size)
+            self._show()
+
+    def do_page(self, arg):
+        """page N: show page N (from 1) of the last result"""
+        if self._require_result():
+            try:
+                self.position = max(0, int(arg) - 1) * self.page_size
+            except ValueError:
+                return self._print("usage: page N")
+            self._show()
+
+    def do_schema(self, arg):
+        """schema: show the columns of the last result"""
+        if self._require_result():
+            for field in self.cursor.schema:
+                self._print("{} {}".format(field.name, field.type))
+
+    def do_pagesize(self, arg):
+        """pagesize N: show N rows per page"""
+        try:
+            self.page_size = max(1, int(arg))
+        except ValueError:
+            self._print("page size is {}".format(self.page_size))
+
+    def do_timing(self, arg):
+        """timing on|off: show query timings"""
+        self.timing = arg.strip().lower() not in ("off", "false", "0")
+
+    def do_refresh(self, arg):
+        """refresh: re-read the catalog used for completion"""
+        if self.index is not None:
+            self.index.refresh()
+
+    def do_exit(self, arg):
+        """exit: leave the shell"""
+        if self.cursor is not None:
+            self.cursor.close()
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        self._print("")
+        return self.do_exit(arg)
+
+    def _require_result(self):
+        if self.cursor is None:
+            self._print("no query has been run")
+            return False
+        return True
+
+    def completenames(self, text, *ignored):
+        return cmd.Cmd.completenames(self, text, *ignored) + self._complete_sql(text)
+
+    def completedefault(self, text, line, begidx, endidx):
+        return self._complete_sql(text)
+
+    def _complete_sql(self, text):
+        keywords = [k for k in KEYWORDS if k.lower().startswith(text.lower())]
+        if self.index is None:
+            return keywords
+        return keywords + self.index.complete(text)
+
+
+def flight_executor(connection, prefetch=1000, fallback=None):
+    """
+    :param connection: dremio_client.flight.FlightConnection kept open for the session
+    :param fallback: execute function used from the first time the flight server can not be reached (optional)
+    :return: execute function for Shell running queries over connection
+    """
+    from pyarrow.flight import FlightUnavailableError
+
+    state = dict(available=True)
+
+    def execute(sql):
+        if not state["available"]:
+            return fallback(sql)
+        profile = QueryProfile(sql)
+        profile.method = "flight"
+        try:
+            with profile.phase("plan"):
+                batches, readers, schema = connection.read(sql)
+        except FlightUnavailableError:
+            if fallback is None:
+                raise
+            logging.warning("flight is not available, running queries over rest")
+            state["available"] = False
+            return fallback(sql)
+
+        def cancel():
+            for reader in readers:
+                reader.cancel()
+
+        return Cursor(batches, schema, cancel, prefetch, profile)
+
+    return execute
+
+
+def query_executor(query_args, method="rest", prefetch=1000):
+    """
+    :param query_args: connection arguments of dremio_client.query.query eg from dremio_client.conf.get_query_args
+    :return: execute function for Shell running queries with dremio_client.query.query
+    """
+    from .query import query
+
+    def execute(sql):
+        result, profile = query(sql=sql, method=method, output="resultset", profile=True, **query_args)
+        return Cursor(result, result.schema, result.close, prefetch, profile)
+
+    return execute
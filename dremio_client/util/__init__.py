@@ -25,8 +25,17 @@
 
 from .query import refresh_metadata, run, run_async
 from .promote import promote_catalog
-from .refresh import refresh_vds_reflection_by_path, refresh_reflections_of_one_dataset
+from .refresh import RefreshPlan, RefreshPlanner, RefreshProgress, refresh_vds_reflection_by_path
+from .refresh import refresh_reflections_of_one_dataset
+from .spill import write_batches
+from .resultset import ResultSet
+from .profile import QueryProfile
+from .reflections import BulkResult, RateLimiter, ReflectionManager, ReflectionMonitor, ReflectionTiming
+from .lineage import Lineage, LineageFetcher, LineageGraph
 
 
 __all__ = ["run", "run_async", "refresh_metadata", "promote_catalog",
-           "refresh_vds_reflection_by_path", "refresh_reflections_of_one_dataset"]
+           "refresh_vds_reflection_by_path", "refresh_reflections_of_one_dataset", "write_batches", "ResultSet",
+           "QueryProfile", "ReflectionManager", "BulkResult", "RateLimiter",
+           "RefreshPlanner", "RefreshPlan", "RefreshProgress", "Lineage", "LineageFetcher", "ReflectionMonitor",
+           "ReflectionTiming", "LineageGraph"]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+OUTPUTS = ("pandas", "arrow", "polars", "numpy", "resultset")
+
+# options for Table.to_pandas which avoid holding both the arrow and pandas copies of a large result
+ZERO_COPY_PANDAS_OPTIONS = {"self_destruct": True, "split_blocks": True, "use_threads": False}
+
+
+def output_type(pandas=True, output=None):
+    """
+    resolve the legacy pandas flag and the output argument to one of OUTPUTS
+
+    :param pandas: legacy flag, True for a pandas dataframe False for an arrow table
+    :param output: pandas, arrow, polars, numpy or resultset. Takes precedence over pandas if given
+    :return: output type
+    """
+    if output is None:
+        return "pandas" if pandas else "arrow"
+    if output not in OUTPUTS:
+        raise NotImplementedError("{} output is not supported, expected one of {}".format(output, ", ".join(OUTPUTS)))
+    return output
+
+
+def convert_table(table, output="pandas", categorical=True, **pandas_options):
+    """
+    convert an arrow table to the requested output with as few copies as possible
+
+    * pandas: ``Table.to_pandas``. Pass ``self_destruct=True, split_blocks=True`` (see ZERO_COPY_PANDAS_OPTIONS) to
+      release arrow memory column by column and skip block consolidation. The table must not be used afterwards.
+      ``timestamp_as_object``, ``date_as_object``, ``types_mapper`` etc. are passed through to ``to_pandas``
+    * arrow: the table itself
+    * polars: ``polars.from_arrow`` without rechunking, which shares the arrow buffers
+    * numpy: dict of column name to numpy array. Zero copy for single chunk primitive columns without nulls
+    * resultset: a dremio_client.util.resultset.ResultSet over the table
+
+    :param table: pyarrow.Table
+    :param output: pandas, arrow, polars, numpy or resultset
+    :param categorical: keep dictionary encoded columns as categoricals. If False they are decoded to plain values
+    :param pandas_options: extra keyword arguments for ``Table.to_pandas``
+    :return: converted result
+    """
+    output = output_type(output=output)
+    if not categorical:
+        table = _decode_dictionaries(table)
+    if output == "arrow":
+        return table
+    if output == "resultset":
+        from .resultset import ResultSet
+
+        return ResultSet.from_table(table)
+    if output == "pandas":
+        return table.to_pandas(**pandas_options)
+    if output == "polars":
+        try:
+            import polars
+        except ImportError:
+            raise NotImplementedError("polars output requires the polars package")
+        return polars.from_arrow(table, rechunk=False)
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+
+def _decode_dictionaries(table):
+    import pyarrow as pa
+
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+import base64
+import decimal
+
+from six import string_types
+
+from .. import codec
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    NO_ARROW = False
+except ImportError:
+    NO_ARROW = True
+
+
+def _check_arrow():
+    if NO_ARROW:
+        raise NotImplementedError("Decoding rest results to arrow requires pyarrow > 0.15.0")
+
+
+def _simple_types():
+    return {
+        "BOOLEAN": pa.bool_(),
+        "INTEGER": pa.int32(),
+        "BIGINT": pa.int64(),
+        "FLOAT": pa.float32(),
+        "DOUBLE": pa.float64(),
+        "VARCHAR": pa.string(),
+        "VARBINARY": pa.binary(),
+        "DATE": pa.date32(),
+        "TIME": pa.time32("ms"),
+        "TIMESTAMP": pa.timestamp("ms"),
+    }
+
+
+def arrow_type(dremio_type):
+    """
+    map a type from the schema of a Dremio job results payload to an arrow type
+
+    Unknown types (eg intervals) are kept as strings
+
+    :param dremio_type: dict like {'name': 'DECIMAL', 'precision': 38, 'scale': 2}
+    :return: pyarrow.DataType
+    """
+    _check_arrow()
+    name = dremio_type.get("name")
+    if name == "DECIMAL":
+        return pa.decimal128(dremio_type.get("precision", 38), dremio_type.get("scale", 0))
+    if name == "LIST":
+        sub_schema = dremio_type.get("subSchema") or [{"type": {"name": "VARCHAR"}}]
+        return pa.list_(arrow_type(sub_schema[0]["type"]))
+    if name == "STRUCT":
+        return pa.struct(
+            [pa.field(f.get("name"), arrow_type(f["type"])) for f in dremio_type.get("subSchema", list())]
+        )
+    return _simple_types().get(name, pa.string())
+
+
+def arrow_schema(schema):
+    """
+    build an arrow schema from the schema of a Dremio job results payload
+
+    :param schema: list of {'name': ..., 'type': {...}} dicts
+    :return: pyarrow.Schema
+    """
+    _check_arrow()
+    return pa.schema([pa.field(f["name"], arrow_type(f["type"])) for f in schema])
+
+
+def _array(values, dtype):
+    if pa.types.is_timestamp(dtype) or pa.types.is_date(dtype):
+        strings = pc.replace_substring_regex(pa.array(values, pa.string()), "Z$", "")
+        return strings.cast(dtype)
+    if pa.types.is_time(dtype):
+        strings = pc.binary_join_element_wise("1970-01-01", pa.array(values, pa.string()), " ")
+        return strings.cast(pa.timestamp(dtype.unit)).cast(dtype)
+    if pa.types.is_floating(dtype):
+        # pages parsed with decimals=True carry decimal.Decimal values
+        return pa.array([v if v is None or isinstance(v, float) else float(v) for v in values], dtype)
+    if pa.types.is_decimal(dtype):
+        # exact if the page was parsed with decimals=True, otherwise start from the shortest repr of the float rather
+        # than its binary value. Round to the column scale, a cast would reject any extra fractional digits
+        quantum = decimal.Decimal(1).scaleb(-dtype.scale)
+        return pa.array(
+            [None if v is None else decimal.Decimal(str(v)).quantize(quantum, decimal.ROUND_HALF_EVEN) for v in values],
+            dtype,
+        )
+    if pa.types.is_binary(dtype):
+        return pa.array([None if v is None else base64.b64decode(v) for v in values], dtype)
+    if pa.types.is_struct(dtype):
+        mask = pa.array([v is None for v in values], pa.bool_())
+        children = [_array([None if v is None else v.get(f.name) for v in values], f.type) for f in dtype]
+        return pa.StructArray.from_arrays(children, fields=list(dtype), mask=mask)
+    if pa.types.is_list(dtype):
+        offsets = [0]
+        flat = list()
+        for v in values:
+            if v is not None:
+                flat.extend(v)
+            offsets.append(len(flat))
+        mask = pa.array([v is None for v in values], pa.bool_())
+        return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), _array(flat, dtype.value_type), mask=mask)
+    if pa.types.is_string(dtype):
+        try:
+            return pa.array(values, dtype)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            # a type with no arrow equivalent (eg an interval or map) kept as a string, encode its values as json
+            return pa.array([v if v is None or isinstance(v, string_types) else codec.dumps(v) for v in values], dtype)
+    return pa.array(values, dtype)
+
+
+def page_batch(rows, schema):
+    """
+    decode the rows of one job results page column by column into an arrow record batch
+
+    :param rows: list of row dicts as returned by the job results endpoint
+    :param schema: pyarrow.Schema for the result (see arrow_schema)
+    :return: pyarrow.RecordBatch
+    """
+    _check_arrow()
+    arrays = [_array([row.get(field.name) for row in rows], field.type) for field in schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_batches(pages, schema=None):
+    """
+    lazily decode job results pages into arrow record batches using the schema carried by the results
+
+    :param pages: iterable of job results payloads eg from dremio_client.util.run
+    :param schema: pyarrow.Schema, taken from the first page if not given
+    :return: generator of pyarrow.RecordBatch
+    """
+    _check_arrow()
+    for page in pages:
+        if schema is None and page.get("schema"):
+            schema = arrow_schema(page["schema"])
+        rows = page.get("rows")
+        if rows:
+            if schema is None:
+                yield pa.RecordBatch.from_pylist(rows)
+            else:
+                yield page_batch(rows, schema)
+
+
+def decode_pages(pages, schema=None):
+    """
+    decode job results pages into a single arrow table without building intermediate dataframes
+
+    :param pages: iterable of job results payloads eg from dremio_client.util.run
+    :param schema: pyarrow.Schema, taken from the first page if not given
+    :return: pyarrow.Table
+    """
+    _check_arrow()
+    batches = list()
+    for page in pages:
+        if schema is None and page.get("schema"):
+            schema = arrow_schema(page["schema"])
+        batches.extend(iter_batches([page], schema))
+    if schema is None:
+        return pa.Table.from_batches(batches) if batches else pa.table({})
+    return pa.Table.from_batches(batches, schema=schema)
@@ -24,7 +24,7 @@
 #
 from collections import defaultdict
 
-import simplejson as json
+from dremio_client import codec
 from dremio_client.error import (
     DremioBadRequestException,
     DremioNotFoundException,
@@ -72,9 +72,9 @@ def serialize_catalog(catalog, with_extra=False):
     """
     data, acls, collabs = _recursve_catalog(catalog)
     if with_extra:
-        return json.dumps(data), json.dumps(acls), json.dumps(collabs)
+        return codec.dumps(data), codec.dumps(acls), codec.dumps(collabs)
     else:
-        return json.dumps(data)
+        return codec.dumps(data)
 
 
 def deserialize_catalog(catalog, client):
@@ -86,11 +86,11 @@ def deserialize_catalog(catalog, client):
     :return: fully reconstituted catalog
     """
     try:
-        data = json.loads(catalog)
+        data = codec.loads(catalog)
     except Exception:
         data = catalog
     for item in data:
-        client.data.add_by_path(json.loads(item))
+        client.data.add_by_path(codec.loads(item))
     return client
 
 
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Dataset lineage built from the catalog graph endpoint."""
+import collections
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import attr
+from six import string_types
+
+from .. import codec
+from ..model.endpoints import graph
+
+UPSTREAM = "upstream"
+DOWNSTREAM = "downstream"
+
+
+def is_virtual(entity):
+    """
+    :param entity: catalog entity, or a parent/child entry of a graph response
+    :return: True if the entity is a virtual dataset
+    """
+    return entity.get("datasetType") == "VIRTUAL" or entity.get("type") == "VIRTUAL_DATASET"
+
+
+@attr.s
+class Lineage(object):
+    """
+    a lineage DAG: the known entities by id and the edges between them, from parent to child
+    """
+
+    nodes = attr.ib(factory=dict)
+    parents = attr.ib(factory=dict)
+    children = attr.ib(factory=dict)
+
+    def add(self, cid, response):
+        """
+        add the parents and children of cid from its graph response
+
+        :param cid: dataset id
+        :param response: json of the graph call for cid
+        """
+        self.parents.setdefault(cid, set())
+        self.children.setdefault(cid, set())
+        for key, edges, reverse in (("parents", self.parents, self.children), ("children", self.children, self.parents)):
+            for entity in response.get(key) or list():
+                self.nodes.setdefault(entity["id"], entity)
+                edges[cid].add(entity["id"])
+                reverse.setdefault(entity["id"], set()).add(cid)
+
+    def levels(self, ids):
+        """
+        group ids into waves: each id comes after every one of its ancestors which is also in ids
+
+        :param ids: dataset ids in the DAG
+        :return: list of lists of ids, the first wave has no ancestors in ids
+        """
+        depth = dict()
+
+        def visit(cid, path):
+            if cid in depth:
+                return depth[cid]
+            if cid in path:
+                raise ValueError("lineage of {} contains a cycle".format(cid))
+            path.add(cid)
+            parents = [visit(p, path) + (p in ids) for p in self.parents.get(cid, ())]
+            path.discard(cid)
+            depth[cid] = max(parents) if parents else 0
+            return depth[cid]
+
+        waves = dict()
+        for cid in ids:
+            waves.setdefault(visit(cid, set()), list()).append(cid)
+        return [sorted(waves[level]) for level in sorted(waves)]
+
+
+class LineageFetcher(object):
+    """
+    walk the lineage of datasets with concurrent graph calls, each dataset's graph is fetched at most once
+
+    :param graph: function taking a dataset id and returning its graph json eg SimpleClient.graph
+    :param max_workers: number of concurrent graph calls
+    :param max_age: seconds a fetched graph is reused for, None to reuse it forever
+    """
+
+    def __init__(self, graph, max_workers=8, max_age=None):
+        self._graph = graph
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self._cache = dict()
+        self._lock = threading.Lock()
+
+    def graph(self, cid):
+        """
+        :param cid: dataset id
+        :return: graph json of the dataset, from the cache if it was fetched before
+        """
+        with self._lock:
+            cached = self._cache.get(cid)
+            if cached is not None and (self.max_age is None or time.time() - cached[0] < self.max_age):
+                return cached[1]
+        response = self._graph(cid)
+        with self._lock:
+            current = self._cache.get(cid)
+            # keep a response fetched concurrently by another caller, but store this one if the entry was invalidated
+            if current is None or current is cached:
+                self._cache[cid] = (time.time(), response)
+                self._fetched(cid, current is not None)
+                return response
+            return current[1]
+
+    def _fetched(self, cid, replaced):
+        pass
+
+    def lineage(self, ids, directions=(UPSTREAM,), lineage=None):
+        """
+        fetch the lineage of ids breadth first, each level of the DAG with one round of concurrent graph calls
+
+        :param ids: dataset ids
+        :param directions: UPSTREAM to follow parents, DOWNSTREAM to follow children, or both
+        :param lineage: Lineage to add to (optional)
+        :return: Lineage
+        """
+        lineage = Lineage() if lineage is None else lineage
+        seen = set()
+        frontier = [(cid, d) for cid in ids for d in directions]
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while frontier:
+                frontier = list(collections.OrderedDict.fromkeys(f for f in frontier if f not in seen))
+                seen.update(frontier)
+                todo = sorted({cid for cid, _ in frontier})
+                responses = dict(zip(todo, executor.map(self.graph, todo)))
+                following = list()
+                for cid, direction in frontier:
+                    lineage.add(cid, responses[cid])
+                    key = "parents" if direction == UPSTREAM else "children"
+                    following.extend((e["id"], direction) for e in responses[cid].get(key) or list())
+                frontier = following
+        return lineage
+
+
+class LineageGraph(LineageFetcher):
+    """
+    a cache of the catalog graph with local lineage queries
+
+    Graph responses are fetched concurrently as the lineage is walked (see LineageFetcher) and indexed by parent
+    and child, so ancestors, descendants and impact are answered by a walk of the local index, touching each
+    dataset and edge once, instead of a graph call per dataset. The cache can be saved to and reloaded from a
+    json file to keep it across processes; use max_age or invalidate to pick up lineage changes.
+
+    :param graph: function taking a dataset id and returning its graph json eg SimpleClient.graph
+    :param max_workers: number of concurrent graph calls
+    :param max_age: seconds a fetched graph is reused for, None to reuse it forever
+    :param path: json file the cache is loaded from if it exists and saved to by save (optional)
+    """
+
+    def __init__(self, graph, max_workers=8, max_age=None, path=None):
+        super(LineageGraph, self).__init__(graph, max_workers, max_age)
+        self.path = path
+        self._lineage = Lineage()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def _fetched(self, cid, replaced):
+        if replaced:
+            self._reindex()
+        else:
+            self._lineage.add(cid, self._cache[cid][1])
+
+    def _reindex(self):
+        self._lineage = Lineage()
+        for cid, (_, response) in self._cache.items():
+            self._lineage.add(cid, response)
+
+    def build(self, ids, directions=(UPSTREAM, DOWNSTREAM)):
+        """
+        fetch the whole lineage of ids, eg every dataset of a space, so later queries need no round trips
+
+        :param ids: dataset ids
+        :param directions: UPSTREAM, DOWNSTREAM or both
+        :return: self
+        """
+        self.lineage(ids, directions)
+        return self
+
+    def node(self, cid):
+        """
+        :param cid: dataset id
+        :return: the graph entry (id, path, datasetType...) of a dataset seen in the lineage, or None
+        """
+        with self._lock:
+            return self._lineage.nodes.get(cid)
+
+    def parents(self, cid):
+        """
+        :return: set of ids of the direct parents of cid
+        """
+        self.graph(cid)
+        with self._lock:
+            return set(self._lineage.parents.get(cid, ()))
+
+    def children(self, cid):
+        """
+        :return: set of ids of the datasets built directly on cid
+        """
+        self.graph(cid)
+        with self._lock:
+            return set(self._lineage.children.get(cid, ()))
+
+    def ancestors(self, cid):
+        """
+        :param cid: dataset id
+        :return: set of ids of every dataset cid is built from
+        """
+        return self._walk([cid], UPSTREAM)
+
+    def descendants(self, cid):
+        """
+        :param cid: dataset id
+        :return: set of ids of every dataset built on cid
+        """
+        return self._walk([cid], DOWNSTREAM)
+
+    def impact(self, ids):
+        """
+        the datasets affected by a change to any of ids
+
+        :param ids: dataset ids
+        :return: list of the ids of every descendant, each after all of its affected parents
+        """
+        affected = self._walk(ids, DOWNSTREAM)
+        with self._lock:
+            return [cid for wave in self._lineage.levels(affected) for cid in wave]
+
+    def _walk(self, ids, direction):
+        # fetches whatever part of the lineage is not cached yet, then walks the local index
+        self.lineage(ids, (direction,))
+        with self._lock:
+            # _reindex replaces the index, so read it and walk it under the same lock
+            edges = self._lineage.parents if direction == UPSTREAM else self._lineage.children
+            seen = set()
+            stack = list(ids)
+            while stack:
+                for nxt in edges.get(stack.pop(), ()):
+                    if nxt not in seen:
+                        seen.add(nxt)
+                        stack.append(nxt)
+        return seen
+
+    def invalidate(self, ids=None):
+        """
+        drop cached graphs so they are fetched again
+
+        :param ids: dataset ids, all if None
+        """
+        with self._lock:
+            if ids is None:
+                self._cache.clear()
+            else:
+                for cid in ids:
+                    self._cache.pop(cid, None)
+            self._reindex()
+
+    def save(self, path=None):
+        """
+        write the cached graphs to a json file, replacing it atomically
+
+        :param path: file name, defaults to the path the graph was created with
+        """
+        path = path or self.path
+        with self._lock:
+            data = {"graphs": {cid: {"fetched": t, "graph": r} for cid, (t, r) in self._cache.items()}}
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix=".lineage", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(codec.dumps(data))
+            _replace(tmp, path)
+        except Exception:  # NOQA
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def load(self, path=None):
+        """
+        add the graphs saved in a json file to the cache, keeping any fetched more recently
+
+        :param path: file name, defaults to the path the graph was created with
+        """
+        with open(path or self.path) as f:
+            data = codec.loads(f.read())
+        with self._lock:
+            for cid, entry in data.get("graphs", dict()).items():
+                if cid not in self._cache or self._cache[cid][0] < entry["fetched"]:
+                    self._cache[cid] = (entry["fetched"], entry["graph"])
+            self._reindex()
+
+
+_replace = getattr(os, "replace", os.rename)
+_graphs = dict()
+_graphs_lock = threading.Lock()
+
+
+def get_lineage_graph(token, base_url, ssl_verify=True, **kwargs):
+    """
+    return the process wide lineage graph of a server, user and settings, creating it if needed
+
+    :param token: auth token or dremio_client.auth.TokenManager
+    :param base_url: base Dremio url
+    :param ssl_verify: ignore ssl errors if False
+    :param kwargs: passed to LineageGraph when it is created eg max_age or path. Graphs with different settings are
+                   kept apart
+    :return: LineageGraph
+    """
+    # a managed token is shared by every client of a user, a plain token identifies its session
+    key = (base_url, token if isinstance(token, string_types) else id(token), ssl_verify, tuple(sorted(kwargs.items())))
+    with _graphs_lock:
+        if key not in _graphs:
+            _graphs[key] = LineageGraph(lambda cid: graph(token, base_url, cid, ssl_verify=ssl_verify), **kwargs)
+        return _graphs[key]
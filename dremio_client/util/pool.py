@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+_Entry = collections.namedtuple("_Entry", ["connection", "created", "last_used", "suspect"])
+
+
+class ConnectionPool(object):
+    """
+    A thread-safe pool of connections (odbc connections, flight clients...)
+
+    Connections are reused most recently used first. Idle connections older than max_lifetime or idle longer than
+    max_idle are closed whenever a connection is checked out or returned. Connections idle for more than check_after
+    seconds, or which were in use when an error was raised, are tested with check before reuse.
+
+    :param connect: function taking no arguments and returning a new connection with a close method
+    :param max_size: maximum number of connections checked out at once, further callers wait
+    :param max_idle: seconds an unused connection is kept open
+    :param max_lifetime: seconds after which a connection is closed rather than reused
+    :param check_after: seconds a connection may be idle before it is health checked on checkout
+    :param check: function taking a connection and returning False (or raising) if it is broken (optional)
+    """
+
+    def __init__(self, connect, max_size=4, max_idle=300, max_lifetime=3600, check_after=30, check=None):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._check = check
+        self._idle = list()
+        self._created = dict()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """
+        check out a connection, waiting for one to be released if max_size are in use
+
+        :param timeout: seconds to wait for a free connection, None to wait forever
+        :raise: RuntimeError if no connection became free before timeout or the pool is closed
+        :return: odbc connection which must be given back with release
+        """
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        acquired = self._slots.acquire() if timeout is None else self._slots.acquire(timeout=timeout)
+        if not acquired:
+            raise RuntimeError("timed out waiting for a connection from the pool")
+        try:
+            self._reap()
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    break
+                if self._usable(entry):
+                    return entry.connection
+                self._discard(entry.connection)
+            connection = self._connect()
+            with self._lock:
+                self._created[id(connection)] = time.time()
+            return connection
+        except Exception:  # NOQA
+            self._slots.release()
+            raise
+
+    def release(self, connection, suspect=False):
+        """
+        return a checked out connection to the pool
+
+        :param connection: connection from acquire
+        :param suspect: health check the connection before it is next used, eg after an error
+        """
+        try:
+            with self._lock:
+                created = self._created.get(id(connection), 0)
+                keep = not self._closed and time.time() - created < self.max_lifetime
+                if keep:
+                    self._idle.append(_Entry(connection, created, time.time(), suspect))
+            if not keep:
+                self._discard(connection)
+            self._reap()
+        finally:
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """
+        context manager which checks out a connection and returns it to the pool afterwards
+
+        :param timeout: seconds to wait for a free connection, None to wait forever
+        """
+        connection = self.acquire(timeout)
+        ok = False
+        try:
+            yield connection
+            ok = True
+        finally:
+            # also reached when a generator using the connection is closed early, leaving it mid result
+            self.release(connection, suspect=not ok)
+
+    def close(self):
+        """
+        close all idle connections. Checked out connections are closed when they are released
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, list()
+        for entry in idle:
+            self._discard(entry.connection)
+
+    def _reap(self):
+        # idle connections are reused most recent first, so the oldest may never be checked out again. Close
+        # every one past max_idle or max_lifetime rather than only the one being checked out
+        now = time.time()
+        with self._lock:
+            expired = [e for e in self._idle if self._expired(e, now)]
+            if expired:
+                self._idle = [e for e in self._idle if not self._expired(e, now)]
+        for entry in expired:
+            self._discard(entry.connection)
+
+    def _expired(self, entry, now):
+        return now - entry.created >= self.max_lifetime or now - entry.last_used >= self.max_idle
+
+    def _usable(self, entry):
+        now = time.time()
+        if self._expired(entry, now):
+            return False
+        if entry.suspect or now - entry.last_used >= self.check_after:
+            return self._healthy(entry.connection)
+        return True
+
+    def _healthy(self, connection):
+        if self._check is None:
+            return True
+        try:
+            return self._check(connection) is not False
+        except Exception:  # NOQA
+            logging.debug("Discarding connection which failed its health check", exc_info=True)
+            return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:  # NOQA
+            pass
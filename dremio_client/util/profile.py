@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+"""Where the time of a single query went, on the server and in the client."""
+import collections
+import contextlib
+import datetime
+import time
+
+CLIENT_PHASES = ("submit", "poll", "plan", "fetch", "decode", "convert")
+_TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S")
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000.0
+    for fmt in _TIMESTAMP_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return (parsed - datetime.datetime(1970, 1, 1)).total_seconds()
+    return None
+
+
+class QueryProfile(object):
+    """
+    timing breakdown of one query
+
+    Client side phases, in seconds, are recorded in phases:
+        * submit: sending the sql to the REST api
+        * poll: waiting for the REST job to finish, including the sleeps between job status calls
+        * plan: the flight GetFlightInfo call, which waits for Dremio to plan and start the query
+        * fetch: reading result pages or batches from the server
+        * decode: turning REST json pages into arrow
+        * convert: converting arrow to the requested output eg pandas
+
+    Phases exclude time spent in phases nested inside them, so fetching pages while decoding them counts once.
+    Server side phases come from the job status of REST queries, see server_phases. A profile is not thread safe.
+
+    :param sql: the query being profiled (optional)
+    """
+
+    def __init__(self, sql=None):
+        self.sql = sql
+        self.method = None
+        self.job_id = None
+        self.job = None
+        self.polls = 0
+        self.rows = None
+        self.phases = collections.OrderedDict()
+        self.start = time.time()
+        self.end = None
+        self._nested = list()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        time the block as part of phase name. Repeated blocks of the same phase add up
+        """
+        start = time.time()
+        self._nested.append(0.0)
+        try:
+            yield self
+        finally:
+            elapsed = time.time() - start
+            self.add(name, elapsed - self._nested.pop())
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def iter(self, iterable, name="fetch", count_rows=True):
+        """
+        time every step of iterable as phase name and count the rows of the batches it yields
+
+        :param iterable: iterable of pyarrow.RecordBatch or pages
+        :param name: phase to record
+        :param count_rows: add the rows of each batch to rows
+        :return: generator over iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+            if count_rows and hasattr(item, "num_rows"):
+                self.rows = (self.rows or 0) + item.num_rows
+            yield item
+
+    def finish(self):
+        self.end = time.time()
+        return self
+
+    @property
+    def total(self):
+        """
+        :return: wall clock seconds from the start of the query until finish, or until now if not finished
+        """
+        return (self.end or time.time()) - self.start
+
+    @property
+    def server_phases(self):
+        """
+        server side phases in seconds derived from the timestamps of the REST job status, empty for flight and odbc
+
+        :return: OrderedDict of planning, queued, execution and total. Phases the server did not report are left out
+        """
+        job = self.job or dict()
+        started = _timestamp(job.get("startedAt"))
+        scheduling = _timestamp(job.get("resourceSchedulingStartedAt"))
+        scheduled = _timestamp(job.get("resourceSchedulingEndedAt"))
+        ended = _timestamp(job.get("endedAt"))
+        result = collections.OrderedDict()
+        if started is not None and scheduling is not None:
+            result["planning"] = scheduling - started
+        if scheduling is not None and scheduled is not None:
+            result["queued"] = scheduled - scheduling
+        if scheduled is not None and ended is not None:
+            result["execution"] = ended - scheduled
+        if started is not None and ended is not None:
+            result["total"] = ended - started
+        return result
+
+    @property
+    def server_time(self):
+        return self.server_phases.get("total")
+
+    @property
+    def client_time(self):
+        """
+        :return: time not accounted for by the server, ie total minus server total (or total if unknown)
+        """
+        server = self.server_time
+        return self.total - (server or 0.0)
+
+    def to_dict(self):
+        return {
+            "sql": self.sql,
+            "method": self.method,
+            "job_id": self.job_id,
+            "rows": self.rows,
+            "polls": self.polls,
+            "total": self.total,
+            "client": dict(self.phases),
+            "server": dict(self.server_phases),
+        }
+
+    def summary(self):
+        """
+        :return: human readable multi line breakdown
+        """
+        lines = ["query profile ({}, {} rows, {:.3f}s)".format(self.method, self.rows, self.total)]
+        if self.job_id:
+            lines.append("  job {} ({} status polls)".format(self.job_id, self.polls))
+        names = [i for i in CLIENT_PHASES if i in self.phases] + [i for i in self.phases if i not in CLIENT_PHASES]
+        for name in names:
+            lines.append("  client {:<10} {:.3f}s".format(name, self.phases[name]))
+        for name, seconds in self.server_phases.items():
+            lines.append("  server {:<10} {:.3f}s".format(name, seconds))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.summary()
+
+    def __repr__(self):
+        return "QueryProfile(method={}, rows={}, total={:.3f})".format(self.method, self.rows, self.total)
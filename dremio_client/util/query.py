@@ -27,6 +27,7 @@ from concurrent.futures.thread import ThreadPoolExecutor
 
 from ..error import DremioException
 from ..model.endpoints import job_results, job_status, sql
+from .profile import QueryProfile
 
 
 executor = ThreadPoolExecutor(max_workers=8)
@@ -44,7 +45,9 @@ _job_states = {
 _done_job_states = {"COMPLETED", "CANCELED", "FAILED"}
 
 
-def run(token, base_url, query, context=None, sleep_time=10, ssl_verify=True):
+def run(
+    token, base_url, query, context=None, sleep_time=10, ssl_verify=True, profile=None, page_size=100, decimals=False
+):
     """ Run a single sql query
 
     This runs a single sql query against the rest api and returns a json document of the results
@@ -55,6 +58,9 @@ def run(token, base_url, query, context=None, sleep_time=10, ssl_verify=True):
     :param context: optional context in which to execute the query
     :param sleep_time: seconds to sleep between checking for finished state
     :param ssl_verify: verify ssl on web requests
+    :param profile: dremio_client.util.QueryProfile to record the submit, poll and fetch phases and job status in
+    :param page_size: rows fetched per job results call, at most 500
+    :param decimals: parse fractional numbers in the results as exact decimal.Decimal rather than float
     :raise: DremioException if job failed
     :raise: DremioUnauthorizedException if token is incorrect or invalid
     :return: json array of result rows
@@ -65,21 +71,27 @@ def run(token, base_url, query, context=None, sleep_time=10, ssl_verify=True):
     [{'record':'1'}, {'record':'2'}]
     """
     assert sleep_time > 0
-    job = sql(token, base_url, query, context, ssl_verify=ssl_verify)
-    job_id = job["id"]
-    while True:
-        state = job_status(token, base_url, job_id, ssl_verify=ssl_verify)
-        if state["jobState"] == "COMPLETED":
-            row_count = state.get("rowCount", 0)
-            break
-        if state["jobState"] in {"CANCELED", "FAILED"}:
-            # todo add info about why did it fail
-            raise DremioException("job failed " + str(state), None)
-        time.sleep(sleep_time)
+    if profile is None:
+        profile = QueryProfile(query)
+    with profile.phase("submit"):
+        job = sql(token, base_url, query, context, ssl_verify=ssl_verify)
+    job_id = profile.job_id = job["id"]
+    with profile.phase("poll"):
+        while True:
+            state = profile.job = job_status(token, base_url, job_id, ssl_verify=ssl_verify)
+            profile.polls += 1
+            if state["jobState"] == "COMPLETED":
+                row_count = profile.rows = state.get("rowCount", 0)
+                break
+            if state["jobState"] in {"CANCELED", "FAILED"}:
+                # todo add info about why did it fail
+                raise DremioException("job failed " + str(state), None)
+            time.sleep(sleep_time)
     count = 0
     while count < row_count:
-        result = job_results(token, base_url, job_id, count, ssl_verify=ssl_verify)
-        count += 100
+        with profile.phase("fetch"):
+            result = job_results(token, base_url, job_id, count, page_size, ssl_verify=ssl_verify, decimals=decimals)
+        count += page_size
         yield result
 
 
@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+"""Index and bulk modify the reflections of a Dremio server."""
+import collections
+import copy
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError
+
+import attr
+
+from ..error import DremioConflictException, DremioException, DremioNotFoundException
+from .profile import _timestamp
+
+# fields the server computes, they are dropped from the body of a PUT
+READ_ONLY_FIELDS = ("createdAt", "updatedAt", "currentSizeBytes", "totalSizeBytes", "status")
+
+
+def reflection_status(reflection):
+    """
+    :param reflection: reflection json from the reflections listing, full or summary
+    :return: the combined status eg CAN_ACCELERATE, or the availability if there is no combined status
+    """
+    status = reflection.get("status")
+    if isinstance(status, dict):
+        return status.get("combinedStatus") or status.get("availability")
+    return status
+
+
+class RateLimiter(object):
+    """
+    token bucket allowing rate calls per second on average and bursts of up to burst calls, shared between threads
+
+    :param rate: calls per second, None for no limit
+    :param burst: maximum number of calls made back to back
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        block until a call may be made
+        """
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+@attr.s
+class BulkResult(object):
+    """
+    outcome of a bulk operation: the updated reflection json by id and the exception raised for each failed id
+    """
+
+    succeeded = attr.ib(factory=dict)
+    failed = attr.ib(factory=dict)
+
+    def raise_for_failures(self):
+        """
+        :raise: the first exception if any reflection failed
+        """
+        for e in self.failed.values():
+            raise e
+
+
+class ReflectionManager(object):
+    """
+    An index of a server's reflections by id, dataset, status and type, with concurrent bulk updates
+
+    The index is loaded by one call to the reflections listing and kept current by the results of each update, so
+    reflections are not fetched again before they are changed. refresh re-reads the listing (or single
+    reflections) and only re-indexes the entries which changed.
+
+    Updates of many reflections run on a thread pool of max_workers, at most rate calls per second. A reflection
+    modified elsewhere since it was indexed is fetched again and the update retried once.
+
+    :param client: dremio_client.DremioSimpleClient or any object with the same reflection methods
+    :param max_workers: number of concurrent requests
+    :param rate: maximum requests per second, None for no limit
+    :param burst: requests allowed back to back before the rate applies
+    """
+
+    def __init__(self, client, max_workers=8, rate=None, burst=1):
+        self._client = client
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate, burst)
+        self._lock = threading.RLock()
+        self._reflections = dict()
+        self._by_dataset = collections.defaultdict(set)
+        self._by_status = collections.defaultdict(set)
+        self._by_type = collections.defaultdict(set)
+        self._loaded = False
+
+    def _index(self):
+        if not self._loaded:
+            self.refresh()
+        return self._reflections
+
+    def _put(self, reflection):
+        rid = reflection["id"]
+        self._drop(rid)
+        self._reflections[rid] = reflection
+        self._by_dataset[reflection.get("datasetId")].add(rid)
+        self._by_status[reflection_status(reflection)].add(rid)
+        self._by_type[reflection.get("type")].add(rid)
+
+    def _drop(self, rid):
+        old = self._reflections.pop(rid, None)
+        if old is None:
+            return
+        for index, key in (
+            (self._by_dataset, old.get("datasetId")),
+            (self._by_status, reflection_status(old)),
+            (self._by_type, old.get("type")),
+        ):
+            index[key].discard(rid)
+            if not index[key]:
+                del index[key]
+
+    def refresh(self, ids=None):
+        """
+        bring the index up to date
+
+        :param ids: re-fetch only these reflections, concurrently, instead of reading the whole listing (optional)
+        :return: (added, changed, removed) sets of reflection ids
+        """
+        if ids is None:
+            fetched = {r["id"]: r for r in self._client.reflections()["data"]}
+            with self._lock:
+                removed = set(self._reflections) - set(fetched)
+                self._loaded = True
+        else:
+            results = self._map(self._fetch, ids)
+            removed = {k for k, e in results.failed.items() if isinstance(e, DremioNotFoundException)}
+            for rid in removed:
+                del results.failed[rid]
+            results.raise_for_failures()
+            fetched = results.succeeded
+        added, changed = set(), set()
+        with self._lock:
+            for rid in removed:
+                self._drop(rid)
+            for rid, reflection in fetched.items():
+                old = self._reflections.get(rid)
+                if old is None:
+                    added.add(rid)
+                elif _version(old) == _version(reflection):
+                    continue
+                else:
+                    changed.add(rid)
+                self._put(reflection)
+        return added, changed, removed
+
+    def get(self, rid):
+        """
+        :param rid: reflection id
+        :return: indexed reflection json or None
+        """
+        with self._lock:
+            return self._index().get(rid)
+
+    def find(self, dataset_id=None, status=None, type=None, enabled=None):
+        """
+        indexed reflections matching every given criterion
+
+        :param dataset_id: id of the dataset the reflections are defined on
+        :param status: combined status eg CAN_ACCELERATE or FAILED, see reflection_status
+        :param type: RAW or AGGREGATION
+        :param enabled: True or False
+        :return: list of reflection json
+        """
+        with self._lock:
+            reflections = self._index()
+            ids = None
+            for index, key in ((self._by_dataset, dataset_id), (self._by_status, status), (self._by_type, type)):
+                if key is not None:
+                    matches = index.get(key, set())
+                    ids = matches if ids is None else ids & matches
+            if ids is None:
+                ids = set(reflections)
+            found = [reflections[rid] for rid in ids]
+        if enabled is not None:
+            found = [r for r in found if bool(r.get("enabled")) == enabled]
+        return sorted(found, key=lambda r: r["id"])
+
+    @property
+    def datasets(self):
+        """
+        :return: dict of dataset id to the ids of its reflections
+        """
+        with self._lock:
+            self._index()
+            return {k: set(v) for k, v in self._by_dataset.items()}
+
+    @property
+    def statuses(self):
+        """
+        :return: dict of status to number of reflections
+        """
+        with self._lock:
+            self._index()
+            return {k: len(v) for k, v in self._by_status.items()}
+
+    def modify(self, ids, change):
+        """
+        update many reflections concurrently
+
+        :param ids: reflection ids or reflection json
+        :param change: dict of fields to set, or function which modifies a copy of the reflection json in place
+        :return: BulkResult
+        """
+        if isinstance(change, dict):
+            fields = change
+
+            def change(reflection):
+                reflection.update(fields)
+
+        return self._map(lambda rid: self._modify(rid, change), ids)
+
+    def enable(self, ids):
+        """
+        enable reflections, the server then rebuilds them
+
+        :param ids: reflection ids or reflection json
+        :return: BulkResult
+        """
+        return self.modify(ids, {"enabled": True})
+
+    def disable(self, ids):
+        """
+        :param ids: reflection ids or reflection json
+        :return: BulkResult
+        """
+        return self.modify(ids, {"enabled": False})
+
+    def _modify(self, rid, change):
+        reflection = self.get(rid)
+        for attempt in range(2):
+            if reflection is None:
+                reflection = self._fetch(rid)
+            body = {k: v for k, v in copy.deepcopy(reflection).items() if k not in READ_ONLY_FIELDS}
+            change(body)
+            self.limiter.acquire()
+            try:
+                updated = self._client.modify_reflection(rid, body)
+                break
+            except DremioConflictException:
+                # modified since it was indexed: start again from the current version
+                if attempt:
+                    raise
+                reflection = None
+        with self._lock:
+            self._put(updated)
+        return updated
+
+    def _fetch(self, rid):
+        self.limiter.acquire()
+        return self._client.reflection(rid)
+
+    def _map(self, fn, ids):
+        ids = [i["id"] if isinstance(i, dict) else i for i in ids]
+        result = BulkResult()
+        if not ids:
+            return result
+
+        def run(rid):
+            try:
+                return fn(rid), None
+            except Exception as e:  # NOQA
+                return None, e
+
+        with ThreadPoolExecutor(max(1, min(self.max_workers, len(ids)))) as executor:
+            for rid, (value, error) in zip(ids, executor.map(run, ids)):
+                if error is None:
+                    result.succeeded[rid] = value
+                else:
+                    result.failed[rid] = error
+        return result
+
+
+def _version(reflection):
+    return reflection.get("tag"), reflection.get("updatedAt"), reflection_status(reflection), reflection.get("enabled")
+
+
+# combined statuses of a reflection which is usable, and of one which will not become usable without intervention
+READY_STATUSES = ("CAN_ACCELERATE", "CAN_ACCELERATE_WITH_FAILURES")
+FAILED_STATUSES = ("FAILED", "INVALID", "EXPIRED", "DISABLED", "CANNOT_ACCELERATE_MANUAL")
+
+
+@attr.s(frozen=True)
+class ReflectionTiming(object):
+    """
+    how a watched reflection finished: its status, the seconds from watch until the status was seen and the number
+    of polls it took
+    """
+
+    id = attr.ib()
+    status = attr.ib()
+    elapsed = attr.ib()
+    polls = attr.ib()
+    last_data_fetch = attr.ib(default=None)
+    reflection = attr.ib(default=None, repr=False)
+
+
+class ReflectionMonitor(object):
+    """
+    wait for many reflections to finish refreshing with a single poll loop
+
+    Every interval seconds one call to the reflection summary listing updates all watched reflections. Each watch
+    returns a concurrent.futures.Future which resolves to a ReflectionTiming once the reflection can accelerate
+    queries, or raises DremioException if it failed, was disabled or was deleted. The loop runs on a background
+    thread while anything is watched.
+
+    :param client: dremio_client.DremioSimpleClient or any object with a reflections(summary) method
+    :param interval: seconds between polls
+    :param timeout: seconds after which an unresolved watch fails with concurrent.futures.TimeoutError (optional)
+    """
+
+    def __init__(self, client, interval=5, timeout=None):
+        self._client = client
+        self.interval = interval
+        self.timeout = timeout
+        self._watches = dict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.polls = 0
+
+    def watch(self, ids, refreshed_after=None):
+        """
+        :param ids: reflection ids or reflection json
+        :param refreshed_after: epoch seconds, eg time.time() just before triggering a refresh. A usable reflection
+                                only counts as done once it has data fetched after this time (optional)
+        :return: dict of reflection id to Future
+        """
+        futures = dict()
+        with self._lock:
+            for rid in ids:
+                rid = rid["id"] if isinstance(rid, dict) else rid
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self._watches.setdefault(rid, list()).append(_Watch(future, time.time(), self.polls, refreshed_after))
+                futures[rid] = future
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="dremio-reflection-monitor")
+                self._thread.daemon = True
+                self._thread.start()
+        self._wake.set()
+        return futures
+
+    def wait(self, ids, refreshed_after=None):
+        """
+        watch ids and block until all of them are done
+
+        :return: dict of reflection id to ReflectionTiming
+        :raise: the exception of the first reflection which failed
+        """
+        return {rid: f.result() for rid, f in self.watch(ids, refreshed_after).items()}
+
+    def poll(self):
+        """
+        poll the reflection listing once and resolve the watches which are done
+        """
+        listing = self._client.reflections(summary=True)
+        now = time.time()
+        with self._lock:
+            self.polls += 1
+            current = {r["id"]: r for r in listing.get("data") or list()}
+            for rid in list(self._watches):
+                pending = [w for w in self._watches[rid] if not self._resolve(rid, w, current.get(rid), now)]
+                if pending:
+                    self._watches[rid] = pending
+                else:
+                    del self._watches[rid]
+
+    def _resolve(self, rid, watch, reflection, now):
+        if watch.future.done():
+            return True
+        polls = self.polls - watch.polls
+        if reflection is None:
+            watch.future.set_exception(DremioNotFoundException("reflection {} no longer exists".format(rid), None))
+            return True
+        status = reflection_status(reflection)
+        fetched = (reflection.get("status") or dict()).get("lastDataFetch")
+        timing = ReflectionTiming(rid, status, now - watch.start, polls, fetched, reflection)
+        if status in FAILED_STATUSES:
+            watch.future.set_exception(DremioException("reflection {} is {}".format(rid, status), timing))
+            return True
+        if status in READY_STATUSES and (watch.after is None or (_timestamp(fetched) or 0) >= watch.after):
+            watch.future.set_result(timing)
+            return True
+        if watch.after is not None and _refresh_failed(watch, reflection.get("status") or dict()):
+            watch.future.set_exception(DremioException("reflection {} failed to refresh".format(rid), timing))
+            return True
+        if self.timeout is not None and now - watch.start >= self.timeout:
+            watch.future.set_exception(TimeoutError("reflection {} is still {}".format(rid, status)))
+            return True
+        return False
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._watches:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:  # NOQA
+                self._fail(e)
+                return
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _fail(self, e):
+        with self._lock:
+            watches, self._watches = self._watches, dict()
+            self._thread = None
+        for pending in watches.values():
+            for watch in pending:
+                if not watch.future.done():
+                    watch.future.set_exception(e)
+
+    def close(self):
+        """
+        cancel every watch which has not resolved yet
+        """
+        self._fail(CancelledError())
+
+
+@attr.s
+class _Watch(object):
+    future = attr.ib()
+    start = attr.ib()
+    polls = attr.ib()
+    after = attr.ib()
+    # failureCount of the reflection when it was first polled for this watch
+    failures = attr.ib(default=None)
+
+
+def _refresh_failed(watch, status):
+    # a status of CAN_ACCELERATE_WITH_FAILURES alone may predate the refresh asked for, which may not have run yet.
+    # It has failed once the server gives up retrying or records a failure after the first poll
+    if status.get("refresh") == "GIVEN_UP":
+        return True
+    count = status.get("failureCount")
+    if watch.failures is None:
+        watch.failures = count
+        return False
+    return count is not None and count > watch.failures
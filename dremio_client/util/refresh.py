@@ -1,85 +1,138 @@
 
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import attr
 
-def refresh_vds_reflection_by_path(client, path=None):
+from .lineage import LineageFetcher, is_virtual
+from .reflections import BulkResult, ReflectionManager
+
+
+def refresh_vds_reflection_by_path(client, path=None, progress=None):
     """
     By providing a path from VDS the reflection of that vds will be refreshed
     Script will find which pds is responsible for the reflection and
     trigger the refresh based on pds
 
     :param path: list ['space', 'folder', 'vds']
+    :param progress: function called with a RefreshProgress after each pds refresh (optional)
+    :return: BulkResult of the pds refreshes
     """
-    datasets = []
-    datasets.append(client.catalog_item(cid=None, path=path))
-    _refresh_by_path(client, datasets)
-
-
-def _refresh_by_path(client, datasets):
-    for dataset in datasets:
-        response = client.graph(dataset['id'])
-        _parents(client, response['parents'])
-
-
-def _parents(client, parents):
-    datasets = []
-    for parent in parents:
-        if (parent['datasetType'] == 'VIRTUAL'):
-            datasets.append({"id": parent['id']})
-        else:
-            client.refresh_pds(client.catalog_item(cid=parent['id'], path=None)['id'])
-        break
-    _refresh_by_path(client, datasets)
-
+    dataset = client.catalog_item(cid=None, path=path)
+    planner = RefreshPlanner(client)
+    return planner.execute(planner.plan([dataset["id"]], {dataset["id"]: dataset}), progress)
 
-def _disable_reflection(client, refl_json):
-    data = refl_json
 
-    key_to_remove = ['updatedAt', 'createdAt',
-                     'currentSizeBytes', 'totalSizeBytes']
-    for key in key_to_remove:
-        data.pop(key)
-
-    refl_id = data['id']
-    data['enabled'] = False
-    data = json.dumps(data)
-
-    return client.modify_reflection(refl_id, data)
+@attr.s
+class RefreshPlan(object):
+    """
+    the physical datasets to refresh so the reflections of targets are rebuilt, in waves which can run in parallel
+    """
 
+    targets = attr.ib()
+    lineage = attr.ib()
+    waves = attr.ib()
 
-def _enable_reflection(client, refl_json):
-    data = refl_json
+    @property
+    def datasets(self):
+        return [cid for wave in self.waves for cid in wave]
 
-    key_to_remove = ['updatedAt', 'createdAt',
-                     'currentSizeBytes', 'totalSizeBytes']
-    for key in key_to_remove:
-        data.pop(key)
 
-    refl_id = data['id']
+@attr.s(frozen=True)
+class RefreshProgress(object):
+    dataset_id = attr.ib()
+    wave = attr.ib()
+    done = attr.ib()
+    total = attr.ib()
+    error = attr.ib(default=None)
 
-    data = client.reflection(refl_id)
 
-    for key in key_to_remove:
-        data.pop(key)
-    data['enabled'] = True
-    data = json.dumps(data)
+class RefreshPlanner(object):
+    """
+    plan and run the pds refreshes which rebuild the reflections of virtual datasets
 
-    # enable reflection, will trigger an update
-    return client.modify_reflection(refl_id, data)['enabled']
+    The upstream lineage of the targets is fetched with concurrent graph calls. Every physical dataset reached is
+    refreshed exactly once, however many paths lead to it, and no refresh runs before the refreshes of its own
+    ancestors. Refreshes with no ordering between them run concurrently.
 
+    :param client: dremio_client.DremioSimpleClient or any object with graph, catalog_item and refresh_pds methods
+    :param max_workers: number of concurrent requests
+    :param fetcher: dremio_client.util.LineageFetcher to share cached graph calls with (optional)
+    """
 
-def refresh_reflections_of_one_dataset(client, path=None):
+    def __init__(self, client, max_workers=8, fetcher=None):
+        self._client = client
+        self.max_workers = max_workers
+        self.fetcher = fetcher or LineageFetcher(client.graph, max_workers)
+
+    def plan(self, ids, entities=None):
+        """
+        :param ids: ids of the datasets whose reflections should be refreshed
+        :param entities: catalog entities of the targets by id if already fetched, used to tell physical from
+                         virtual datasets (optional)
+        :return: RefreshPlan
+        """
+        lineage = self.fetcher.lineage(ids)
+        for cid in ids:
+            if cid not in lineage.nodes:
+                entity = (entities or dict()).get(cid) or self._client.catalog_item(cid=cid, path=None)
+                lineage.nodes[cid] = entity
+        physical = set()
+        for cid, entity in lineage.nodes.items():
+            if not is_virtual(entity):
+                physical.add(cid)
+        return RefreshPlan(list(ids), lineage, lineage.levels(physical))
+
+    def execute(self, plan, progress=None):
+        """
+        refresh the physical datasets of plan wave by wave, later waves are skipped once a refresh fails
+
+        :param plan: RefreshPlan
+        :param progress: function called with a RefreshProgress after each refresh (optional)
+        :return: BulkResult by dataset id
+        """
+        result = BulkResult()
+        total = len(plan.datasets)
+        lock = threading.Lock()
+
+        def refresh(wave, cid):
+            error = None
+            try:
+                result.succeeded[cid] = self._client.refresh_pds(cid)
+            except Exception as e:  # NOQA
+                result.failed[cid] = error = e
+            if progress is not None:
+                with lock:
+                    done = len(result.succeeded) + len(result.failed)
+                    progress(RefreshProgress(cid, wave, done, total, error))
+
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for i, wave in enumerate(plan.waves):
+                list(executor.map(lambda cid: refresh(i, cid), wave))
+                if result.failed:
+                    break
+        return result
+
+
+def refresh_reflections_of_one_dataset(client, path=None, manager=None):
     """
     By providing a path from dataset the reflection of that dataset will be refreshed through reenable
     Enebled reflections of dataset and all reflections from derived dataset will be refreshed
 
+    The enabled reflections are all disabled, then all enabled again, each step concurrently. If any of them can't
+    be disabled the ones which were are enabled again before the error is raised
+
     :param path: list ['space', 'folder', 'vds']
+    :param manager: dremio_client.util.ReflectionManager to reuse its index and settings (optional)
+    :return: BulkResult of enabling the reflections
     """
-    reflections = client.reflections()
+    if manager is None:
+        manager = ReflectionManager(client)
     dataset_id = client.catalog_item(cid=None, path=path)['id']
 
-    for reflection in reflections['data']:
-        if dataset_id == reflection['datasetId']:
-            if reflection['enabled']:
-                _disable_reflection(client, reflection)
-                _enable_reflection(client, reflection)
+    reflections = manager.find(dataset_id=dataset_id, enabled=True)
+    disabled = manager.disable(reflections)
+    if disabled.failed:
+        manager.enable(list(disabled.succeeded))
+        disabled.raise_for_failures()
+    return manager.enable(reflections)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+import itertools
+
+from .convert import convert_table
+from .spill import write_batches
+
+
+class ResultSet(object):
+    """
+    The result of a query, independent of whether it came over flight, odbc or rest
+
+    Record batches are streamed lazily from the server. The schema and, where the server reports it, the row count
+    are available without reading the data. The stream can be consumed once, either by iterating over the result
+    set or with iter_batches, or materialized with to_arrow/to_pandas, after which it can be read any number of
+    times.
+
+    :param batches: iterable of pyarrow.RecordBatch
+    :param schema: pyarrow.Schema of the result, read from the first batch if not given
+    :param num_rows: total number of rows if known up front (optional)
+    :param method: the transport which produced the result, flight, odbc or rest (optional)
+    :param profile: dremio_client.util.QueryProfile of the query, conversions are recorded in it (optional)
+    """
+
+    def __init__(self, batches, schema=None, num_rows=None, method=None, profile=None):
+        self._source = batches
+        self._batches = iter(batches)
+        self._schema = schema
+        self._num_rows = num_rows
+        self._table = None
+        self._consumed = False
+        self.method = method
+        self.profile = profile
+
+    @classmethod
+    def from_table(cls, table, method=None):
+        """
+        :param table: pyarrow.Table
+        :param method: the transport which produced the table (optional)
+        :return: ResultSet over an already materialized table
+        """
+        result = cls(iter(()), table.schema, table.num_rows, method)
+        result._table = table
+        return result
+
+    @classmethod
+    def from_pages(cls, pages, method="rest", profile=None):
+        """
+        :param pages: iterable of job results payloads eg from dremio_client.util.run
+        :param method: the transport which produced the pages
+        :param profile: dremio_client.util.QueryProfile to record the decode phase in (optional)
+        :return: ResultSet decoding the pages lazily, see dremio_client.util.decode
+        """
+        from .decode import arrow_schema, iter_batches
+
+        pages = iter(pages)
+        try:
+            first = next(pages)
+        except StopIteration:
+            return cls(iter(()), arrow_schema([]), 0, method, profile)
+        schema = arrow_schema(first["schema"]) if first.get("schema") else None
+        batches = iter_batches(itertools.chain([first], pages), schema)
+        if profile is not None:
+            batches = profile.iter(batches, "decode", count_rows=False)
+        return cls(batches, schema, first.get("rowCount"), method, profile)
+
+    @property
+    def schema(self):
+        """
+        :return: pyarrow.Schema of the result. Reads at most one batch if the transport did not report it
+        """
+        if self._schema is None and self._table is None:
+            try:
+                first = next(self._batches)
+            except StopIteration:
+                import pyarrow as pa
+
+                self._schema = pa.schema([])
+            else:
+                self._schema = first.schema
+                self._batches = itertools.chain([first], self._batches)
+        return self._table.schema if self._table is not None else self._schema
+
+    @property
+    def num_rows(self):
+        """
+        :return: number of rows, None if the transport did not report it and the result has not been materialized
+        """
+        if self._table is not None:
+            return self._table.num_rows
+        return self._num_rows
+
+    def iter_batches(self):
+        """
+        :raise: RuntimeError if the stream was already consumed
+        :return: iterator of pyarrow.RecordBatch
+        """
+        if self._table is not None:
+            return iter(self._table.to_batches())
+        if self._consumed:
+            raise RuntimeError("result set has already been consumed, use to_arrow to read it more than once")
+        self.schema  # make sure the schema is known before the stream is handed out
+        self._consumed = True
+        return self._batches
+
+    def __iter__(self):
+        return self.iter_batches()
+
+    def to_arrow(self):
+        """
+        :return: pyarrow.Table holding the whole result
+        """
+        if self._table is None:
+            import pyarrow as pa
+
+            self._table = pa.Table.from_batches(list(self.iter_batches()), self.schema)
+            self._batches = iter(())
+        return self._table
+
+    def to_pandas(self, **pandas_options):
+        """
+        :param pandas_options: passed to dremio_client.util.convert.convert_table eg self_destruct
+        :return: pandas.DataFrame
+        """
+        return self.to("pandas", **pandas_options)
+
+    def to(self, output, **options):
+        """
+        :param output: pandas, arrow, polars or numpy
+        :param options: passed to dremio_client.util.convert.convert_table
+        :return: converted result
+        """
+        table = self.to_arrow()
+        if self.profile is None:
+            return convert_table(table, output, **options)
+        with self.profile.phase("convert"):
+            return convert_table(table, output, **options)
+
+    def write(self, path, file_format="arrow", max_rows_per_file=None):
+        """
+        stream the result to Arrow IPC or Parquet files, see dremio_client.util.spill.write_batches
+
+        :return: memory mapped pyarrow dataset over the written files
+        """
+        return write_batches(self.iter_batches(), path, file_format, max_rows_per_file, self.schema)
+
+    def close(self):
+        """
+        stop reading from the server, releasing the underlying stream or connection
+        """
+        close = getattr(self._source, "close", None)
+        if close is not None:
+            close()
+        self._batches = iter(())
+        self._consumed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return "ResultSet(method={}, num_rows={}, columns={})".format(
+            self.method, self.num_rows, None if self._schema is None and self._table is None else self.schema.names
+        )
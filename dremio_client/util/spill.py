@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+import os
+
+_FORMATS = {"arrow": ("ipc", ".arrow"), "ipc": ("ipc", ".arrow"), "parquet": ("parquet", ".parquet")}
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow.fs import LocalFileSystem
+
+    NO_ARROW = False
+except ImportError:
+    NO_ARROW = True
+
+
+def _check_arrow():
+    if NO_ARROW:
+        raise NotImplementedError("Spilling results to disk requires pyarrow > 0.15.0")
+
+
+class _SpillWriter(object):
+    """
+    Write record batches to one or more local files, starting a new file every max_rows_per_file rows
+    """
+
+    def __init__(self, path, file_format, max_rows_per_file=None, schema=None):
+        self._path = path
+        self._extension = _FORMATS[file_format][1]
+        self._parquet = _FORMATS[file_format][0] == "parquet"
+        self._max_rows = max_rows_per_file
+        self.schema = schema
+        self._writer = None
+        self._rows_in_file = 0
+        self.files = list()
+
+    def _open(self):
+        filename = os.path.join(self._path, "part-{:05d}{}".format(len(self.files), self._extension))
+        if self._parquet:
+            self._writer = pq.ParquetWriter(filename, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(filename, self.schema)
+        self._rows_in_file = 0
+        self.files.append(filename)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def write(self, batch):
+        if self.schema is None:
+            self.schema = batch.schema
+        elif not batch.schema.equals(self.schema):
+            batch = batch.cast(self.schema)
+        offset = 0
+        while offset < batch.num_rows:
+            if self._writer is None:
+                self._open()
+            length = batch.num_rows - offset
+            if self._max_rows:
+                length = min(length, self._max_rows - self._rows_in_file)
+            self._writer.write_table(pa.Table.from_batches([batch.slice(offset, length)]))
+            self._rows_in_file += length
+            offset += length
+            if self._max_rows and self._rows_in_file >= self._max_rows:
+                self._close()
+
+    def close(self):
+        if not self.files and self.schema is not None:
+            # always leave a (possibly empty) file behind so the dataset carries the result schema
+            self._open()
+        self._close()
+
+
+def write_batches(batches, path, file_format="arrow", max_rows_per_file=None, schema=None):
+    """
+    Stream record batches to local Arrow IPC or Parquet files and return a memory mapped dataset over them
+
+    Only one record batch is held in memory at a time so the size of the result is bounded by disk not RAM.
+
+    :param batches: iterable of pyarrow.RecordBatch
+    :param path: directory to write files into. Created if it does not exist
+    :param file_format: arrow (Arrow IPC file) or parquet
+    :param max_rows_per_file: optionally start a new file every max_rows_per_file rows
+    :param schema: schema of the result. Required to write an empty result, inferred from the first batch otherwise
+    :return: pyarrow.dataset.Dataset backed by the written files
+    """
+    _check_arrow()
+    if file_format not in _FORMATS:
+        raise NotImplementedError("{} format is not applicable".format(file_format))
+    if max_rows_per_file is not None and max_rows_per_file <= 0:
+        raise ValueError("max_rows_per_file must be positive")
+    if not os.path.exists(path):
+        os.makedirs(path)
+    writer = _SpillWriter(path, file_format, max_rows_per_file, schema)
+    try:
+        for batch in batches:
+            writer.write(batch)
+    finally:
+        writer.close()
+    return open_dataset(writer.files, file_format, writer.schema)
+
+
+def open_dataset(files, file_format="arrow", schema=None):
+    """
+    Memory map local Arrow IPC or Parquet files as one dataset
+
+    :param files: list of file paths
+    :param file_format: arrow (Arrow IPC file) or parquet
+    :param schema: schema of the files, inferred from the first file if not given
+    :return: pyarrow.dataset.Dataset
+    """
+    _check_arrow()
+    return ds.dataset(
+        files, schema=schema, format=_FORMATS[file_format][0], filesystem=LocalFileSystem(use_mmap=True)
+    )
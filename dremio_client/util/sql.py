@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+"""Helpers for building Dremio sql text: identifier and literal quoting, predicates and range partitions."""
+import datetime
+import decimal
+
+from six import string_types
+
+
+def quote_identifier(name):
+    """
+    :param name: column or table name
+    :return: the name double quoted with embedded quotes escaped
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def literal(value):
+    """
+    :param value: python value
+    :return: sql literal for value
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return "TIMESTAMP '{}'".format(value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3])
+    if isinstance(value, datetime.date):
+        return "DATE '{}'".format(value.isoformat())
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def where(filter):
+    """
+    :param filter: sql predicate string, or dict of column to value (None for IS NULL, a list for IN)
+    :return: predicate string or None if there is no filter
+    """
+    if not filter:
+        return None
+    if isinstance(filter, string_types):
+        return filter
+    clauses = list()
+    for column, value in sorted(filter.items()):
+        if value is None:
+            clauses.append("{} IS NULL".format(quote_identifier(column)))
+        elif isinstance(value, (list, tuple, set)):
+            values = ", ".join(literal(v) for v in sorted(value, key=str))
+            clauses.append("{} IN ({})".format(quote_identifier(column), values))
+        else:
+            clauses.append("{} = {}".format(quote_identifier(column), literal(value)))
+    return " AND ".join(clauses)
+
+
+def conjunction(*predicates):
+    """
+    :param predicates: filters accepted by where, None entries are skipped
+    :return: predicate string joining them with AND, or None
+    """
+    clauses = [where(p) for p in predicates]
+    clauses = [c for c in clauses if c]
+    if len(clauses) < 2:
+        return clauses[0] if clauses else None
+    return " AND ".join("({})".format(c) for c in clauses)
+
+
+NUMERIC_TYPES = ("INTEGER", "BIGINT", "DECIMAL", "FLOAT", "DOUBLE")
+TEMPORAL_TYPES = ("DATE", "TIMESTAMP")
+
+
+def partition_candidates(fields, preferred=None):
+    """
+    columns suitable for range partitioning, best first
+
+    Preferred columns (eg the partition fields of a reflection) come first, then integer columns whose names look
+    like keys, other integers, temporal and other numeric columns.
+
+    :param fields: dataset fields as returned by the catalog, list of {'name': ..., 'type': {'name': ...}}
+    :param preferred: list of column names to try first (optional)
+    :return: list of column names
+    """
+    types = {f["name"]: (f.get("type") or dict()).get("name") for f in fields or list()}
+    usable = [name for name, t in types.items() if t in NUMERIC_TYPES + TEMPORAL_TYPES]
+
+    def rank(name):
+        t = types[name]
+        lowered = name.lower()
+        if t in ("INTEGER", "BIGINT"):
+            return 0 if lowered == "id" or lowered.endswith("_id") else 1
+        return 2 if t in TEMPORAL_TYPES else 3
+
+    ordered = sorted(usable, key=lambda n: (rank(n), [f["name"] for f in fields].index(n)))
+    first = [p for p in preferred or list() if p in usable]
+    return first + [n for n in ordered if n not in first]
+
+
+def split_range(low, high, n):
+    """
+    split the closed interval [low, high] into at most n contiguous pieces
+
+    :param low: minimum value, int, float, Decimal, date or datetime
+    :param high: maximum value of the same type
+    :param n: number of pieces
+    :return: list of boundaries, piece i covers boundaries[i] <= x < boundaries[i + 1] and the last piece includes
+             its upper boundary
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    if low is None or high is None or low == high:
+        return [low, high]
+    if isinstance(low, datetime.datetime):
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=low.tzinfo)
+        seconds = split_range((low - epoch).total_seconds(), (high - epoch).total_seconds(), n)
+        inner = [epoch + datetime.timedelta(seconds=round(s, 3)) for s in seconds[1:-1]]
+        return _dedupe([low] + inner + [high])
+    if isinstance(low, datetime.date):
+        days = split_range(low.toordinal(), high.toordinal(), n)
+        return _dedupe([datetime.date.fromordinal(d) for d in days])
+    if isinstance(low, int) and isinstance(high, int):
+        step = max(1, -(-(high - low) // n))
+        return _dedupe(list(range(low, high, step)) + [high])
+    step = (high - low) / n
+    return _dedupe([low + step * i for i in range(n)] + [high])
+
+
+def _dedupe(boundaries):
+    result = list()
+    for b in boundaries:
+        if not result or b > result[-1]:
+            result.append(b)
+    return result
+
+
+def range_predicates(column, boundaries):
+    """
+    predicates selecting each piece of a split_range, plus one for nulls so every row is covered exactly once
+
+    :param column: column name
+    :param boundaries: from split_range
+    :return: list of predicate strings
+    """
+    quoted = quote_identifier(column)
+    if boundaries[0] is None:
+        # empty table or only nulls
+        return ["{} IS NULL".format(quoted)]
+    predicates = list()
+    last = len(boundaries) - 2
+    for i, (low, high) in enumerate(zip(boundaries, boundaries[1:])):
+        predicates.append(
+            "{0} >= {1} AND {0} {2} {3}".format(quoted, literal(low), "<=" if i == last else "<", literal(high))
+        )
+    predicates.append("{} IS NULL".format(quoted))
+    return predicates
+
+
+def quantile_predicates(column, upper_bounds):
+    """
+    predicates selecting the rows between consecutive quantile upper bounds, plus one for nulls
+
+    :param column: column name
+    :param upper_bounds: ascending maximum value of each quantile eg from an NTILE query
+    :return: list of predicate strings
+    """
+    quoted = quote_identifier(column)
+    bounds = _dedupe([b for b in upper_bounds if b is not None])
+    predicates = list()
+    for i, high in enumerate(bounds):
+        if i == 0:
+            predicates.append("{} <= {}".format(quoted, literal(high)))
+        else:
+            predicates.append("{0} > {1} AND {0} <= {2}".format(quoted, literal(bounds[i - 1]), literal(high)))
+    predicates.append("{} IS NULL".format(quoted))
+    return predicates
+
+
+def partition_predicates(read_table, table, column, n_partitions, strategy="minmax", filter=None):
+    """
+    split table into about n_partitions ranges of column
+
+    * minmax: equal width ranges between MIN and MAX, one cheap aggregate query
+    * ntile: equal row count ranges from an NTILE window query, better for skewed columns but the server has to
+      sort the column
+
+    Rows where column is null get a range of their own so every row is read exactly once.
+
+    :param read_table: function running an sql query and returning a pyarrow.Table
+    :param table: quoted sql table name
+    :param column: column to split on
+    :param n_partitions: number of ranges
+    :param strategy: minmax or ntile
+    :param filter: only consider rows matching this predicate string or dict (optional)
+    :return: list of predicate strings
+    """
+    quoted = quote_identifier(column)
+    predicate = where(filter)
+    if strategy == "minmax":
+        sql = 'SELECT MIN({0}) AS "low", MAX({0}) AS "high" FROM {1}{2}'.format(
+            quoted, table, " WHERE " + predicate if predicate else ""
+        )
+        bounds = read_table(sql)
+        low, high = bounds.column(0)[0].as_py(), bounds.column(1)[0].as_py()
+        return range_predicates(column, split_range(low, high, n_partitions))
+    if strategy == "ntile":
+        sql = (
+            'SELECT MAX({0}) AS "high" FROM (SELECT {0}, NTILE({1}) OVER (ORDER BY {0}) AS "tile" FROM {2} '
+            'WHERE {3}) GROUP BY "tile" ORDER BY "tile"'
+        ).format(quoted, int(n_partitions), table, conjunction(predicate, "{} IS NOT NULL".format(quoted)))
+        return quantile_predicates(column, read_table(sql).column(0).to_pylist())
+    raise NotImplementedError("partition strategy {} is not supported, use minmax or ntile".format(strategy))
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+#
+"""Stream record batches to a file object as they arrive, eg to print a query result from the cli."""
+import base64
+
+from .. import codec
+
+FORMATS = ("json", "ndjson", "csv", "arrow")
+
+
+def limit_batches(batches, limit=None):
+    """
+    :param batches: iterable of pyarrow.RecordBatch
+    :param limit: stop after this many rows, None for all of them
+    :return: generator of batches holding at most limit rows in total
+    """
+    if limit is None:
+        for batch in batches:
+            yield batch
+        return
+    remaining = limit
+    for batch in batches:
+        if remaining <= 0:
+            break
+        if batch.num_rows > remaining:
+            batch = batch.slice(0, remaining)
+        remaining -= batch.num_rows
+        yield batch
+
+
+def batch_rows(batch):
+    """
+    :param batch: pyarrow.RecordBatch
+    :return: list of dicts which can be encoded as json. Dates and times become iso strings, durations and
+             intervals their str() and binary values base64
+    """
+    import pyarrow as pa
+
+    columns = list()
+    for field, column in zip(batch.schema, batch.columns):
+        if pa.types.is_duration(field.type) or pa.types.is_interval(field.type):
+            values = [None if i is None else str(i) for i in column.to_pylist()]
+        elif pa.types.is_temporal(field.type):
+            values = [None if i is None else i.isoformat() for i in column.to_pylist()]
+        elif pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type):
+            values = [None if i is None else base64.b64encode(i).decode("ascii") for i in column.to_pylist()]
+        else:
+            values = column.to_pylist()
+        columns.append(values)
+    names = batch.schema.names
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def write_stream(batches, sink, file_format="ndjson", schema=None):
+    """
+    write record batches to a binary file object one batch at a time, flushing after each, so memory use is bounded
+    by the batch size and output starts with the first batch
+
+    json writes a single array, ndjson one object per line, csv a header and a line per row and arrow the Arrow IPC
+    stream format
+
+    :param batches: iterable of pyarrow.RecordBatch
+    :param sink: writable binary file object eg sys.stdout.buffer
+    :param file_format: one of FORMATS
+    :param schema: pyarrow.Schema, needed by csv and arrow to write an empty result (optional)
+    :return: number of rows written
+    """
+    if file_format not in FORMATS:
+        raise KeyError("unknown format {}, options are {}".format(file_format, FORMATS))
+    writer = _WRITERS[file_format](sink, schema)
+    rows = 0
+    for batch in batches:
+        writer.write(batch)
+        rows += batch.num_rows
+        sink.flush()
+    writer.close()
+    sink.flush()
+    return rows
+
+
+class _JsonWriter(object):
+    def __init__(self, sink, schema=None):
+        self.sink = sink
+        self.first = True
+        sink.write(b"[")
+
+    def write(self, batch):
+        rows = [codec.dumps(i) for i in batch_rows(batch)]
+        if rows:
+            self.sink.write(("" if self.first else ", ").encode("utf-8") + ", ".join(rows).encode("utf-8"))
+            self.first = False
+
+    def close(self):
+        self.sink.write(b"]\n")
+
+
+class _NdjsonWriter(object):
+    def __init__(self, sink, schema=None):
+        self.sink = sink
+
+    def write(self, batch):
+        for row in batch_rows(batch):
+            self.sink.write(codec.dumps(row).encode("utf-8") + b"\n")
+
+    def close(self):
+        pass
+
+
+class _ArrowWriter(object):
+    def __init__(self, sink, schema=None):
+        self.sink = sink
+        self.schema = schema
+        self.writer = None
+
+    def _open(self, schema):
+        import pyarrow as pa
+
+        self.schema = schema
+        self.writer = pa.ipc.new_stream(self.sink, schema)
+
+    def write(self, batch):
+        if self.writer is None:
+            self._open(batch.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        if self.writer is None and self.schema is not None:
+            self._open(self.schema)
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _CsvWriter(_ArrowWriter):
+    def _open(self, schema):
+        from pyarrow import csv
+
+        self.schema = schema
+        self.writer = csv.CSVWriter(self.sink, schema)
+
+
+_WRITERS = {"json": _JsonWriter, "ndjson": _NdjsonWriter, "csv": _CsvWriter, "arrow": _ArrowWriter}
@@ -88,6 +88,9 @@ setup(
         ':python_version == "2.7"': ["futures"],
         "full": requirements_full,
         "noarrow": requirements_noarrow,
+        "fastjson": ["orjson"],
+        "prometheus": ["prometheus_client"],
+        "opentelemetry": ["opentelemetry-api"],
     },
-    entry_points={"console_scripts": ["dremio_client=dremio_client.cli:cli"]},
+    entry_points={"console_scripts": ["dremio_client=dremio_client.daemon:main"]},
 )
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+
+import decimal
+
+import pytest
+
+from dremio_client import codec
+from dremio_client.conf import build_config
+from dremio_client.model.endpoints import catalog
+
+
+@pytest.fixture(params=codec.available_codecs())
+def json_codec(request):
+    codec.set_codec(request.param)
+    yield request.param
+    codec.set_codec()
+
+
+def test_round_trip(json_codec):
+    with open("tests/data/catalog.json", "rb") as f:
+        raw = f.read()
+    data = codec.loads(raw)
+    assert codec.loads(bytearray(raw)) == data
+    assert codec.loads(codec.dumps(data)) == data
+    assert codec.dumps({"a": decimal.Decimal("1.10")}).replace(" ", "") == '{"a":1.10}'
+
+
+def test_endpoint_decoding(json_codec, requests_mock):
+    with open("tests/data/catalog.json", "r") as f:
+        txt = f.read()
+    requests_mock.get("http://localhost:9047/api/v3/catalog", text=txt)
+    assert catalog("1234", "http://localhost:9047") == codec.loads(txt)
+
+
+def test_configure():
+    codec.configure(build_config({"json.codec": "json"}))
+    assert codec.get_codec() == "json"
+    with pytest.raises(KeyError):
+        codec.set_codec("not-a-codec")
+    codec.configure(build_config(None))
+    assert codec.get_codec() == codec.available_codecs()[0]
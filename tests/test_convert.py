@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+
+from dremio_client.util.convert import ZERO_COPY_PANDAS_OPTIONS, convert_table, output_type  # NOQA
+
+
+def _table():
+    return pa.table({"a": [1, 2, 3], "b": pa.array(["x", "y", "x"]).dictionary_encode()})
+
+
+def test_output_type():
+    assert output_type(True, None) == "pandas"
+    assert output_type(False, None) == "arrow"
+    assert output_type(True, "numpy") == "numpy"
+    with pytest.raises(NotImplementedError):
+        output_type(True, "csv")
+
+
+def test_convert_pandas():
+    df = convert_table(_table(), "pandas", **ZERO_COPY_PANDAS_OPTIONS)
+    assert list(df["a"]) == [1, 2, 3]
+    assert df["b"].dtype.name == "category"
+    df = convert_table(_table(), "pandas", categorical=False)
+    assert df["b"].dtype.name != "category"
+
+
+def test_convert_arrow_and_numpy():
+    table = _table()
+    assert convert_table(table, "arrow") is table
+    arrays = convert_table(table, "numpy", categorical=False)
+    assert list(arrays["a"]) == [1, 2, 3]
+    assert list(arrays["b"]) == ["x", "y", "x"]
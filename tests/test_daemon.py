@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import json
+import os
+import threading
+
+import pytest
+
+from dremio_client import daemon
+
+pytestmark = pytest.mark.skipif(not hasattr(daemon.socket, "AF_UNIX"), reason="needs unix sockets")
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    path = str(tmp_path / "agent.sock")
+    server = daemon.Agent(path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    monkeypatch.setenv("DREMIO_CLIENTDAEMON", path)
+    yield path
+    daemon.stop(path)
+    thread.join(5)
+    assert not os.path.exists(path)
+
+
+def test_agent_runs_commands(agent, requests_mock, capsys):
+    requests_mock.post("http://localhost:9047/apiv2/login", text=json.dumps({"token": "12345"}))
+    with open("tests/data/catalog.json") as f:
+        catalog = json.load(f)
+    requests_mock.get("http://localhost:9047/api/v3/catalog", text=json.dumps(catalog))
+
+    with pytest.raises(SystemExit) as e:
+        daemon.main(["catalog"])
+    assert e.value.code == 0
+    assert json.loads(capsys.readouterr().out) == catalog
+
+    with pytest.raises(SystemExit) as e:
+        daemon.main(["job-status"])
+    assert e.value.code == 2
+    assert "Missing argument" in capsys.readouterr().err
+    status = daemon.status(agent)
+    assert status["commands"] == 2 and status["pid"] == os.getpid()
+    assert "DREMIO_CLIENTDAEMON" in os.environ  # the caller's environment is restored after each command
+
+
+def test_falls_back_without_agent(tmp_path, monkeypatch):
+    monkeypatch.setenv("DREMIO_CLIENTDAEMON", str(tmp_path / "missing.sock"))
+    assert daemon.request({"control": "status"}) is None
+    monkeypatch.setenv("DREMIO_CLIENTDAEMON", "off")
+    assert daemon.socket_path() is None
+
+
+def test_command_position():
+    assert daemon._command(["--profile", "-h", "daemon", "query", "--sql", "daemon"]) == "query"
+    assert daemon._command(["--config=daemon", "shell"]) == "shell"
+    assert daemon._command(["--version"]) is None
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import datetime
+
+import pyarrow as pa
+import pytest
+
+from dremio_client.model.data import PhysicalDataset
+from dremio_client.util import ResultSet
+from dremio_client.util.sql import partition_candidates, range_predicates, split_range
+
+_FIELDS = [
+    {"name": "id", "type": {"name": "BIGINT"}},
+    {"name": "region", "type": {"name": "VARCHAR"}},
+    {"name": "amount", "type": {"name": "DECIMAL", "precision": 10, "scale": 2}},
+]
+
+
+def _dataset(calls):
+    def endpoint(sql, **kwargs):
+        calls.append((sql, kwargs))
+        return sql
+
+    return PhysicalDataset(None, None, endpoint, path=["src", "sales"], fields=_FIELDS, id="1")
+
+
+def test_scan_projection_and_filter():
+    calls = list()
+    ds = _dataset(calls)
+    ds.scan(["id", "amount"], filter={"region": ["EU", "US"], "id": None}, limit=10, method="flight")
+    assert calls[-1] == (
+        'SELECT "id", "amount" FROM "src"."sales" WHERE "id" IS NULL AND "region" IN (\'EU\', \'US\') LIMIT 10',
+        {"output": "resultset", "method": "flight"},
+    )
+    assert ds.scan_sql(filter={"region": "O'Neil", "id": 3}) == (
+        'SELECT * FROM "src"."sales" WHERE "id" = 3 AND "region" = \'O\'\'Neil\''
+    )
+    assert ds.scan_sql(filter="amount > 5") == 'SELECT * FROM "src"."sales" WHERE amount > 5'
+    assert "DATE '2020-01-02'" in ds.scan_sql(filter={"id": datetime.date(2020, 1, 2)})
+    with pytest.raises(KeyError):
+        ds.scan(["missing"])
+
+
+def test_schema_from_fields():
+    ds = _dataset(list())
+    assert ds.schema() == pa.schema([("id", pa.int64()), ("region", pa.string()), ("amount", pa.decimal128(10, 2))])
+    assert ds.schema(["amount"]).names == ["amount"]
+
+
+def test_schema_from_plan():
+    schema = pa.schema([("id", pa.int64())])
+    calls = list()
+
+    def endpoint(sql, **kwargs):
+        calls.append((sql, kwargs))
+        return schema
+
+    ds = PhysicalDataset(None, None, endpoint, path=["src", "sales"], fields=[{"name": "id"}], id="1")
+    assert ds.schema() == schema
+    assert calls == [('SELECT * FROM "src"."sales"', {"output": "schema"})]
+
+
+def test_schema_from_empty_scan_is_closed():
+    schema = pa.schema([("id", pa.int64())])
+    results = list()
+
+    class _Stream(object):
+        closed = False
+
+        def __iter__(self):
+            return iter([pa.RecordBatch.from_pylist([], schema=schema)])
+
+        def close(self):
+            self.closed = True
+
+    def endpoint(sql, **kwargs):
+        if kwargs["output"] == "schema":
+            raise NotImplementedError("no flight")
+        assert sql.endswith("LIMIT 0")
+        results.append(_Stream())
+        return ResultSet(results[-1], schema, method="flight")
+
+    ds = PhysicalDataset(None, None, endpoint, path=["src", "sales"], fields=[{"name": "id"}], id="1")
+    assert ds.schema() == schema
+    assert results[0].closed
+
+
+def test_split_range():
+    assert split_range(0, 10, 3) == [0, 4, 8, 10]
+    assert split_range(5, 5, 3) == [5, 5]
+    assert split_range(datetime.date(2020, 1, 1), datetime.date(2020, 1, 3), 4) == [
+        datetime.date(2020, 1, 1),
+        datetime.date(2020, 1, 2),
+        datetime.date(2020, 1, 3),
+    ]
+    assert range_predicates("id", [0, 5, 10]) == [
+        '"id" >= 0 AND "id" < 5',
+        '"id" >= 5 AND "id" <= 10',
+        '"id" IS NULL',
+    ]
+
+
+class _Endpoint(object):
+    def __init__(self, table):
+        import duckdb
+
+        self.db = duckdb.connect()
+        self.db.register("source", table)
+        self.db.execute("CREATE TABLE sales AS SELECT * FROM source")
+        self.queries = list()
+
+    def __call__(self, sql, output=None, **kwargs):
+        self.queries.append(sql)
+        sql = sql.replace('"src"."sales"', "sales").replace("RAND()", "random()")
+        result = self.db.cursor().execute(sql).to_arrow_table()
+        if output == "resultset":
+            return ResultSet.from_table(result)
+        return result
+
+
+def test_sample_and_export(tmp_path):
+    pytest.importorskip("duckdb")
+    table = pa.table({"id": list(range(1000)) + [None], "region": ["EU", "US"] * 500 + ["EU"]})
+    endpoint = _Endpoint(table)
+    ds = PhysicalDataset(None, None, endpoint, path=["src", "sales"], fields=_FIELDS[:2], id="1")
+    ds._reflection_fields = lambda: list()
+    assert ds.partition_column() == "id"
+
+    assert ds.sample(n=10, output="arrow").num_rows == 10
+    assert 0 < ds.sample(fraction=0.5, output="arrow").num_rows < 1001
+
+    exported = ds.export(str(tmp_path), chunk_rows=100, max_workers=3)
+    result = exported.to_table()
+    assert result.num_rows == 1001
+    assert sorted(i for i in result.column("id").to_pylist() if i is not None) == list(range(1000))
+    assert len(exported.files) >= 10
+
+
+def test_partition_candidates_prefer_id_columns():
+    fields = [{"name": n, "type": {"name": "BIGINT"}} for n in ("paid", "valid", "customer_id", "id")]
+    fields.append({"name": "day", "type": {"name": "DATE"}})
+    assert partition_candidates(fields) == ["customer_id", "id", "paid", "valid", "day"]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import decimal
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from dremio_client import codec  # NOQA
+from dremio_client.util.decode import arrow_schema, decode_pages, page_batch  # NOQA
+
+SCHEMA = [
+    {"name": "ts", "type": {"name": "TIMESTAMP"}},
+    {"name": "amount", "type": {"name": "DECIMAL", "precision": 10, "scale": 2}},
+    {"name": "days", "type": {"name": "LIST", "subSchema": [{"type": {"name": "DATE"}}]}},
+    {
+        "name": "point",
+        "type": {"name": "STRUCT", "subSchema": [{"name": "x", "type": {"name": "BIGINT"}}]},
+    },
+    {"name": "name", "type": {"name": "VARCHAR"}},
+]
+
+
+def test_arrow_schema():
+    schema = arrow_schema(SCHEMA)
+    assert schema.field("ts").type == pa.timestamp("ms")
+    assert schema.field("amount").type == pa.decimal128(10, 2)
+    assert schema.field("days").type == pa.list_(pa.date32())
+    assert schema.field("point").type == pa.struct([pa.field("x", pa.int64())])
+
+
+def test_decode_pages():
+    pages = [
+        {
+            "rowCount": 3,
+            "schema": SCHEMA,
+            "rows": [
+                {"ts": "2019-08-08 16:17:05.170", "amount": 1.1, "days": ["2019-01-01"], "point": {"x": 1}},
+                {"amount": "3", "days": None, "name": "b"},
+            ],
+        },
+        {"rowCount": 3, "schema": SCHEMA, "rows": [{"name": "c"}]},
+    ]
+    table = decode_pages(pages)
+    assert table.num_rows == 3
+    assert table.column("ts").to_pylist()[0] == datetime.datetime(2019, 8, 8, 16, 17, 5, 170000)
+    assert table.column("amount").to_pylist()[:2] == [decimal.Decimal("1.10"), decimal.Decimal("3.00")]
+    assert table.column("days").to_pylist() == [[datetime.date(2019, 1, 1)], None, None]
+    assert table.column("point").to_pylist() == [{"x": 1}, None, None]
+    assert table.column("name").to_pylist() == [None, "b", "c"]
+
+
+def test_decimal_rounded_to_scale():
+    dtype = pa.decimal128(10, 2)
+    batch = page_batch([{"amount": 1e-05}, {"amount": 2.345}, {"amount": 0.1}], pa.schema([("amount", dtype)]))
+    assert batch.column(0).to_pylist() == [decimal.Decimal("0.00"), decimal.Decimal("2.34"), decimal.Decimal("0.10")]
+
+
+def test_decode_exact_decimals_and_unknown_types():
+    schema = [
+        {"name": "amount", "type": {"name": "DECIMAL", "precision": 38, "scale": 2}},
+        {"name": "ratio", "type": {"name": "DOUBLE"}},
+        {"name": "span", "type": {"name": "INTERVAL"}},
+        {"name": "tags", "type": {"name": "MAP"}},
+    ]
+    rows = '[{"amount": 12345678901234567.89, "ratio": 0.5, "span": 86400000, "tags": {"a": 1}}, {"span": "P1D"}]'
+    page = codec.loads('{{"schema": {}, "rows": {}}}'.format(json.dumps(schema), rows), decimals=True)
+    table = decode_pages([page])
+    assert table.column("amount").to_pylist() == [decimal.Decimal("12345678901234567.89"), None]
+    assert table.column("ratio").to_pylist() == [0.5, None]
+    assert table.column("span").to_pylist() == ["86400000", "P1D"]
+    assert [json.loads(i) for i in table.column("tags").to_pylist() if i] == [{"a": 1}]
+
+
+def test_decode_empty_pages():
+    with open("tests/data/job_results.json") as f:
+        table = decode_pages([json.load(f)])
+    assert table.num_rows == 0
+    assert table.schema.names == ["name"]
@@ -94,3 +94,19 @@ def test_dataset(requests_mock):
     c = catalog(token, "https://example.com", lambda x: x)
     sql = c.testsource.profiles.sql
     assert sql("hello") == "hello"
+
+
+def test_cli_profile(requests_mock, tmp_path):
+    requests_mock.post("http://localhost:9047/apiv2/login", text=json.dumps({"token": "12345"}))
+    with open("tests/data/catalog.json", "r+") as f:
+        requests_mock.get("http://localhost:9047/api/v3/catalog", text=f.read())
+    trace = str(tmp_path / "trace.json")
+    result = CliRunner().invoke(cli.cli, ["--profile", "--profile-trace", trace, "catalog"], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert "rest GET /api/v3/catalog" in result.output
+    assert "cli output" in result.output
+    with open(trace) as f:
+        events = json.load(f)["traceEvents"]
+    assert {e["cat"] for e in events} >= {"rest", "cli"}
+    catalog_call = [e for e in events if e["name"] == "GET /api/v3/catalog"][0]
+    assert catalog_call["ph"] == "X" and catalog_call["args"]["status"] == 200
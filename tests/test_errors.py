@@ -23,6 +23,8 @@
 # under the License.
 #
 from __future__ import absolute_import, division, print_function
+import json
+import zlib
 
 import pytest
 from dremio_client.error import (
@@ -31,11 +33,15 @@ from dremio_client.error import (
     DremioUnauthorizedException,
 )
 from dremio_client.model.endpoints import (
+    _uncompressed_hosts,
     catalog,
     catalog_item,
     job_results,
     job_status,
+    set_catalog,
+    set_compression,
     sql,
+    update_catalog,
 )
 
 
@@ -85,3 +91,45 @@ def test_jobresults(requests_mock):
     requests_mock.get("http://localhost:9047/api/v3/job/1/results", status_code=404, reason="Unauthorized for url")
     with pytest.raises(DremioNotFoundException):
         job_results("1234", "http://localhost:9047", "1")
+
+
+def test_request_compression(requests_mock):
+    set_compression(request=True, request_threshold=10)
+    try:
+        requests_mock.post("http://localhost:9047/api/v3/catalog", text='{"id": "1"}')
+        assert set_catalog("1234", "http://localhost:9047", {"name": "x" * 100}) == {"id": "1"}
+        request = requests_mock.last_request
+        assert request.headers["Content-Encoding"] == "gzip"
+        assert "gzip" in request.headers["Accept-Encoding"]
+        assert json.loads(zlib.decompress(request.body, 31)) == {"name": "x" * 100}
+
+        requests_mock.put("http://localhost:9047/api/v3/catalog/1", [{"status_code": 415}, {"text": '{"id": "1"}'}])
+        assert update_catalog("1234", "http://localhost:9047", "1", {"name": "x" * 100}) == {"id": "1"}
+        assert "Content-Encoding" not in requests_mock.last_request.headers
+        update_catalog("1234", "http://localhost:9047", "1", {"name": "x" * 100})
+        assert "Content-Encoding" not in requests_mock.last_request.headers
+    finally:
+        set_compression(request=False, request_threshold=64 * 1024)
+        _uncompressed_hosts.clear()
+
+
+def test_streamed_response_decompression(requests_mock):
+    payload = {"rowCount": 1000, "rows": [{"name": "row{}".format(i)} for i in range(1000)]}
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    body = compressor.compress(json.dumps(payload).encode("utf-8")) + compressor.flush()
+    requests_mock.get(
+        "http://localhost:9047/api/v3/job/1/results", content=body, headers={"Content-Encoding": "gzip"}
+    )
+    set_compression(stream_threshold=0, chunk_size=256)
+    try:
+        assert job_results("1234", "http://localhost:9047", "1") == payload
+    finally:
+        set_compression(stream_threshold=1024 * 1024, chunk_size=64 * 1024)
+
+
+def test_error_response_is_closed(requests_mock):
+    requests_mock.get("http://localhost:9047/api/v3/catalog", status_code=404, text='{"errorMessage": "missing"}')
+    with pytest.raises(DremioNotFoundException) as e:
+        catalog("token", "http://localhost:9047")
+    assert e.value.response.raw.closed
+    assert "missing" in e.value.response.text
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import threading
+
+import pyarrow as pa
+import pytest
+
+from dremio_client.error import DremioCancelledException
+from dremio_client.flight import CancellationToken, ProgressTracker, query
+
+flight = pytest.importorskip("pyarrow.flight")
+
+
+def test_cancellation_token():
+    token = CancellationToken()
+    calls = list()
+    token.on_cancel(lambda: calls.append(1))
+    token.on_cancel(lambda: 1 / 0)  # errors in callbacks are ignored
+    token.cancel()
+    token.cancel()
+    token.on_cancel(lambda: calls.append(2))
+    assert calls == [1, 2]
+    with pytest.raises(DremioCancelledException):
+        token.raise_if_cancelled()
+
+
+def test_progress_tracker():
+    seen = list()
+    tracker = ProgressTracker(seen.append, total_rows=20, min_interval=60)
+    batch = pa.RecordBatch.from_pydict({"a": list(range(10))})
+    tracker.update(batch)
+    tracker.update(batch)
+    tracker.finish()
+    assert [p.rows for p in seen] == [10, 20]
+    assert seen[-1].batches == 2 and seen[-1].bytes == 2 * batch.nbytes
+    assert seen[-1].fraction == 1.0
+
+
+class _Server(flight.FlightServerBase):
+    schema = pa.schema([("a", pa.int64())])
+
+    def __init__(self, started):
+        super(_Server, self).__init__("grpc://127.0.0.1:0")
+        self.started = started
+
+    def get_flight_info(self, context, descriptor):
+        return flight.FlightInfo(self.schema, descriptor, [flight.FlightEndpoint(b"t", [])], -1, -1)
+
+    def do_get(self, context, ticket):
+        def batches():
+            while not context.is_cancelled():
+                self.started.set()
+                yield pa.RecordBatch.from_pydict({"a": [1, 2, 3]})
+
+        return flight.GeneratorStream(self.schema, batches())
+
+
+def test_cancel_flight_query():
+    started = threading.Event()
+    server = _Server(started)
+    token = CancellationToken()
+    threading.Thread(target=lambda: started.wait(10) and token.cancel()).start()
+    try:
+        with pytest.raises(DremioCancelledException):
+            query("select 1", port=server.port, username=None, cancel=token, progress=lambda p: None)
+    finally:
+        server.shutdown()
+
+
+class _PlanOnlyServer(flight.FlightServerBase):
+    schema = pa.schema([("a", pa.int64())])
+
+    def get_flight_info(self, context, descriptor):
+        return flight.FlightInfo(self.schema, descriptor, [flight.FlightEndpoint(b"t", [])], -1, -1)
+
+    def do_get(self, context, ticket):
+        raise flight.FlightServerError("no data should be fetched")
+
+
+def test_schema_without_fetching():
+    with _PlanOnlyServer("grpc://127.0.0.1:0") as server:
+        assert query("select a", port=server.port, username=None, output="schema") == _PlanOnlyServer.schema
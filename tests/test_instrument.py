@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import pyarrow as pa
+import pytest
+
+from dremio_client import instrument
+from dremio_client.auth import TokenManager
+from dremio_client.error import DremioNotFoundException
+from dremio_client.model.endpoints import catalog, catalog_item, job_status
+
+flight = pytest.importorskip("pyarrow.flight")
+
+JOB = "1f2a3b4c-0000-1111-2222-333344445555"
+
+
+@pytest.fixture
+def stats():
+    collector = instrument.add_sink(instrument.StatsCollector())
+    yield collector
+    instrument.clear_sinks()
+
+
+def test_endpoint_template():
+    assert instrument.endpoint_template("http://localhost:9047/api/v3/job/{}".format(JOB)) == "/api/v3/job/{id}"
+    assert instrument.endpoint_template("http://localhost:9047/api/v3/catalog/123?x=1") == "/api/v3/catalog/{id}"
+    assert instrument.endpoint_template("http://h/api/v3/user/by-name/bob") == "/api/v3/user/by-name/{name}"
+
+
+def test_rest_events(requests_mock, stats):
+    events = list()
+    instrument.add_sink(events.append)
+    url = "http://localhost:9047/api/v3/job/" + JOB
+    requests_mock.get(url, [{"status_code": 401, "text": "{}"}, {"text": '{"jobState": "COMPLETED"}'}])
+    token = TokenManager(lambda: "token1", token="token0")
+    job_status(token, "http://localhost:9047", JOB)
+    requests_mock.get("http://localhost:9047/api/v3/catalog/" + JOB, status_code=404, text="{}")
+    with pytest.raises(DremioNotFoundException):
+        catalog_item("token", "http://localhost:9047", JOB)
+
+    ok, missing = events
+    assert (ok.transport, ok.method, ok.endpoint, ok.status, ok.retries) == ("rest", "GET", "/api/v3/job/{id}", 200, 1)
+    assert ok.bytes_received == len('{"jobState": "COMPLETED"}') and ok.ok and ok.latency > 0
+    assert missing.status == 404 and not missing.ok
+    snapshot = stats.snapshot()
+    assert snapshot["rest /api/v3/job/{id}"]["count"] == 1
+    assert snapshot["rest /api/v3/catalog/{id}"]["errors"] == 1
+
+
+def test_failing_sink_is_ignored(requests_mock, stats):
+    instrument.add_sink(lambda event: 1 / 0)
+    requests_mock.get("http://localhost:9047/api/v3/catalog", text='{"data": []}')
+    assert catalog("token", "http://localhost:9047") == {"data": []}
+    assert stats.snapshot()["rest /api/v3/catalog"]["count"] == 1
+
+
+class _Server(flight.FlightServerBase):
+    table = pa.table({"a": list(range(10))})
+
+    def get_flight_info(self, context, descriptor):
+        return flight.FlightInfo(self.table.schema, descriptor, [flight.FlightEndpoint(b"t", [])], 10, -1)
+
+    def do_get(self, context, ticket):
+        return flight.RecordBatchStream(self.table)
+
+
+def test_flight_events(stats):
+    from dremio_client.flight import query
+
+    with _Server("grpc://127.0.0.1:0") as server:
+        result = query("select a", port=server.port, username=None, output="resultset")
+        assert stats.snapshot() == {}  # the event is emitted once the result has been read
+        assert result.to_arrow().num_rows == 10
+    summary = stats.snapshot()["flight query"]
+    assert summary["count"] == 1 and summary["rows"] == 10 and summary["errors"] == 0
+
+
+def test_flight_event_on_close(stats):
+    from dremio_client.flight import query
+
+    with _Server("grpc://127.0.0.1:0") as server:
+        with query("select a", port=server.port, username=None, output="resultset"):
+            pass  # closed without reading a batch
+    assert stats.snapshot()["flight query"]["count"] == 1
+
+
+class _Span(object):
+    def __init__(self, spans, name, start_time, attributes):
+        self.name, self.start, self.attributes = name, start_time, attributes
+        spans.append(self)
+
+    def set_status(self, status):
+        self.status = status
+
+    def end(self, end_time):
+        self.end_time = end_time
+
+
+class _Tracer(object):
+    def __init__(self):
+        self.spans = list()
+
+    def start_span(self, name, start_time, attributes):
+        return _Span(self.spans, name, start_time, attributes)
+
+
+def test_opentelemetry_sink():
+    tracer = _Tracer()
+    sink = instrument.OpenTelemetrySink(tracer)
+    sink(instrument.CallEvent("rest", "/api/v3/catalog", "GET", 200, 0.5, start=100.0))
+    span = tracer.spans[0]
+    assert span.name == "dremio rest GET /api/v3/catalog"
+    assert span.end_time - span.start == int(0.5 * 1e9)
+    assert span.attributes["http.status_code"] == 200
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import json
+import threading
+
+from dremio_client.model.data import VirtualDataset
+from dremio_client.util import LineageFetcher, LineageGraph, RefreshPlanner
+from dremio_client.util.lineage import get_lineage_graph
+
+
+def _entity(cid, virtual):
+    return {"id": cid, "path": [cid], "datasetType": "VIRTUAL" if virtual else "PROMOTED"}
+
+
+# p1, p2, p3 are physical. v1 <- p1, p2 ; v2 <- v1, p2 ; v3 <- v2, p3 ; v4 <- v1
+EDGES = [("p1", "v1"), ("p2", "v1"), ("v1", "v2"), ("p2", "v2"), ("v2", "v3"), ("p3", "v3"), ("v1", "v4")]
+
+
+class _Client(object):
+    def __init__(self, edges=EDGES, fail=()):
+        self.graph_calls = list()
+        self.refreshed = list()
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.edges = edges
+
+    def graph(self, cid):
+        with self.lock:
+            self.graph_calls.append(cid)
+        return {
+            "parents": [_entity(p, p.startswith("v")) for p, c in self.edges if c == cid],
+            "children": [_entity(c, True) for p, c in self.edges if p == cid],
+        }
+
+    def catalog_item(self, cid, path):
+        return {"id": cid, "type": "VIRTUAL_DATASET" if cid.startswith("v") else "PHYSICAL_DATASET"}
+
+    def refresh_pds(self, pid):
+        if pid in self.fail:
+            raise ValueError(pid)
+        with self.lock:
+            self.refreshed.append(pid)
+
+
+def test_lineage():
+    client = _Client()
+    fetcher = LineageFetcher(client.graph)
+    lineage = fetcher.lineage(["v3"])
+    assert sorted(client.graph_calls) == ["p1", "p2", "p3", "v1", "v2", "v3"]
+    assert lineage.parents["v3"] == {"v2", "p3"}
+    assert lineage.children["v1"] == {"v2", "v4"}
+
+    fetcher.lineage(["v4"], directions=("upstream", "downstream"))
+    assert sorted(client.graph_calls) == ["p1", "p2", "p3", "v1", "v2", "v3", "v4"]  # the rest are cached
+
+
+def test_plan_and_execute():
+    client = _Client()
+    planner = RefreshPlanner(client)
+    plan = planner.plan(["v3", "v2"])
+    assert plan.waves == [["p1", "p2", "p3"]]
+    events = list()
+    result = planner.execute(plan, events.append)
+    assert sorted(client.refreshed) == ["p1", "p2", "p3"]
+    assert not result.failed
+    assert [e.done for e in events] == [1, 2, 3] and events[-1].total == 3
+
+    assert planner.plan(["p1"]).waves == [["p1"]]
+    assert planner.plan(["v4"]).datasets == ["p1", "p2"]
+
+
+def test_waves_follow_lineage():
+    # a physical dataset downstream of another, eg a reflection materialized as a table
+    client = _Client(EDGES + [("p3", "p4"), ("p4", "v5")], fail=("p1",))
+    planner = RefreshPlanner(client)
+    plan = planner.plan(["v5", "v1"])
+    assert plan.waves == [["p1", "p2", "p3"], ["p4"]]
+    result = planner.execute(plan)
+    assert list(result.failed) == ["p1"]
+    assert "p4" not in client.refreshed
+
+
+def test_lineage_graph_queries():
+    client = _Client()
+    lineage = LineageGraph(client.graph)
+    assert lineage.ancestors("v3") == {"v2", "v1", "p1", "p2", "p3"}
+    calls = len(client.graph_calls)
+    assert lineage.ancestors("v2") == {"v1", "p1", "p2"}
+    assert len(client.graph_calls) == calls  # answered locally
+    assert lineage.descendants("p2") == {"v1", "v2", "v3", "v4"}
+    assert lineage.impact(["p1"]) == ["v1", "v2", "v4", "v3"]
+    assert lineage.children("v1") == {"v2", "v4"}
+    assert lineage.node("p3")["datasetType"] == "PROMOTED"
+
+
+def test_lineage_graph_persist_and_invalidate(tmp_path):
+    path = str(tmp_path / "lineage.json")
+    client = _Client()
+    lineage = LineageGraph(client.graph, path=path).build(["v1"])
+    lineage.save()
+
+    other = _Client()
+    reloaded = LineageGraph(other.graph, path=path)
+    assert reloaded.ancestors("v1") == {"p1", "p2"}
+    assert other.graph_calls == list()
+
+    other.edges = EDGES + [("p3", "v1")]
+    reloaded.invalidate(["v1"])
+    assert reloaded.parents("v1") == {"p1", "p2", "p3"}
+    assert other.graph_calls == ["v1"]
+
+
+def test_lineage_graph_max_age():
+    client = _Client()
+    lineage = LineageGraph(client.graph, max_age=0)
+    lineage.parents("v1")
+    client.edges = [("p3", "v1")]
+    assert lineage.parents("v1") == {"p3"}
+    assert client.graph_calls == ["v1", "v1"]
+
+
+def test_graph_invalidated_while_refetching():
+    client = _Client()
+    lineage = LineageGraph(lambda cid: (lineage.invalidate([cid]), client.graph(cid))[1], max_age=0)
+    lineage.parents("v1")
+    assert lineage.parents("v1") == {"p1", "p2"}
+
+
+def test_cached_dataset_graph(requests_mock):
+    requests_mock.get(
+        "http://localhost:9047/api/v3/catalog/by-path/space/vds", text=json.dumps({"id": "v1", "path": ["space", "vds"]})
+    )
+    graph = requests_mock.get(
+        "http://localhost:9047/api/v3/catalog/v1/graph", text=json.dumps({"parents": [_entity("p1", False)]})
+    )
+    requests_mock.get("http://localhost:9047/api/v3/catalog/p1/graph", text=json.dumps({"parents": []}))
+    dataset = VirtualDataset("lineage-token", "http://localhost:9047", None, path=["space", "vds"])
+    assert dataset.get_graph()["parents"][0]["id"] == "p1"
+    assert dataset.get_graph(cached=True) == dataset.get_graph(cached=True)
+    assert graph.call_count == 2
+    assert get_lineage_graph("lineage-token", "http://localhost:9047").ancestors("v1") == {"p1"}
+    shared = get_lineage_graph("lineage-token", "http://localhost:9047")
+    assert get_lineage_graph("lineage-token", "http://localhost:9047", max_age=60) is not shared
+    assert get_lineage_graph("lineage-token", "http://localhost:9047", ssl_verify=False) is not shared
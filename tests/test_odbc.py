@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import datetime
+import decimal
+import threading
+import time
+
+import pyarrow as pa
+import pytest
+
+from dremio_client.odbc import ConnectionPool, cursor_batches
+
+
+class _Cursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise RuntimeError("connection lost")
+        return self
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class _Connection(object):
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_connections():
+    created = list()
+    pool = ConnectionPool(lambda: created.append(_Connection()) or created[-1])
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert len(created) == 1
+
+
+def test_pool_health_check_and_lifetime():
+    created = list()
+    pool = ConnectionPool(lambda: created.append(_Connection()) or created[-1], max_lifetime=0.2)
+    with pytest.raises(ValueError):
+        with pool.connection() as c:
+            c.broken = True
+            raise ValueError()
+    with pool.connection() as c:
+        assert c is created[1]
+    assert created[0].closed
+    time.sleep(0.25)
+    with pool.connection() as c:
+        assert c is created[2]
+    assert created[1].closed
+
+
+def test_pool_closes_all_expired_idle_connections():
+    created = list()
+    pool = ConnectionPool(lambda: created.append(_Connection()) or created[-1], max_idle=0.2)
+    oldest = pool.acquire()
+    newest = pool.acquire()
+    pool.release(oldest)
+    time.sleep(0.25)
+    pool.release(newest)
+    # the oldest idle connection is at the bottom of the stack and would never be checked out again
+    assert oldest.closed and not newest.closed
+    with pool.connection() as c:
+        assert c is newest
+
+
+def test_pool_max_size():
+    pool = ConnectionPool(_Connection, max_size=1)
+    held = pool.acquire()
+    with pytest.raises(RuntimeError):
+        pool.acquire(timeout=0.05)
+    threading.Timer(0.05, pool.release, [held]).start()
+    assert pool.acquire(timeout=1) is held
+    pool.close()
+
+
+class _ResultCursor(object):
+    description = [
+        ("id", int, None, 19, 19, 0, True),
+        ("price", decimal.Decimal, None, 10, 10, 2, True),
+        ("name", str, None, 255, 255, 0, True),
+        ("ts", datetime.datetime, None, 23, 23, 3, True),
+    ]
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+def test_cursor_batches():
+    ts = datetime.datetime(2020, 1, 1, 12, 30)
+    rows = [(i, decimal.Decimal("1.25"), "n{}".format(i), ts) for i in range(5)] + [(None, None, None, None)]
+    cursor = _ResultCursor(rows)
+    batches = list(cursor_batches(cursor, batch_size=4))
+    assert [b.num_rows for b in batches] == [4, 2]
+    table = pa.Table.from_batches(batches)
+    assert table.schema.types == [pa.int64(), pa.decimal128(10, 2), pa.string(), pa.timestamp("us")]
+    assert table.column("price")[0].as_py() == decimal.Decimal("1.25")
+    assert table.column("id").null_count == 1
+
+    empty = list(cursor_batches(_ResultCursor([])))
+    assert len(empty) == 1 and empty[0].num_rows == 0
+    assert empty[0].schema.names == ["id", "price", "name", "ts"]
+
+
+def test_cursor_batches_schema_from_description():
+    # the first batch has no names, the schema must still say string rather than null
+    rows = [(1, None, None, None), (2, None, None, None), (3, None, "c", None)]
+    batches = list(cursor_batches(_ResultCursor(rows), batch_size=2))
+    assert batches[0].schema == batches[1].schema
+    assert batches[0].schema.field("name").type == pa.string()
+    assert pa.Table.from_batches(batches).column("name").to_pylist() == [None, None, "c"]
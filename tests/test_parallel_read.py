@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import pyarrow as pa
+import pytest
+
+from dremio_client.flight import parallel_read
+
+flight = pytest.importorskip("pyarrow.flight")
+duckdb = pytest.importorskip("duckdb")
+
+
+class _SqlServer(flight.FlightServerBase):
+    """answers flight queries by running them on an in memory duckdb table"""
+
+    def __init__(self, table):
+        super(_SqlServer, self).__init__("grpc://127.0.0.1:0")
+        self.db = duckdb.connect()
+        self.db.register("source", table)
+        self.db.execute("CREATE TABLE big AS SELECT * FROM source")
+        self.queries = list()
+
+    def _run(self, sql):
+        return self.db.cursor().execute(sql.replace('"src"."big"', "big")).to_arrow_table()
+
+    def get_flight_info(self, context, descriptor):
+        sql = descriptor.command.decode()
+        self.queries.append(sql)
+        endpoint = flight.FlightEndpoint(descriptor.command, [])
+        return flight.FlightInfo(self._run(sql).schema, descriptor, [endpoint], -1, -1)
+
+    def do_get(self, context, ticket):
+        table = self._run(ticket.ticket.decode())
+        return flight.RecordBatchStream(pa.Table.from_batches(table.to_batches(100), table.schema))
+
+
+@pytest.fixture(scope="module")
+def server():
+    table = pa.table({"id": list(range(10000)) + [None], "v": [float(i) for i in range(10001)]})
+    s = _SqlServer(table)
+    yield s
+    s.shutdown()
+
+
+@pytest.mark.parametrize("strategy", ["minmax", "ntile"])
+def test_parallel_read(server, strategy):
+    result = parallel_read(["src", "big"], "id", 4, strategy=strategy, port=server.port, username=None)
+    assert result.num_rows == 10001
+    assert result.column("id").to_pylist()[:10000] == list(range(10000))
+    assert sum(1 for q in server.queries if q.startswith('SELECT * FROM "src"."big" WHERE')) >= 5
+
+
+def test_parallel_stream(server):
+    result = parallel_read(
+        '"src"."big"', "id", 3, columns=["v"], stream=True, max_queue=1, port=server.port, username=None
+    )
+    assert result.schema.names == ["v"]
+    assert sorted(result.to_arrow().column("v").to_pylist()) == [float(i) for i in range(10001)]
+
+    partial = parallel_read('"src"."big"', "id", 3, stream=True, max_queue=1, port=server.port, username=None)
+    next(iter(partial))
+    partial.close()
+
+
+def test_client_pool_per_server_and_user():
+    from dremio_client.flight import get_client_pool
+
+    pool = get_client_pool("127.0.0.1", 1, "a", max_size=4)
+    assert get_client_pool("127.0.0.1", 1, "a", max_size=8) is pool and pool.max_size == 4
+    assert get_client_pool("127.0.0.1", 1, "b") is not pool
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import json
+import time
+
+import pyarrow as pa
+import pytest
+
+from dremio_client.query import query
+from dremio_client.util import QueryProfile
+
+JOB = "http://localhost:9047/api/v3/job/22b3b4fe-669a-4789-a9de-b1fc5ba7b500"
+
+
+def test_nested_phases():
+    profile = QueryProfile("select 1")
+    with profile.phase("decode"):
+        time.sleep(0.02)
+        with profile.phase("fetch"):
+            time.sleep(0.05)
+    assert profile.phases["fetch"] >= 0.05
+    assert 0.02 <= profile.phases["decode"] < 0.05
+    batches = [pa.RecordBatch.from_pydict({"a": [1, 2]})] * 2
+    assert len(list(profile.iter(batches))) == 2
+    assert profile.rows == 4
+    assert "client fetch" in profile.finish().summary()
+
+
+def test_rest_profile(requests_mock):
+    with open("tests/data/sql.json") as f:
+        requests_mock.post("http://localhost:9047/api/v3/sql", text=f.read())
+    with open("tests/data/job_status.json") as f:
+        requests_mock.get(JOB, text=f.read())
+    page = {"rowCount": 100, "schema": [{"name": "x", "type": {"name": "INTEGER"}}], "rows": [{"x": 1}] * 100}
+    requests_mock.get(JOB + "/results", text=json.dumps(page))
+    result, profile = query("1234", "http://localhost:9047", None, None, None, None, None, True, "select 1",
+                            method="rest", output="arrow", profile=True)
+    assert result.num_rows == 100
+    assert profile.method == "rest" and profile.rows == 100 and profile.polls == 1
+    assert profile.job_id == "22b3b4fe-669a-4789-a9de-b1fc5ba7b500"
+    assert list(profile.phases) == ["submit", "poll", "fetch", "decode", "convert"]
+    server = profile.server_phases
+    assert list(server) == ["planning", "queued", "execution", "total"]
+    assert server["planning"] == pytest.approx(0.019, abs=1e-6)
+    assert server["queued"] == pytest.approx(0.017, abs=1e-6)
+    assert server["total"] == pytest.approx(0.054, abs=1e-6)
+    assert profile.end is not None and profile.client_time == pytest.approx(profile.total - 0.054, abs=1e-6)
+
+
+def test_flight_profile():
+    flight = pytest.importorskip("pyarrow.flight")
+
+    class Server(flight.FlightServerBase):
+        table = pa.table({"a": list(range(10))})
+
+        def get_flight_info(self, context, descriptor):
+            return flight.FlightInfo(self.table.schema, descriptor, [flight.FlightEndpoint(b"t", [])], 10, -1)
+
+        def do_get(self, context, ticket):
+            return flight.RecordBatchStream(self.table)
+
+    with Server("grpc://127.0.0.1:0") as server:
+        result, profile = query(None, None, "127.0.0.1", None, server.port, None, None, True, "select a",
+                                output="resultset", profile=True)
+        assert result.profile is profile and profile.method == "flight"
+        assert "plan" in profile.phases and "fetch" not in profile.phases
+        assert len(result.to_pandas()) == 10
+    assert profile.rows == 10
+    assert profile.server_phases == {}
+    assert "fetch" in profile.phases and "convert" in profile.phases
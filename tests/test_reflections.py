@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError
+
+import pytest
+
+from dremio_client.error import DremioConflictException, DremioException, DremioNotFoundException
+from dremio_client.util import RateLimiter, ReflectionManager, ReflectionMonitor, refresh_reflections_of_one_dataset
+
+
+def _reflection(rid, dataset, type="RAW", enabled=True, status="CAN_ACCELERATE", tag="1"):
+    return {
+        "id": rid,
+        "tag": tag,
+        "datasetId": dataset,
+        "type": type,
+        "enabled": enabled,
+        "status": {"combinedStatus": status},
+        "createdAt": "2020-01-01",
+        "updatedAt": "2020-01-01",
+        "currentSizeBytes": 10,
+        "totalSizeBytes": 10,
+    }
+
+
+class _Client(object):
+    def __init__(self, reflections):
+        self.reflections_ = {r["id"]: r for r in reflections}
+        self.calls = list()
+        self.lock = threading.Lock()
+
+    def reflections(self, summary=False):
+        self.calls.append("list")
+        return {"data": [dict(r) for r in self.reflections_.values()]}
+
+    def reflection(self, rid):
+        self.calls.append("get " + rid)
+        if rid not in self.reflections_:
+            raise DremioNotFoundException("missing", None)
+        return dict(self.reflections_[rid])
+
+    def modify_reflection(self, rid, json):
+        with self.lock:
+            self.calls.append("put " + rid)
+            current = self.reflections_[rid]
+            assert "createdAt" not in json and "status" not in json
+            if json["tag"] != current["tag"]:
+                raise DremioConflictException("conflict", None)
+            updated = dict(current, **json)
+            updated["tag"] = str(int(current["tag"]) + 1)
+            self.reflections_[rid] = updated
+            return dict(updated)
+
+
+@pytest.fixture
+def client():
+    return _Client(
+        [
+            _reflection("r1", "d1"),
+            _reflection("r2", "d1", "AGGREGATION", status="FAILED"),
+            _reflection("r3", "d2", enabled=False),
+        ]
+    )
+
+
+def test_find(client):
+    manager = ReflectionManager(client)
+    assert [r["id"] for r in manager.find(dataset_id="d1")] == ["r1", "r2"]
+    assert [r["id"] for r in manager.find(dataset_id="d1", type="RAW")] == ["r1"]
+    assert [r["id"] for r in manager.find(status="FAILED")] == ["r2"]
+    assert [r["id"] for r in manager.find(enabled=False)] == ["r3"]
+    assert manager.find(dataset_id="missing") == list()
+    assert manager.statuses == {"CAN_ACCELERATE": 2, "FAILED": 1}
+    assert client.calls == ["list"]
+
+
+def test_bulk_update(client):
+    manager = ReflectionManager(client, max_workers=4)
+    result = manager.disable(manager.find(dataset_id="d1"))
+    assert sorted(result.succeeded) == ["r1", "r2"] and not result.failed
+    assert not client.reflections_["r1"]["enabled"]
+    # the index is updated from the responses, nothing is fetched again
+    assert [r["id"] for r in manager.find(enabled=False)] == ["r1", "r2", "r3"]
+    assert "get r1" not in client.calls and client.calls.count("list") == 1
+
+    result = manager.modify(["r3", "missing"], lambda r: r.update(name="renamed"))
+    assert client.reflections_["r3"]["name"] == "renamed"
+    assert list(result.failed) == ["missing"]
+
+
+def test_conflict_is_retried(client):
+    manager = ReflectionManager(client)
+    manager.find()
+    client.reflections_["r1"]["tag"] = "5"  # changed by someone else
+    result = manager.enable(["r1"])
+    result.raise_for_failures()
+    assert result.succeeded["r1"]["tag"] == "6"
+    assert client.calls[-2:] == ["get r1", "put r1"]
+
+
+def test_incremental_refresh(client):
+    manager = ReflectionManager(client)
+    assert manager.refresh() == ({"r1", "r2", "r3"}, set(), set())
+    client.reflections_["r2"] = _reflection("r2", "d1", "AGGREGATION", tag="2")
+    del client.reflections_["r3"]
+    client.reflections_["r4"] = _reflection("r4", "d3")
+    assert manager.refresh() == ({"r4"}, {"r2"}, {"r3"})
+    assert manager.statuses == {"CAN_ACCELERATE": 3}
+    assert manager.datasets == {"d1": {"r1", "r2"}, "d3": {"r4"}}
+
+    client.reflections_["r1"] = _reflection("r1", "d1", status="FAILED", tag="2")
+    assert manager.refresh(["r1", "r4"]) == (set(), {"r1"}, set())
+    del client.reflections_["r4"]
+    assert manager.refresh(["r4"]) == (set(), set(), {"r4"})
+    assert manager.get("r4") is None
+
+
+def test_refresh_dataset_reenables_on_failed_disable():
+    class Client(_Client):
+        def catalog_item(self, cid=None, path=None):
+            return {"id": "d1"}
+
+        def modify_reflection(self, rid, json):
+            if rid == "r2" and not json["enabled"]:
+                raise DremioException("cannot disable", None)
+            return _Client.modify_reflection(self, rid, json)
+
+    client = Client([_reflection("r1", "d1"), _reflection("r2", "d1")])
+    with pytest.raises(DremioException):
+        refresh_reflections_of_one_dataset(client, ["space", "vds"])
+    assert client.reflections_["r1"]["enabled"] and client.reflections_["r2"]["enabled"]
+    assert client.calls.count("put r1") == 2
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=50, burst=2)
+    start = time.time()
+    for _ in range(7):
+        limiter.acquire()
+    assert time.time() - start >= 0.09
+
+
+class _Summary(object):
+    def __init__(self, statuses):
+        # list of {id: (combinedStatus, lastDataFetch[, failureCount[, refresh]])} returned by successive polls, the
+        # last one repeats
+        self.statuses = statuses
+        self.calls = 0
+
+    def reflections(self, summary=False):
+        assert summary
+        current = self.statuses[min(self.calls, len(self.statuses) - 1)]
+        self.calls += 1
+        keys = ("combinedStatus", "lastDataFetch", "failureCount", "refresh")
+        return {"data": [{"id": k, "status": dict(zip(keys, v))} for k, v in current.items()]}
+
+
+def test_monitor():
+    old, new = "2020-01-01T00:00:00.000Z", "2100-01-01T00:00:00.000Z"
+    client = _Summary(
+        [
+            {"r1": ("CAN_ACCELERATE", old), "r2": ("REFRESHING", old), "r3": ("REFRESHING", old)},
+            {"r1": ("CAN_ACCELERATE", old), "r2": ("FAILED", old), "r3": ("REFRESHING", old)},
+            {"r1": ("CAN_ACCELERATE", new)},
+        ]
+    )
+    monitor = ReflectionMonitor(client, interval=0.01)
+    futures = monitor.watch(["r1", "r2", "r3"], refreshed_after=time.time())
+    timing = futures["r1"].result(timeout=5)
+    assert timing.status == "CAN_ACCELERATE" and timing.polls == 3 and timing.last_data_fetch == new
+    with pytest.raises(DremioException):
+        futures["r2"].result(timeout=5)
+    with pytest.raises(DremioNotFoundException):
+        futures["r3"].result(timeout=5)
+    # every reflection was checked by the same polls
+    assert client.calls == 3
+
+
+def test_monitor_failed_refresh():
+    old = "2020-01-01T00:00:00.000Z"
+    client = _Summary(
+        [
+            {"r1": ("CAN_ACCELERATE_WITH_FAILURES", old, 1), "r2": ("CAN_ACCELERATE_WITH_FAILURES", old, 1)},
+            {"r1": ("CAN_ACCELERATE_WITH_FAILURES", old, 2), "r2": ("CAN_ACCELERATE_WITH_FAILURES", old, 1)},
+        ]
+    )
+    monitor = ReflectionMonitor(client, interval=0.01, timeout=0.2)
+    futures = monitor.watch(["r1", "r2"], refreshed_after=time.time())
+    # failures from before the refresh was triggered don't fail the watch, a new one does
+    with pytest.raises(DremioException):
+        futures["r1"].result(timeout=5)
+    with pytest.raises(TimeoutError):
+        futures["r2"].result(timeout=5)
+    client.statuses = [{"r1": ("CAN_ACCELERATE_WITH_FAILURES", old, 2, "GIVEN_UP")}]
+    with pytest.raises(DremioException):
+        monitor.wait(["r1"], refreshed_after=time.time())
+    # without refreshed_after a reflection usable despite failures is done
+    assert monitor.wait(["r1"])["r1"].status == "CAN_ACCELERATE_WITH_FAILURES"
+
+
+def test_monitor_timeout_and_close():
+    client = _Summary([{"r1": ("REFRESHING", None)}])
+    monitor = ReflectionMonitor(client, interval=0.01, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        monitor.wait(["r1"])
+    monitor.timeout = None
+    future = monitor.watch(["r1"])["r1"]
+    monitor.close()
+    with pytest.raises(CancelledError):
+        future.result(timeout=5)
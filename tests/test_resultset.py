@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import json
+
+import pyarrow as pa
+import pytest
+
+from dremio_client.query import query
+from dremio_client.util import ResultSet
+
+
+def _batches(closed):
+    try:
+        for i in range(3):
+            yield pa.RecordBatch.from_pydict({"a": [i, i + 1]})
+    finally:
+        closed.append(True)
+
+
+def test_lazy_schema_and_single_pass():
+    closed = list()
+    result = ResultSet(_batches(closed), method="flight")
+    assert result.schema.names == ["a"]
+    assert result.num_rows is None
+    assert sum(b.num_rows for b in result) == 6
+    with pytest.raises(RuntimeError):
+        list(result)
+
+
+def test_materialize_and_close():
+    result = ResultSet(_batches(list()))
+    assert result.to_arrow().num_rows == 6
+    assert result.num_rows == 6
+    assert list(result.to_pandas()["a"]) == [0, 1, 1, 2, 2, 3]
+    assert len(list(result)) == 3
+
+    closed = list()
+    with ResultSet(_batches(closed)) as result:
+        next(iter(result))
+    assert closed == [True]
+
+
+def test_rest_resultset(requests_mock):
+    for name, url in (
+        ("sql", "http://localhost:9047/api/v3/sql"),
+        ("job_status", "http://localhost:9047/api/v3/job/22b3b4fe-669a-4789-a9de-b1fc5ba7b500"),
+    ):
+        with open("tests/data/{}.json".format(name)) as f:
+            method = requests_mock.post if name == "sql" else requests_mock.get
+            method(url, text=f.read())
+    page = {
+        "rowCount": 2,
+        "schema": [{"name": "x", "type": {"name": "INTEGER"}}],
+        "rows": [{"x": 1}, {"x": 2}],
+    }
+    requests_mock.get(
+        "http://localhost:9047/api/v3/job/22b3b4fe-669a-4789-a9de-b1fc5ba7b500/results", text=json.dumps(page)
+    )
+    result = query("1234", "http://localhost:9047", None, None, None, None, None, True, "select 1",
+                   method="rest", output="resultset")
+    assert result.method == "rest"
+    assert result.num_rows == 2
+    assert result.schema.types == [pa.int32()]
+    assert result.to_arrow().column("x").to_pylist() == [1, 2]
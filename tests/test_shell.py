@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import io
+import json
+import time
+
+import pyarrow as pa
+
+from dremio_client.shell import CatalogIndex, Cursor, Shell
+
+SCHEMA = pa.schema([("a", pa.int64())])
+
+
+def _batches(count, read):
+    for i in range(count):
+        read.append(i)
+        yield pa.RecordBatch.from_pydict({"a": list(range(i * 10, i * 10 + 10))}, schema=SCHEMA)
+
+
+def test_cursor_pages_and_prefetch():
+    read = list()
+    cursor = Cursor(_batches(100, read), SCHEMA, prefetch=30)
+    assert cursor.rows(0, 5) == [(i,) for i in range(5)]
+    time.sleep(0.1)
+    assert len(read) <= 5  # reads ahead at most prefetch rows, one batch at a time
+    assert cursor.rows(95, 10) == [(i,) for i in range(95, 105)]
+    assert cursor.rows(0, 2) == [(0,), (1,)]  # earlier pages are kept
+    assert cursor.rows(995, 10) == [(i,) for i in range(995, 1000)]
+    assert cursor.done and cursor.rows_read == 1000
+
+
+def test_cursor_close_cancels():
+    cancelled = list()
+    cursor = Cursor(_batches(100, list()), SCHEMA, cancel=lambda: cancelled.append(True), prefetch=10)
+    cursor.rows(0, 1)
+    cursor.close()
+    assert cancelled == [True]
+
+
+def test_catalog_index(requests_mock):
+    requests_mock.get(
+        "http://localhost:9047/api/v3/catalog",
+        text=json.dumps({"data": [{"path": ["sales"]}, {"path": ["Samples"]}, {"path": ["other"]}]}),
+    )
+    children = requests_mock.get(
+        "http://localhost:9047/api/v3/catalog/by-path/sales",
+        text=json.dumps({"children": [{"path": ["sales", "orders"]}, {"path": ["sales", "order items"]}]}),
+    )
+    index = CatalogIndex("token", "http://localhost:9047")
+    assert index.complete("sa") == ["Samples", "sales"]
+    assert index.complete("sales.ord") == ['sales."order items"', "sales.orders"]
+    assert index.complete("sales.o") == ['sales."order items"', "sales.orders"]
+    assert children.call_count == 1
+
+
+def test_shell():
+    queries = list()
+
+    def execute(sql):
+        queries.append(sql)
+        if "bad" in sql:
+            raise ValueError("syntax error")
+        return Cursor(_batches(3, list()), SCHEMA)
+
+    commands = "select a\nfrom t\n;\nnext\nprev\nschema\nselect bad;\nnext\nexit\n"
+    out = io.StringIO()
+    shell = Shell(execute, page_size=20, stdin=io.StringIO(commands), stdout=out)
+    shell.use_rawinput = False
+    shell.cmdloop()
+    output = out.getvalue()
+    assert queries == ["select a\nfrom t", "select bad"]
+    assert "rows 1-20 of 30" in output or "rows 1-20 of 20+" in output
+    assert "rows 21-30 of 30" in output
+    assert "error: syntax error" in output
+    assert "a int64" in output
+    assert "no query has been run" in output
+
+
+def test_cli_shell_without_flight(requests_mock, monkeypatch):
+    from click.testing import CliRunner
+
+    from dremio_client import cli, flight
+
+    def unavailable(*args, **kwargs):
+        raise NotImplementedError("Python Flight bindings require Python 3 and pyarrow > 0.14.0")
+
+    monkeypatch.setattr(flight, "get_client_pool", unavailable)
+    requests_mock.post("http://localhost:9047/apiv2/login", text=json.dumps({"token": "12345"}))
+    result = CliRunner().invoke(cli.cli, ["shell"], input="exit\n", catch_exceptions=False)
+    assert result.exit_code == 0
+    assert "running queries over rest" in result.output
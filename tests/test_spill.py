@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from dremio_client.query import query  # NOQA
+from dremio_client.util.spill import write_batches  # NOQA
+
+
+def _batches(n, size):
+    for i in range(n):
+        yield pa.record_batch({"a": list(range(i * size, (i + 1) * size)), "b": ["x"] * size})
+
+
+def test_write_batches_arrow(tmpdir):
+    dataset = write_batches(_batches(3, 10), str(tmpdir.join("out")), max_rows_per_file=7)
+    assert len(dataset.files) == 5
+    table = dataset.to_table()
+    assert table.num_rows == 30
+    assert table.column("a").to_pylist() == list(range(30))
+
+
+def test_write_batches_parquet(tmpdir):
+    dataset = write_batches(_batches(2, 5), str(tmpdir.join("out")), file_format="parquet")
+    assert len(dataset.files) == 1
+    assert dataset.files[0].endswith(".parquet")
+    assert dataset.count_rows() == 10
+
+
+def test_write_batches_empty(tmpdir):
+    schema = pa.schema([("a", pa.int64())])
+    dataset = write_batches([], str(tmpdir.join("out")), schema=schema)
+    assert dataset.schema.equals(schema)
+    assert dataset.count_rows() == 0
+
+
+def test_rest_query_spill(requests_mock, tmpdir):
+    with open("tests/data/sql.json", "r+") as f:
+        requests_mock.post("http://localhost:9047/api/v3/sql", text=f.read())
+    with open("tests/data/job_status.json", "r+") as f:
+        requests_mock.get("http://localhost:9047/api/v3/job/22b3b4fe-669a-4789-a9de-b1fc5ba7b500", text=f.read())
+    rows = [{"name": "row{}".format(i)} for i in range(100)]
+    requests_mock.get(
+        "http://localhost:9047/api/v3/job/22b3b4fe-669a-4789-a9de-b1fc5ba7b500/results",
+        text=json.dumps({"rowCount": 100, "rows": rows}),
+    )
+    dataset = query(
+        "1234",
+        "http://localhost:9047",
+        "localhost",
+        31010,
+        32010,
+        "dremio",
+        "dremio123",
+        True,
+        "select * from sys.options",
+        method="rest",
+        output_path=str(tmpdir.join("out")),
+        max_rows_per_file=40,
+    )
+    assert len(dataset.files) == 3
+    assert dataset.to_table().column("name").to_pylist() == [r["name"] for r in rows]
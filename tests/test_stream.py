@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import datetime
+import io
+import json
+
+import pyarrow as pa
+import pytest
+from click.testing import CliRunner
+
+from dremio_client import cli
+from dremio_client.util.stream import batch_rows, limit_batches, write_stream
+
+BATCH = pa.RecordBatch.from_pydict({"a": [1, 2], "ts": [datetime.datetime(2020, 1, 1, 12, 30), None]})
+
+
+@pytest.mark.parametrize(
+    "file_format,expected",
+    [
+        ("json", b'[{"a": 1, "ts": "2020-01-01T12:30:00"}, {"a": 2, "ts": null}, {"a": 1, "ts": "2020-01-01T12:30:00"}]\n'),
+        ("ndjson", b'{"a": 1, "ts": "2020-01-01T12:30:00"}\n{"a": 2, "ts": null}\n{"a": 1, "ts": "2020-01-01T12:30:00"}\n'),
+        ("csv", b'"a","ts"\n1,2020-01-01 12:30:00.000000\n2,\n1,2020-01-01 12:30:00.000000\n'),
+    ],
+)
+def test_write_stream(file_format, expected):
+    sink = io.BytesIO()
+    assert write_stream(limit_batches([BATCH, BATCH, BATCH], 3), sink, file_format) == 3
+    if file_format == "csv":
+        assert sink.getvalue() == expected
+    else:
+        assert [json.loads(i) for i in sink.getvalue().splitlines() if i] == [json.loads(i) for i in expected.splitlines()]
+
+
+def test_write_empty_stream():
+    sink = io.BytesIO()
+    write_stream([], sink, "arrow", BATCH.schema)
+    assert pa.ipc.open_stream(sink.getvalue()).read_all().schema.names == ["a", "ts"]
+
+
+def test_batch_rows_duration():
+    batch = pa.RecordBatch.from_pydict(
+        {"d": pa.array([datetime.timedelta(seconds=90), None], pa.duration("s")), "day": [datetime.date(2020, 1, 2)] * 2}
+    )
+    assert batch_rows(batch) == [{"d": "0:01:30", "day": "2020-01-02"}, {"d": None, "day": "2020-01-02"}]
+
+
+def test_cli_streams_flight(requests_mock, monkeypatch, tmp_path):
+    flight = pytest.importorskip("pyarrow.flight")
+
+    class Server(flight.FlightServerBase):
+        table = pa.table({"a": list(range(1000))})
+
+        def get_flight_info(self, context, descriptor):
+            return flight.FlightInfo(self.table.schema, descriptor, [flight.FlightEndpoint(b"t", [])], 1000, -1)
+
+        def do_get(self, context, ticket):
+            return flight.RecordBatchStream(pa.Table.from_batches(self.table.to_batches(100)))
+
+    requests_mock.post("http://127.0.0.1:9047/apiv2/login", text=json.dumps({"token": "12345"}))
+    output = str(tmp_path / "out.ndjson")
+    with Server("grpc://127.0.0.1:0") as server:
+        monkeypatch.setenv("DREMIO_HOSTNAME", "127.0.0.1")
+        monkeypatch.setenv("DREMIO_FLIGHT_PORT", str(server.port))
+        args = ["--profile", "query", "--sql", "select a", "--format", "ndjson", "--limit", "250", "-o", output]
+        result = CliRunner().invoke(cli.cli, args, catch_exceptions=False)
+    assert result.exit_code == 0
+    assert "cli output" in result.output
+    with open(output) as f:
+        rows = [json.loads(i) for i in f]
+    assert rows == [{"a": i} for i in range(250)]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 Ryan Murray.
+#
+# This file is part of Dremio Client
+# (see https://github.com/rymurr/dremio_client).
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import, division, print_function
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from dremio_client.auth import TokenManager, TokenStore, auth, clear_managers, token_manager
+from dremio_client.conf import build_config
+from dremio_client.model.endpoints import catalog
+
+
+class _Login(object):
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            return "token{}".format(self.calls)
+
+
+def test_formats_as_token():
+    manager = TokenManager(_Login())
+    assert "_dremio{}".format(manager) == "_dremiotoken1"
+    assert str(manager) == "token1"
+
+
+def test_refresh_without_stale_token_is_unconditional():
+    login = _Login()
+    manager = TokenManager(login, token="cached")
+    assert manager.refresh("other") == "cached"
+    assert manager.refresh() == "token1"
+    assert login.calls == 1
+
+
+def test_proactive_refresh():
+    login = _Login()
+    manager = TokenManager(login, lifetime=100, margin=10, token="cached", issued=time.time() - 95)
+    assert manager.token == "token1"
+    assert manager.token == "token1"
+    assert login.calls == 1
+
+
+def test_single_flight_refresh():
+    login = _Login(delay=0.1)
+    manager = TokenManager(login, token="stale")
+    results = list()
+    threads = [threading.Thread(target=lambda: results.append(manager.invalidate("stale"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert login.calls == 1
+    assert set(results) == {"token1"}
+
+
+def test_replay_on_401(requests_mock):
+    manager = TokenManager(_Login(), token="expired")
+    requests_mock.get(
+        "http://localhost:9047/api/v3/catalog",
+        [{"status_code": 401, "text": "{}"}, {"status_code": 200, "text": '{"data": []}'}],
+    )
+    assert catalog(manager, "http://localhost:9047") == {"data": []}
+    assert requests_mock.last_request.headers["Authorization"] == "_dremiotoken1"
+    assert requests_mock.call_count == 2
+
+
+def test_auth_shared_per_process(requests_mock, tmp_path, monkeypatch):
+    monkeypatch.setenv("DREMIO_CLIENTDIR", str(tmp_path))
+    requests_mock.post("http://localhost:9047/apiv2/login", text='{"token": "12345"}')
+    clear_managers()
+    try:
+        first = token_manager("http://localhost:9047", build_config())
+        second = token_manager("http://localhost:9047", build_config())
+        assert first is second
+        assert str(first) == str(second) == "12345"
+        assert auth("http://localhost:9047", build_config()) == "12345"
+        assert requests_mock.call_count == 1
+    finally:
+        clear_managers()
+
+
+def test_token_store(tmp_path):
+    path = str(tmp_path / "auth.json")
+    with open(path, "w") as f:
+        json.dump({"token": "legacy", "timestamp": time.time(), "hostname": "old", "username": "dremio"}, f)
+    store = TokenStore(path)
+    assert store.get("old", "dremio", 100)[0] == "legacy"
+    store.put("localhost", "dremio", "12345")
+    store.put("localhost", "other", "67890", issued=time.time() - 200)
+    assert store.get("localhost", "dremio", 100)[0] == "12345"
+    assert store.get("localhost", "other", 100) is None
+    assert store.get("old", "dremio", 100)[0] == "legacy"
+    assert [i for i in os.listdir(str(tmp_path)) if i.endswith(".tmp")] == []
+
+
+def _worker(path):
+    store = TokenStore(path)
+
+    def login():
+        with open(path + ".logins", "a") as f:
+            f.write("x")
+        time.sleep(0.2)
+        return "token-{}".format(os.getpid())
+
+    manager = TokenManager(
+        login,
+        load=lambda: store.get("localhost", "dremio", 3600),
+        on_refresh=lambda token, issued: store.put("localhost", "dremio", token, issued),
+        lock=store.lock,
+    )
+    return str(manager)
+
+
+def test_one_login_across_processes(tmp_path):
+    path = str(tmp_path / "auth.json")
+    pool = multiprocessing.Pool(4)
+    try:
+        tokens = pool.map(_worker, [path] * 8)
+    finally:
+        pool.close()
+        pool.join()
+    assert len(set(tokens)) == 1
+    with open(path + ".logins") as f:
+        assert f.read() == "x"